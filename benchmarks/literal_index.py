@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+"""
+Micro-benchmark of the literal prefilter of listeners.
+
+Compares matching every pattern against every chunk with a single
+LiteralIndex pass followed by matching only the candidate lines, on
+generated vdsm.log lines and dozens of listener patterns.
+
+Run it from the repository root:
+
+    python -m benchmarks.literal_index [--patterns 40] [--rounds 20]
+"""
+
+import argparse
+import random
+import time
+
+from disruption_generator.listener.literals import LiteralIndex
+from disruption_generator.listener.matchers import RegexMatcher
+from disruption_generator.listener.reader import CHUNK_SIZE
+
+TEMPLATES = [
+    "{ts} INFO  (jsonrpc/{t}) [api.virt] START getStats() "
+    "from=::ffff:10.35.0.{t},52044, vmId={vm} (api:46)",
+    "{ts} INFO  (jsonrpc/{t}) [api.virt] FINISH getStats "
+    "return={{'status': {{'message': 'Done', 'code': 0}}}} "
+    "from=::ffff:10.35.0.{t},52044 (api:52)",
+    "{ts} DEBUG (periodic/{t}) [virt.sampling.VMBulkstatsMonitor] sampled "
+    "timestamp 4296.{t} elapsed 0.010 acquired True domains all (sampling:443)",
+    "{ts} INFO  (jsonrpc/{t}) [jsonrpc.JsonRpcServer] RPC call "
+    "Host.getAllVmStats succeeded in 0.01 seconds (__init__:573)",
+    "{ts} DEBUG (mailbox-spm) [storage.Misc.excCmd] /usr/bin/taskset "
+    "--cpu-list 0-7 dd if=/rhev/data-center/{vm}/mastersd/dom_md/inbox "
+    "iflag=direct,fullblock count=1 bs=1024000 (cwd None) (commands:65)",
+    "{ts} INFO  (vm/{t}) [virt.vm] (vmId='{vm}') Changed state to Up: "
+    "MIGRATION_DESTINATION (vm:1234)",
+    "{ts} WARN  (check/loop) [storage.asyncutils] Call <bound method "
+    "DirectioChecker._check of <DirectioChecker /rhev/data-center/{vm} "
+    "running next_check=4296.{t} at 0x7f> delayed by 0.51 seconds "
+    "(asyncutils:138)",
+]
+
+KEYWORDS = [
+    "VM_DOWN",
+    "Traceback",
+    "migration",
+    "VolumeError",
+    "Timeout",
+    "StorageDomainDoesNotExist",
+    "FAILED",
+    "abnormal vm stop",
+    "destroy",
+    "hibernate",
+    "SanlockException",
+    "ConnectionRefused",
+    "NotConnectedError",
+    "monitorVolume",
+    "onIOError",
+    "ENOSPC",
+    "paused",
+    "Stopping",
+    "AcquireHostIdFailure",
+    "lost connection",
+    "socket error",
+    "Broken pipe",
+    "MigrationError",
+    "libvirtError",
+    "qemu-kvm",
+    "unreachable",
+    "CRITICAL",
+    "vdsm-tool",
+    "restarted",
+    "shutdown",
+    "leaseExpired",
+    "I/O error",
+    "fencing",
+    "SpmStatus",
+    "domain monitor",
+    "Connection reset",
+    "delayed by",
+    "MIGRATION_DESTINATION",
+    "Changed state to Down",
+    "getStorageDomainInfo",
+]
+
+
+def chunk(size, seed=1):
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size:
+        line = rng.choice(TEMPLATES).format(
+            ts="2018-06-28 10:00:{:02d},{:03d}+0300".format(
+                rng.randrange(60), rng.randrange(1000)
+            ),
+            t=rng.randrange(10),
+            vm="3f2a{:04x}-11".format(rng.randrange(1 << 16)),
+        )
+        lines.append(line)
+        total += len(line) + 1
+    return ("\n".join(lines) + "\n").encode()
+
+
+def patterns(count):
+    # Plain literals, literals with captures and alternations, as found in
+    # experiment files.
+    shapes = ["{}", r"{}.*vmId='(?P<vm>[\w-]+)'", r"(?:{}|{}) \d+"]
+    found = []
+    for i in range(count):
+        word = KEYWORDS[i % len(KEYWORDS)]
+        shape = shapes[i % len(shapes)]
+        found.append(shape.format(word, word.upper()))
+    return found
+
+
+def per_matcher(matchers, buf):
+    return [matcher.search(buf) for matcher in matchers]
+
+
+def indexed(index, matchers, buf):
+    spans = index.scan(buf)
+    return [
+        matcher.search(b"".join(buf[start:end] for start, end in spans[matcher]))
+        for matcher in matchers
+    ]
+
+
+def timed(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--patterns", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    buf = chunk(CHUNK_SIZE)
+    matchers = [RegexMatcher(expression) for expression in patterns(args.patterns)]
+    index = LiteralIndex(dict((matcher, matcher.literals) for matcher in matchers))
+    missing = [m.expression for m in matchers if m.literals is None]
+    assert not missing, missing
+
+    baseline = timed(lambda: per_matcher(matchers, buf), args.rounds)
+    prefiltered = timed(lambda: indexed(index, matchers, buf), args.rounds)
+    mib = len(buf) / float(1 << 20)
+    print("{} patterns, {:.2f} MiB chunk".format(len(matchers), mib))
+    print("every pattern on every chunk: {:7.2f} ms".format(baseline * 1000))
+    print("literal index + candidates:   {:7.2f} ms".format(prefiltered * 1000))
+    print("speedup: {:.1f}x".format(baseline / prefiltered))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,62 @@
 # -*- coding: utf-8 -*-
 
-"""Console script for disruption_generator."""
-import asyncio
-import asyncssh
+"""Console script for disruption_generator.
+
+Only click and light modules are imported here, so that --help and --version
+answer at once: the engine, SSH, YAML and parsers are imported by the
+commands using them.
+"""
 import sys
+import time
 import click
-import logging.config
-import yaml
+import logging
 
 from . import __version__
-from .config import EXPERIMENTS_DIR
-from .listener.alistener import Alistener
-from .parsers.experiment_parser import ExperimentParser
-from .trigger.trigger import Trigger
-from os import walk, path
+from .config import (
+    EXPERIMENTS_DIR,
+    MATCH_WORKERS,
+    MAX_MATCH_LATENCY,
+    MAX_PARALLEL,
+    MAX_PER_HOST,
+    PARSE_CACHE_DIR,
+    PARSE_WORKERS,
+)
+from .listener.reader import MAX_LINE_LENGTH
+from .parsers.discovery import INCLUDE, discover
+from os import path
 
 
 logger = logging.getLogger(__name__)
 
 
-@click.command()
+def _positive(ctx, param, value):
+    if value <= 0:
+        raise click.BadParameter("must be greater than 0")
+    return value
+
+
+@click.group(invoke_without_command=True)
 @click.option(
     "--experiments-path",
     "-e",
-    type=click.Path(exists=True, file_okay=False, readable=True, resolve_path=True),
+    type=click.Path(file_okay=False, readable=True, resolve_path=True),
     help="Path to experiments yamls",
     default=EXPERIMENTS_DIR,
 )
+@click.option(
+    "--include",
+    multiple=True,
+    metavar="GLOB",
+    help="Experiment files to play, relative to the experiments path, *.yaml and *.yml by default",
+    default=INCLUDE,
+)
+@click.option(
+    "--exclude",
+    multiple=True,
+    metavar="GLOB",
+    help="Files and directories of the experiments path to skip",
+    default=(),
+)
 @click.option(
     "--ssh-host-key",
     "-k",
@@ -34,62 +64,322 @@ logger = logging.getLogger(__name__)
     help="File with SSH private key to use a server host key",
     default=None,
 )
+@click.option(
+    "--max-parallel",
+    "-p",
+    type=click.IntRange(min=1),
+    help="Maximum number of scenarios played at once",
+    default=MAX_PARALLEL,
+)
+@click.option(
+    "--max-per-host",
+    type=click.IntRange(min=1),
+    help="Maximum number of scenarios involving the same host played at once",
+    default=MAX_PER_HOST,
+)
+@click.option(
+    "--max-line-length",
+    type=click.IntRange(min=1),
+    help="Log lines longer than this many bytes are truncated",
+    default=MAX_LINE_LENGTH,
+)
+@click.option(
+    "--state-file",
+    "-s",
+    type=click.Path(dir_okay=False, writable=True, resolve_path=True),
+    help="File keeping log offsets so listeners resume after the last match",
+    default=None,
+)
+@click.option(
+    "--match-workers",
+    "-w",
+    type=click.IntRange(min=0),
+    help="Processes searching log lines, 0 searches them on the event loop",
+    default=MATCH_WORKERS,
+)
+@click.option(
+    "--max-match-latency",
+    type=float,
+    callback=_positive,
+    help="Seconds a batch of log lines may spend in the match workers",
+    default=MAX_MATCH_LATENCY,
+)
+@click.option(
+    "--output-dir",
+    "-o",
+    type=click.Path(file_okay=False, writable=True, resolve_path=True),
+    help="Directory receiving the output of every action on every host",
+    default=None,
+)
+@click.option(
+    "--parse-workers",
+    type=click.IntRange(min=0),
+    help="Processes parsing experiments, every core by default, 0 parses them in this process",
+    default=PARSE_WORKERS,
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False, writable=True),
+    help="Directory caching parsed experiments",
+    default=PARSE_CACHE_DIR,
+)
+@click.option("--no-cache", is_flag=True, help="Parse every experiment again, without the cache")
+@click.option(
+    "--plan",
+    type=click.Path(exists=True, dir_okay=False, readable=True, resolve_path=True),
+    help="Plan made by the compile command, played instead of the experiments",
+    default=None,
+)
 @click.version_option(version=__version__)
-def main(experiments_path, ssh_host_key):
+@click.pass_context
+def main(
+    ctx,
+    experiments_path,
+    include,
+    exclude,
+    ssh_host_key,
+    max_parallel,
+    max_per_host,
+    max_line_length,
+    state_file,
+    match_workers,
+    max_match_latency,
+    output_dir,
+    parse_workers,
+    cache_dir,
+    no_cache,
+    plan,
+):
     """Console script for disruption_generator."""
+    parse_log_config(default_config_file="default_logging.yaml", custom_config_file="custom_config.yaml")
+    if ctx.invoked_subcommand is not None:
+        return
+    if plan is None and not path.isdir(experiments_path):
+        raise click.BadParameter(
+            "Directory {} does not exist.".format(experiments_path), param_hint="'--experiments-path' / '-e'"
+        )
+    import asyncio
+    import asyncssh
+    from .parsers.experiment_parser import ParserException
+    from .parsers.plan import PlanException
+
     click.echo("!!! DISRUPTION AS A SERVICE !!!")
     click.echo("!!!    USE WITH CAUTION     !!!")
-    parse_log_config(default_config_file="default_logging.yaml", custom_config_file="custom_config.yaml")
     try:
         loop = asyncio.get_event_loop()
-        loop.run_until_complete(execute(experiments_path, ssh_host_key))
+        loop.run_until_complete(
+            execute(
+                experiments_path,
+                ssh_host_key,
+                max_parallel,
+                max_per_host,
+                max_line_length,
+                state_file,
+                match_workers,
+                max_match_latency,
+                output_dir,
+                parse_workers,
+                None if no_cache else cache_dir,
+                plan,
+                include,
+                exclude,
+            )
+        )
+    except PlanException as exc:
+        sys.exit("Cannot play {}: {}".format(plan, exc))
+    except ParserException as exc:
+        sys.exit("Cannot parse experiments: {}".format(exc))
     except (OSError, asyncssh.Error) as exc:
         sys.exit("SSH connection failed: " + str(exc))
 
 
-async def execute(experiments_path, ssh_host_key):
+@main.command("compile")
+@click.argument("plan_path", type=click.Path(dir_okay=False, writable=True, resolve_path=True))
+@click.option(
+    "--experiments-path",
+    "-e",
+    type=click.Path(exists=True, file_okay=False, readable=True, resolve_path=True),
+    help="Path to experiments yamls",
+    default=EXPERIMENTS_DIR,
+)
+@click.option(
+    "--include",
+    multiple=True,
+    metavar="GLOB",
+    help="Experiment files to play, relative to the experiments path, *.yaml and *.yml by default",
+    default=INCLUDE,
+)
+@click.option(
+    "--exclude",
+    multiple=True,
+    metavar="GLOB",
+    help="Files and directories of the experiments path to skip",
+    default=(),
+)
+@click.option(
+    "--parse-workers",
+    type=click.IntRange(min=0),
+    help="Processes parsing experiments, every core by default, 0 parses them in this process",
+    default=PARSE_WORKERS,
+)
+def compile_plan(plan_path, experiments_path, include, exclude, parse_workers):
+    """Compile the experiments into a plan played with --plan."""
+    from .parsers.cache import parse_experiments
+    from .parsers.experiment_parser import ParserException
+    from .parsers.plan import write_plan
+
+    _files = list(discover(experiments_path, include, exclude))
+    try:
+        _scenarios, parsing = parse_experiments(_files, workers=parse_workers)
+    except ParserException as exc:
+        sys.exit("Cannot parse experiments: {}".format(exc))
+    write_plan(_scenarios, plan_path)
+    logger.info(
+        "Compiled {} scenarios of {} experiment files into {}".format(len(_scenarios), parsing["files"], plan_path)
+    )
+
+
+async def execute(
+    experiments_path,
+    ssh_host_key,
+    max_parallel=MAX_PARALLEL,
+    max_per_host=MAX_PER_HOST,
+    max_line_length=MAX_LINE_LENGTH,
+    state_file=None,
+    match_workers=MATCH_WORKERS,
+    max_match_latency=MAX_MATCH_LATENCY,
+    output_dir=None,
+    parse_workers=PARSE_WORKERS,
+    cache_dir=None,
+    plan=None,
+    include=INCLUDE,
+    exclude=(),
+):
     """Find, parse and execute experiments.
 
     :param experiments_path: Path to directory with definitions of experiments.
+    :param max_parallel: Maximum number of scenarios played at once.
+    :param max_per_host: Maximum number of scenarios involving the same host played at once.
+    :param max_line_length: Log lines longer than this many bytes are truncated.
+    :param state_file: File keeping log offsets so listeners resume after the last match.
+    :param match_workers: Processes searching log lines, 0 searches them on the event loop.
+    :param max_match_latency: Seconds a batch of log lines may spend in the match workers.
+    :param output_dir: Directory receiving the output of every action on every host.
+    :param parse_workers: Processes parsing experiments, None uses every core, 0 parses them in this process.
+    :param cache_dir: Directory caching parsed experiments, None parses every experiment.
+    :param plan: Compiled plan played instead of the experiments.
+    :param include: Globs of the experiment files, relative to experiments_path.
+    :param exclude: Globs of the files and directories to skip, relative to experiments_path.
     :return: 0 on success, else 1.
     :rtype: int
     """
+    from .engine.engine import Engine
+    from .parsers.plan import read_plan
+
     ssh_host_key = ssh_host_key or [ssh_host_key]
-    _files = []
-    for (dirpath, dirnames, filenames) in walk(experiments_path):
-        _files = [path.join(dirpath, _file) for _file in filenames if _file.endswith((".yaml", ".yml"))]
-        logger.debug("Experiment files to be parsed: {}".format(_files))
-        _ignored = [path.join(dirpath, _file) for _file in filenames if not _file.endswith((".yaml", ".yml"))]
-        if _ignored:
-            logger.debug("The following files where found but ignored: {}".format(_ignored))
-        break  # Gets only root level directory files
-    _scenarios = []
-    for _file in _files:
-        _parser = ExperimentParser(yaml_path=_file)
-        scenario = _parser.parse()
-        _scenarios.extend(scenario)
-    logger.debug("Scenarios to play: {}".format(_scenarios))
-    for scenario in _scenarios:
-        logger.info("Scenario: {}".format(scenario.name))
-        alistener = Alistener(
-            scenario.listener.target, scenario.listener.username, scenario.listener.password, ssh_host_key
+    if plan is not None:
+        start = time.monotonic()
+        _scenarios = read_plan(plan)
+        logger.info("Loaded {} scenarios from {} in {:.3f}s".format(len(_scenarios), plan, time.monotonic() - start))
+    else:
+        _files = discover(experiments_path, include, exclude)
+        _scenarios = parse_in_background(_files, parse_workers, cache_dir)
+    engine = Engine(
+        ssh_host_key,
+        max_parallel=max_parallel,
+        max_per_host=max_per_host,
+        max_line_length=max_line_length,
+        state_file=state_file,
+        match_workers=match_workers,
+        max_match_latency=max_match_latency,
+        output_dir=output_dir,
+    )
+    failed = False
+    results = engine.stream(_scenarios)
+    try:
+        async for result in results:
+            failed = failed or result.failed
+            report(result)
+    finally:
+        await results.aclose()
+        await engine.close()
+
+    stats = engine.scheduler.stats()
+    logger.info(
+        "Scheduling jitter over {count} timers: mean {mean:.2e}s, p50 {p50:.2e}s, "
+        "p99 {p99:.2e}s, max {max:.2e}s".format(**stats)
+    )
+    logger.info(
+        "Scheduling overhead: {overhead:.2e}s for {scheduled} timers, "
+        "{overhead_per_timer:.2e}s each".format(**stats)
+    )
+    return 1 if failed else 0
+
+
+async def parse_in_background(yaml_paths, parse_workers, cache_dir):
+    """Yields the scenarios of experiment files, parsed in a thread while the event loop plays the previous ones.
+
+    :param yaml_paths: Iterable of experiment files.
+    :param parse_workers: Processes parsing experiments, None uses every core, 0 parses them in this thread.
+    :param cache_dir: Directory caching parsed experiments, None parses every experiment.
+    """
+    import asyncio
+    from .parsers.cache import iter_experiments
+
+    loop = asyncio.get_event_loop()
+    parsing = {}
+    scenarios = iter_experiments(yaml_paths, workers=parse_workers, cache_dir=cache_dir, stats=parsing)
+    reading = None
+    try:
+        while True:
+            reading = loop.run_in_executor(None, next, scenarios, None)
+            # Shielded: the generator cannot be closed while a thread reads it.
+            scenario = await asyncio.shield(reading)
+            if scenario is None:
+                break
+            yield scenario
+        logger.info(
+            "Parsed {files} experiment files in {elapsed:.3f}s, {cached} from the cache, "
+            "the others with {workers} workers".format(**parsing)
         )
+    finally:
+        if reading is not None and not reading.done():
+            await asyncio.wait([reading])
+        # Shuts the parse workers down when playing stopped early.
+        await loop.run_in_executor(None, scenarios.close)
 
-        for action in scenario.actions:
-            result = await alistener.tail(scenario.listener.log, scenario.listener.re, action.timeout)
 
-            if result:
-                logger.info("Triggering: {}".format(action.name))
-                _username = action.username if action.username else "root"
-                trigger = Trigger(action, _username, action.password, ssh_host_key)
-                try:
-                    disruption = getattr(trigger, action.name)
-                except AssertionError as err:
-                    logger.error(err)
-                    return 1
-                await disruption()
+def report(result):
+    """Logs the outcome of a scenario.
 
-    return 0
+    :param result: ScenarioResult of the scenario.
+    """
+    triggered = len([action for action in result.actions if action.triggered])
+    logger.info("Scenario {}: {}/{} actions triggered".format(result.name, triggered, len(result.actions)))
+    for action in result.actions:
+        for host in action.hosts:
+            if host.output is None:
+                continue
+            if host.output.path is not None:
+                logger.info("  {} on {}: output in {}".format(action.name, host.host, host.output.path))
+            elif not host.success and host.output.count:
+                logger.info(
+                    "  {} on {} failed, last output:\n{}".format(action.name, host.host, "\n".join(host.output.tail()))
+                )
+    for phase, load in (result.observation or {}).items():
+        logger.info(
+            "  {} disruption: {requests} requests, {error_rate:.2%} errors, latency p50 {p50:.2e}s, "
+            "p90 {p90:.2e}s, p99 {p99:.2e}s, p99.9 {p999:.2e}s, max {max:.2e}s".format(phase.capitalize(), **load)
+        )
+    for name, summary in result.recovery().items():
+        logger.info("  {} recovered on {recovered}/{count} hosts".format(name, **summary))
+        for label, times in (("first success", summary["first_success"]), ("recovery", summary["recover"])):
+            if times is not None:
+                logger.info(
+                    "  {} time to {}: p50 {p50:.2f}s, p90 {p90:.2f}s, p99 {p99:.2f}s, max {max:.2f}s".format(
+                        name, label, **times
+                    )
+                )
 
 
 def parse_log_config(default_config_file, custom_config_file):
@@ -104,6 +394,9 @@ def parse_log_config(default_config_file, custom_config_file):
     Returns:
         None
     """
+    import logging.config
+    import yaml
+
     try:
         with open(default_config_file, "r") as f:
             default_config = yaml.safe_load(f)
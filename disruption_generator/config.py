@@ -5,3 +5,9 @@ Top level config
 """
 
 EXPERIMENTS_DIR = "./experiments/"  # change to point to the desired location
+MAX_PARALLEL = 10  # scenarios played at once
+MAX_PER_HOST = 5  # scenarios involving the same host played at once
+MATCH_WORKERS = 0  # processes searching log lines, 0 searches on the event loop
+MAX_MATCH_LATENCY = 0.1  # seconds a batch of lines may spend in match workers
+PARSE_WORKERS = None  # processes parsing experiments, None uses every core
+PARSE_CACHE_DIR = "~/.cache/disruption_generator"  # parsed experiments
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import time
+
+from asyncssh import Error, SSHClient, create_connection
+
+logger = logging.getLogger(__name__)
+
+MAX_SESSIONS = 10  # OpenSSH's default MaxSessions
+IDLE_TIMEOUT = 300
+HEALTH_CHECK_INTERVAL = 30
+HEALTH_CHECK_TIMEOUT = 5
+
+
+class PoolException(Exception):
+    pass
+
+
+class _PooledConnection(object):
+    def __init__(self, conn):
+        self.conn = conn
+        self.sessions = 0
+        self.last_used = time.monotonic()
+
+    def idle_for(self):
+        return time.monotonic() - self.last_used
+
+
+class _Lease(object):
+    """
+    Async context manager handing out a pooled connection for one session.
+    """
+
+    def __init__(self, pool, host, username, password, client_keys):
+        self.pool = pool
+        self.host = host
+        self.username = username
+        self.password = password
+        self.client_keys = client_keys
+        self.entry = None
+
+    async def __aenter__(self):
+        self.entry = await self.pool._acquire(
+            self.host, self.username, self.password, self.client_keys
+        )
+        return self.entry.conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        broken = exc_type is not None and issubclass(exc_type, (OSError, Error))
+        self.pool._release(
+            self.host, self.username, self.client_keys, self.entry, broken
+        )
+        return False
+
+
+class ConnectionPool(object):
+    """
+    Long lived SSH connections shared by listeners and triggers.
+
+    Connections are keyed by (host, username, client keys) and sessions are
+    multiplexed over them. At most `max_sessions` sessions run concurrently
+    against the same host, connections idle for longer than
+    `health_check_interval` are probed before being reused and the ones idle
+    for longer than `idle_timeout` are closed.
+    """
+
+    def __init__(
+        self,
+        max_sessions=MAX_SESSIONS,
+        idle_timeout=IDLE_TIMEOUT,
+        health_check_interval=HEALTH_CHECK_INTERVAL,
+    ):
+        if max_sessions < 1:
+            raise PoolException("max_sessions must be a positive integer")
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._connections = {}
+        self._locks = {}
+        self._limits = {}
+
+    @staticmethod
+    def _key(host, username, client_keys):
+        if isinstance(client_keys, (list, tuple)):
+            client_keys = tuple(client_keys)
+        return host, username, client_keys
+
+    def connection(self, host, username, password=None, client_keys=None):
+        """
+        Returns an async context manager yielding a connection to `host`.
+
+        Args:
+            host (str): target hostname
+            username (str): user to authenticate as
+            password (str): password, if any
+            client_keys (list): private keys to authenticate with
+        Returns:
+            _Lease: to be used with `async with`
+        """
+        return _Lease(self, host, username, password, client_keys)
+
+    async def _acquire(self, host, username, password, client_keys):
+        self._reap()
+        limit = self._limits.get(host)
+        if limit is None:
+            limit = self._limits[host] = asyncio.Semaphore(self.max_sessions)
+        await limit.acquire()
+        key = self._key(host, username, client_keys)
+        try:
+            if key not in self._locks:
+                self._locks[key] = asyncio.Lock()
+            async with self._locks[key]:
+                entry = self._connections.get(key)
+                if entry is not None and not await self._is_healthy(entry):
+                    logger.debug("Evicting stale connection to %s", host)
+                    self._evict(key)
+                    entry = None
+                if entry is None:
+                    entry = await self._connect(host, username, password, client_keys)
+                    self._connections[key] = entry
+            entry.sessions += 1
+            return entry
+        except BaseException:
+            limit.release()
+            raise
+
+    def _release(self, host, username, client_keys, entry, broken=False):
+        entry.sessions -= 1
+        entry.last_used = time.monotonic()
+        self._limits[host].release()
+        if broken:
+            key = self._key(host, username, client_keys)
+            if self._connections.get(key) is entry and entry.sessions == 0:
+                self._evict(key)
+
+    async def _connect(self, host, username, password, client_keys):
+        conn, _ = await create_connection(
+            SSHClient,
+            host=host,
+            known_hosts=None,
+            username=username,
+            password=password,
+            client_keys=client_keys,
+        )
+        logger.debug("Connected to %s", host)
+        return _PooledConnection(conn)
+
+    async def _is_healthy(self, entry):
+        if entry.conn.is_closed():
+            return False
+        if entry.sessions or entry.idle_for() < self.health_check_interval:
+            return True
+        try:
+            result = await asyncio.wait_for(
+                entry.conn.run("true", check=False), HEALTH_CHECK_TIMEOUT
+            )
+        except (asyncio.TimeoutError, OSError, Error):
+            return False
+        entry.last_used = time.monotonic()
+        return result.exit_status == 0
+
+    def _evict(self, key):
+        entry = self._connections.pop(key, None)
+        if entry is not None:
+            entry.conn.close()
+
+    def _reap(self):
+        for key, entry in list(self._connections.items()):
+            if entry.sessions == 0 and entry.idle_for() > self.idle_timeout:
+                logger.debug("Closing idle connection to %s", key[0])
+                self._evict(key)
+
+    async def close(self):
+        """
+        Closes every pooled connection.
+        """
+        entries = list(self._connections.values())
+        self._connections.clear()
+        for entry in entries:
+            entry.conn.close()
+        for entry in entries:
+            await entry.conn.wait_closed()
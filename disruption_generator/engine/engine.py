@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import functools
+import logging
+import os
+import time
+
+import attr
+from asyncssh import Error
+
+from ..config import MATCH_WORKERS, MAX_MATCH_LATENCY, MAX_PARALLEL, MAX_PER_HOST
+from ..connection.pool import ConnectionPool
+from ..listener.alistener import Alistener
+from ..listener.broker import TailBroker
+from ..listener.correlation import CorrelationMatcher
+from ..listener.journal import MESSAGE_FIELD, Journal, JournalMatcher
+from ..listener.offsets import OffsetStore
+from ..listener.reader import MAX_LINE_LENGTH
+from ..listener.threshold import ThresholdMatcher
+from ..listener.workers import MatchWorkers
+from ..parsers.config import AFTER_PREVIOUS
+from ..parsers.utils import JournaldListener
+from ..trigger.trigger import Trigger
+from .observer import Observation
+from .recovery import check, measure, summarize
+from .scheduler import Scheduler
+from .schedules import firing_times
+
+logger = logging.getLogger(__name__)
+
+
+class EngineException(Exception):
+    pass
+
+
+class ScenarioLogger(logging.LoggerAdapter):
+    """
+    Prefixes every record with the name of the scenario it belongs to.
+    """
+
+    def process(self, msg, kwargs):
+        return "[{}] {}".format(self.extra["scenario"], msg), kwargs
+
+
+@attr.s
+class ActionResult(object):
+    """
+    Outcome of a single action of a scenario.
+    """
+
+    name = attr.ib()
+    target_host = attr.ib()
+    triggered = attr.ib(default=False)
+    success = attr.ib(default=None)
+    # seconds the trigger started after its scheduled time
+    jitter = attr.ib(default=None)
+    # HostResult of every target host
+    hosts = attr.ib(default=attr.Factory(list))
+    # seconds from the match, or the scheduled time, to the command
+    latency = attr.ib(default=None)
+
+    @property
+    def recoveries(self):
+        return [host.recovery for host in self.hosts if host.recovery is not None]
+
+
+@attr.s
+class ScenarioResult(object):
+    """
+    Outcome of a whole scenario.
+    """
+
+    name = attr.ib()
+    actions = attr.ib(default=attr.Factory(list))
+    error = attr.ib(default=None)
+    duration = attr.ib(default=None)
+    # load measured by the observer, by phase
+    observation = attr.ib(default=None)
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+    def recovery(self):
+        """
+        Returns the recovery summary of every probed action, by name, over
+        all its hosts and runs.
+        """
+        recoveries = {}
+        for action in self.actions:
+            if action.recoveries:
+                recoveries.setdefault(action.name, []).extend(action.recoveries)
+        return {name: summarize(values) for name, values in recoveries.items()}
+
+
+async def _aiter(iterable):
+    for element in iterable:
+        yield element
+
+
+class Engine(object):
+    """
+    Runs independent scenarios concurrently on the event loop.
+
+    At most `max_parallel` scenarios run at once and at most `max_per_host`
+    of them may involve the same host, either as listener or as target.
+    With a `state_file`, listeners resume after the last matched line.
+    With `match_workers`, log lines are searched by that many processes,
+    each batch staying there at most about `max_match_latency` seconds.
+    With an `output_dir`, the output of every action on every host is
+    written there.
+    """
+
+    def __init__(
+        self,
+        ssh_host_key,
+        max_parallel=MAX_PARALLEL,
+        max_per_host=MAX_PER_HOST,
+        pool=None,
+        broker=None,
+        max_line_length=MAX_LINE_LENGTH,
+        state_file=None,
+        match_workers=MATCH_WORKERS,
+        max_match_latency=MAX_MATCH_LATENCY,
+        output_dir=None,
+    ):
+        if max_parallel < 1 or max_per_host < 1:
+            raise EngineException("Parallelism limits must be positive integers")
+        self.ssh_host_key = ssh_host_key
+        self.max_parallel = max_parallel
+        self.max_per_host = max_per_host
+        self.output_dir = output_dir
+        if output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+        self.pool = pool if pool is not None else ConnectionPool()
+        self.workers = None
+        if broker is None:
+            offsets = OffsetStore(state_file) if state_file else None
+            if match_workers:
+                self.workers = MatchWorkers(match_workers, max_match_latency)
+            broker = TailBroker(
+                self.pool,
+                max_line_length=max_line_length,
+                offsets=offsets,
+                workers=self.workers,
+            )
+        self.broker = broker
+        self.scheduler = Scheduler()
+        self._slots = asyncio.Semaphore(max_parallel)
+        self._hosts = {}
+
+    def _host_slots(self, scenario):
+        hosts = set()
+        if scenario.listener is not None:
+            hosts.add(scenario.listener.target)
+        for action in scenario.actions:
+            hosts.update(action.hosts)
+        slots = []
+        for host in sorted(hosts):
+            if host not in self._hosts:
+                self._hosts[host] = asyncio.Semaphore(self.max_per_host)
+            slots.append(self._hosts[host])
+        return slots
+
+    async def run(self, scenarios):
+        """
+        Plays every scenario and waits for all of them.
+
+        Args:
+            scenarios (list): Disruption objects to play
+        Returns:
+            list(ScenarioResult): results in the order of `scenarios`
+        """
+        return await asyncio.gather(*[self.play(scenario) for scenario in scenarios])
+
+    async def stream(self, scenarios, window=None):
+        """
+        Plays scenarios as they come and yields their results as they
+        finish.
+
+        At most `window` scenarios, 4 times `max_parallel` by default, are
+        waiting for their hosts or playing, the next ones are only taken
+        from `scenarios` once one of them finished. If `scenarios` fails,
+        the ones taken still finish before the error is raised.
+
+        Args:
+            scenarios (iterable): Disruption objects to play, or an
+                asynchronous iterable of them
+        Yields:
+            ScenarioResult: results in the order scenarios finished
+        """
+        window = window or 4 * self.max_parallel
+        if not hasattr(scenarios, "__anext__"):
+            scenarios = _aiter(scenarios)
+        pending = set()
+        # The next scenario is awaited along with the ones playing, so
+        # results are yielded while it is read.
+        taking = None
+        exhausted = False
+        failure = None
+        try:
+            while True:
+                if taking is None and not exhausted and len(pending) < window:
+                    taking = asyncio.ensure_future(scenarios.__anext__())
+                waiting = pending if taking is None else pending | {taking}
+                if not waiting:
+                    break
+                done, _ = await asyncio.wait(
+                    waiting, return_when=asyncio.FIRST_COMPLETED
+                )
+                if taking in done:
+                    done.discard(taking)
+                    try:
+                        pending.add(asyncio.ensure_future(self.play(taking.result())))
+                    except StopAsyncIteration:
+                        exhausted = True
+                    except Exception as exc:
+                        exhausted = True
+                        failure = exc
+                    taking = None
+                pending -= done
+                for task in done:
+                    yield task.result()
+        finally:
+            # Left early: the scenarios playing and the source are stopped.
+            stopped = [task for task in pending | {taking} if task is not None]
+            for task in stopped:
+                task.cancel()
+            await asyncio.gather(*stopped, return_exceptions=True)
+            if hasattr(scenarios, "aclose"):
+                await scenarios.aclose()
+        if failure is not None:
+            raise failure
+
+    async def play(self, scenario):
+        # Host slots are taken in a stable order so scenarios sharing
+        # hosts cannot deadlock each other.
+        slots = self._host_slots(scenario)
+        acquired = []
+        try:
+            for slot in slots:
+                await slot.acquire()
+                acquired.append(slot)
+            async with self._slots:
+                return await self.run_scenario(scenario)
+        finally:
+            for slot in acquired:
+                slot.release()
+
+    async def run_scenario(self, scenario):
+        log = ScenarioLogger(logger, {"scenario": scenario.name})
+        result = ScenarioResult(name=scenario.name)
+        start = time.monotonic()
+        log.info("Starting")
+        observation = None
+        if scenario.observer is not None:
+            observation = Observation(scenario.observer, self.scheduler)
+            observation.start()
+        try:
+            if observation is not None:
+                await self._observe(scenario.observer.warmup)
+            if scenario.schedule is not None:
+                await self._play_schedule(scenario, result, log, observation)
+            else:
+                await self._play_listener(scenario, result, log, observation)
+            if observation is not None:
+                await self._observe(scenario.observer.cooldown)
+        except AssertionError as err:
+            log.error(err)
+            result.error = str(err)
+        except (OSError, Error) as exc:
+            log.error("SSH connection failed: {}".format(exc))
+            result.error = str(exc)
+        except Exception as exc:
+            # One broken scenario must not stop the others.
+            log.exception("Failed: {}".format(exc))
+            result.error = "{}: {}".format(type(exc).__name__, exc)
+        finally:
+            if observation is not None:
+                await observation.stop()
+                result.observation = observation.summary()
+        result.duration = time.monotonic() - start
+        log.info("Finished in {:.2f}s".format(result.duration))
+        return result
+
+    async def _observe(self, seconds):
+        await self.scheduler.sleep_until(self.scheduler.time() + seconds)
+
+    async def _play_listener(self, scenario, result, log, observation=None):
+        alistener = Alistener(
+            scenario.listener.target,
+            scenario.listener.username,
+            scenario.listener.password,
+            self.ssh_host_key,
+            broker=self.broker,
+            prefilter=getattr(scenario.listener, "prefilter", False),
+            log=log,
+        )
+        # Partial sequences and counts carry over from one action to the next.
+        matcher = self._matcher(scenario.listener)
+        previous = self.scheduler.time()
+        for action in scenario.actions:
+            action_result = ActionResult(
+                name=action.name, target_host=action.target_host
+            )
+            result.actions.append(action_result)
+            trigger, arming = self._arm(scenario, action, log)
+            try:
+                if action.after == AFTER_PREVIOUS:
+                    event = previous
+                else:
+                    found = await self._listen(
+                        alistener, scenario.listener, action.timeout, matcher
+                    )
+                    if not found:
+                        log.info("No occurrence within {}s".format(action.timeout))
+                        continue
+                    event = self.scheduler.time()
+                await self._trigger(
+                    trigger, arming, action_result, event, log, observation
+                )
+                previous = self.scheduler.time()
+            finally:
+                await self._disarm(trigger, arming)
+
+    async def _play_schedule(self, scenario, result, log, observation=None):
+        # Firings overlap when actions last longer than the gap between
+        # them, so a slow host does not shift the schedule. Each firing
+        # starts when the previous one is due, to connect in the meantime.
+        firings = set()
+        try:
+            for when in firing_times(scenario.schedule, self.scheduler.time()):
+                for firing in [firing for firing in firings if firing.done()]:
+                    firings.discard(firing)
+                    firing.result()
+                firings.add(
+                    asyncio.ensure_future(
+                        self._fire(scenario, when, result, log, observation)
+                    )
+                )
+                await self.scheduler.sleep_until(when)
+            if firings:
+                await asyncio.gather(*firings)
+        finally:
+            for firing in firings:
+                firing.cancel()
+
+    async def _fire(self, scenario, when, result, log, observation=None):
+        previous = when
+        for action in scenario.actions:
+            action_result = ActionResult(
+                name=action.name, target_host=action.target_host
+            )
+            result.actions.append(action_result)
+            event = previous if action.after == AFTER_PREVIOUS else when
+            trigger, arming = self._arm(scenario, action, log)
+            try:
+                await self._trigger(
+                    trigger, arming, action_result, event, log, observation
+                )
+            finally:
+                await self._disarm(trigger, arming)
+            previous = self.scheduler.time()
+
+    def _arm(self, scenario, action, log):
+        """
+        Returns the Trigger of `action` and the task connecting it to the
+        target hosts, so that connecting overlaps the wait for the event.
+        """
+        _username = action.username if action.username else "root"
+        trigger = Trigger(
+            action,
+            _username,
+            action.password,
+            self.ssh_host_key,
+            self.pool,
+            output_dir=self.output_dir,
+            label="{}_{}".format(scenario.name, action.name),
+            log=log,
+        )
+        return trigger, asyncio.ensure_future(trigger.arm(action.shell))
+
+    async def _disarm(self, trigger, arming):
+        arming.cancel()
+        await asyncio.gather(arming, return_exceptions=True)
+        await trigger.disarm()
+
+    async def _trigger(
+        self, trigger, arming, action_result, event, log, observation=None
+    ):
+        action = trigger.action
+        start_at = event + action.wait
+        await self.scheduler.sleep_until(start_at)
+        action_result.jitter = self.scheduler.time() - start_at
+        await arming
+        log.info("Triggering: {}".format(action.name))
+        disruption = getattr(trigger, action.name)
+        if observation is None:
+            await self._disrupt(trigger, disruption, action_result, event, log)
+            return
+        # The disruption lasts until the hosts recovered, when probed.
+        observation.disruption_started()
+        try:
+            await self._disrupt(trigger, disruption, action_result, event, log)
+        finally:
+            observation.disruption_ended()
+
+    async def _disrupt(self, trigger, disruption, action_result, event, log):
+        action = trigger.action
+        action_result.triggered = True
+        action_result.success = await disruption()
+        action_result.hosts = trigger.results
+        fired = [host.fired_at for host in trigger.results if host.fired_at]
+        if fired:
+            action_result.latency = min(fired) - event
+            log.info(
+                "{} fired {:.1f}ms after the event, {}s wait included".format(
+                    action.name, action_result.latency * 1000, action.wait
+                )
+            )
+        if action.probe is not None:
+            await self._probe(trigger, log)
+
+    async def _probe(self, trigger, log):
+        probe = trigger.action.probe
+        disrupted = [host for host in trigger.results if host.fired_at is not None]
+        recoveries = await asyncio.gather(
+            *[
+                measure(
+                    probe,
+                    host.host,
+                    host.fired_at,
+                    self.scheduler,
+                    functools.partial(
+                        check,
+                        probe,
+                        host.host,
+                        self.pool,
+                        trigger.username,
+                        trigger.password,
+                        self.ssh_host_key,
+                    ),
+                )
+                for host in disrupted
+            ]
+        )
+        for host, recovery in zip(disrupted, recoveries):
+            host.recovery = recovery
+            if recovery.recovered:
+                log.info(
+                    "{} recovered {:.2f}s after the disruption, first success "
+                    "after {:.2f}s".format(
+                        host.host,
+                        recovery.time_to_recover,
+                        recovery.time_to_first_success,
+                    )
+                )
+            else:
+                log.warning(
+                    "{} did not recover within {}s".format(host.host, probe.timeout)
+                )
+
+    def _matcher(self, listener):
+        if getattr(listener, "correlated", False):
+            return CorrelationMatcher(listener.regex, listener.window, listener.key)
+        if getattr(listener, "threshold", None) is not None:
+            return ThresholdMatcher(listener.regex, listener.threshold, listener.window)
+        return None
+
+    async def _listen(self, alistener, listener, timeout, matcher=None):
+        if isinstance(listener, JournaldListener):
+            fields = dict(listener.fields)
+            if listener.regex is not None:
+                fields[MESSAGE_FIELD] = listener.regex
+            journal = Journal(listener.unit, listener.priority, listener.matches)
+            return await alistener.journal(journal, JournalMatcher(fields), timeout)
+        if matcher is not None:
+            return await alistener.follow(listener.log, matcher, timeout)
+        return await alistener.tail(listener.log, listener.regex, timeout)
+
+    async def close(self):
+        await self.broker.close()
+        await self.pool.close()
+        if self.workers is not None:
+            self.workers.close()
+        self.scheduler.close()
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+"""
+Load on a service endpoint, measured while a scenario disrupts it.
+"""
+
+import asyncio
+import logging
+import ssl
+import urllib.parse
+
+from ..parsers.config import TCP_OBSERVER
+
+logger = logging.getLogger(__name__)
+
+HIGHEST_LATENCY = 60.0  # seconds, longer latencies are recorded as this
+SIGNIFICANT_DIGITS = 2
+TICK = 0.01  # seconds between two launches of due requests
+PHASES = ("before", "during", "after")
+
+
+class Histogram(object):
+    """
+    Latencies in log-linear buckets, as in HdrHistogram.
+
+    Values are recorded in microseconds with `significant_digits` of
+    precision up to `highest` seconds. Recording is a couple of integer
+    operations and memory does not depend on the number of values.
+    """
+
+    def __init__(self, highest=HIGHEST_LATENCY, significant_digits=SIGNIFICANT_DIGITS):
+        self.highest = int(highest * 1e6)
+        self.sub_bits = (2 * 10**significant_digits - 1).bit_length()
+        self.sub_count = 1 << self.sub_bits
+        self.half = self.sub_count // 2
+        self.counts = [0] * (self._index(self.highest) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _index(self, value):
+        if value < self.sub_count:
+            return value
+        shift = value.bit_length() - self.sub_bits
+        return self.sub_count + (shift - 1) * self.half + (value >> shift) - self.half
+
+    def _highest_equivalent(self, index):
+        if index < self.sub_count:
+            return index
+        shift, sub = divmod(index - self.sub_count, self.half)
+        return ((sub + self.half + 1) << (shift + 1)) - 1
+
+    def record(self, seconds):
+        value = min(max(int(seconds * 1e6), 0), self.highest)
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, percent):
+        """
+        Returns the latency, in seconds, `percent` of the values are at most.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(percent / 100.0 * self.count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._highest_equivalent(index) / 1e6, self.max)
+        return self.max
+
+
+class HttpClient(object):
+    """
+    GET requests to `url` over at most `connections` kept alive connections.
+    """
+
+    def __init__(self, url, connections):
+        parts = urllib.parse.urlsplit(url)
+        self.secure = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.secure else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        self.request_bytes = (
+            "GET {} HTTP/1.1\r\nHost: {}\r\n\r\n".format(path, parts.netloc)
+        ).encode("ascii")
+        self._slots = asyncio.Semaphore(connections)
+        self._idle = []
+
+    async def _open(self):
+        return await asyncio.open_connection(
+            self.host,
+            self.port,
+            ssl=ssl.create_default_context() if self.secure else None,
+        )
+
+    async def get(self):
+        """
+        Returns the status of a GET request.
+        """
+        async with self._slots:
+            reader, writer = self._idle.pop() if self._idle else await self._open()
+            try:
+                writer.write(self.request_bytes)
+                status, reusable = await _response(reader)
+            except BaseException:
+                writer.close()
+                raise
+            if reusable:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return status
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+
+async def _response(reader):
+    status_line = await reader.readline()
+    try:
+        status = int(status_line.split()[1])
+    except (IndexError, ValueError):
+        raise ConnectionError("Invalid HTTP response {!r}".format(status_line))
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed in HTTP headers")
+        if line in (b"\r\n", b"\n"):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get("connection") != "close"
+
+
+class Observation(object):
+    """
+    Sends requests to the endpoint of an Observer at a fixed rate and
+    records their latency and errors in the phase they were sent in:
+    before the first disruption, during disruptions or after them.
+
+    Requests are sent on time whatever the previous ones became, and their
+    latency counts from that time, so a stalled service shows up as high
+    latencies instead of fewer requests. At most `rate * timeout` requests
+    are pending, the ones beyond are dropped and counted as errors.
+    """
+
+    def __init__(self, observer, scheduler):
+        self.observer = observer
+        self.scheduler = scheduler
+        self.histograms = {phase: Histogram() for phase in PHASES}
+        self.errors = dict.fromkeys(PHASES, 0)
+        self.dropped = dict.fromkeys(PHASES, 0)
+        self.phase = PHASES[0]
+        self._disruptions = 0
+        self._pending = set()
+        self._max_pending = max(1, int(observer.rate * observer.timeout))
+        self._task = None
+        self._client = None
+        if observer.kind != TCP_OBSERVER:
+            self._client = HttpClient(observer.url, observer.connections)
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    def disruption_started(self):
+        self._disruptions += 1
+        self.phase = PHASES[1]
+
+    def disruption_ended(self):
+        self._disruptions -= 1
+        if not self._disruptions:
+            self.phase = PHASES[2]
+
+    async def _run(self):
+        start = self.scheduler.time()
+        sent = 0
+        while True:
+            now = self.scheduler.time()
+            due = int((now - start) * self.observer.rate) + 1
+            for index in range(sent, due):
+                self._send(start + index / self.observer.rate)
+            sent = due
+            await self.scheduler.sleep_until(now + TICK)
+
+    def _send(self, intended):
+        if len(self._pending) >= self._max_pending:
+            self.dropped[self.phase] += 1
+            self.errors[self.phase] += 1
+            return
+        request = asyncio.ensure_future(self._request(intended, self.phase))
+        self._pending.add(request)
+        request.add_done_callback(self._pending.discard)
+
+    async def _request(self, intended, phase):
+        try:
+            ok = await asyncio.wait_for(self._call(), self.observer.timeout)
+        except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError, ValueError):
+            # ValueError: a malformed chunk size
+            ok = False
+        self.histograms[phase].record(self.scheduler.time() - intended)
+        if not ok:
+            self.errors[phase] += 1
+
+    async def _call(self):
+        if self._client is None:
+            _, writer = await asyncio.open_connection(
+                self.observer.host, self.observer.port
+            )
+            writer.close()
+            return True
+        status = await self._client.get()
+        if self.observer.status is not None:
+            return status == self.observer.status
+        return status < 400
+
+    async def stop(self):
+        """
+        Stops sending requests, the pending ones are cancelled.
+        """
+        tasks = list(self._pending)
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._client is not None:
+            self._client.close()
+        logger.debug("Stopped observing %s", self.observer.url or self.observer.host)
+
+    def summary(self):
+        """
+        Returns, by phase, the number of requests, errors, error rate and
+        latency percentiles in seconds.
+        """
+        summary = {}
+        for phase in PHASES:
+            histogram = self.histograms[phase]
+            requests = histogram.count + self.dropped[phase]
+            if not requests:
+                continue
+            summary[phase] = {
+                "requests": requests,
+                "errors": self.errors[phase],
+                "error_rate": self.errors[phase] / float(requests),
+                "mean": histogram.total / histogram.count if histogram.count else 0.0,
+                "p50": histogram.percentile(50),
+                "p90": histogram.percentile(90),
+                "p99": histogram.percentile(99),
+                "p999": histogram.percentile(99.9),
+                "max": histogram.max,
+            }
+        return summary
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""
+Recovery of disrupted services, measured by polling a probe.
+"""
+
+import asyncio
+import ssl
+import urllib.parse
+
+import attr
+from asyncssh import Error
+
+from ..parsers.config import COMMAND_PROBE, TCP_PROBE
+
+ATTEMPT_TIMEOUT = 5  # seconds a single poll may take
+PERCENTILES = (50, 90, 99)
+
+
+@attr.s
+class Recovery(object):
+    """
+    How long a host took to recover, in seconds from the disruption.
+    """
+
+    host = attr.ib()
+    recovered = attr.ib(default=False)
+    attempts = attr.ib(default=0)
+    time_to_first_success = attr.ib(default=None)
+    time_to_recover = attr.ib(default=None)
+
+
+async def _http_status(url):
+    parts = urllib.parse.urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, port, ssl=ssl.create_default_context() if secure else None
+    )
+    try:
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        writer.write(
+            "GET {} HTTP/1.1\r\nHost: {}\r\nConnection: close\r\n\r\n".format(
+                path, parts.netloc
+            ).encode("ascii")
+        )
+        status_line = await reader.readline()
+    finally:
+        writer.close()
+    try:
+        return int(status_line.split()[1])
+    except (IndexError, ValueError):
+        raise ConnectionError("Invalid HTTP response from {}".format(url))
+
+
+async def check(probe, host, pool, username, password, client_keys):
+    """
+    Polls `probe` once for `host`, returns whether it succeeded.
+    """
+    if probe.kind == COMMAND_PROBE:
+        async with pool.connection(host, username, password, client_keys) as conn:
+            result = await conn.run(probe.command, check=False)
+        return result.exit_status == 0
+    if probe.kind == TCP_PROBE:
+        _, writer = await asyncio.open_connection(host, probe.port)
+        writer.close()
+        return True
+    status = await _http_status(probe.url.format(host=host))
+    return status == probe.status if probe.status is not None else status < 400
+
+
+async def measure(probe, host, since, scheduler, poll):
+    """
+    Polls until `probe.successes` polls in a row succeeded or until
+    `probe.timeout` seconds after `since`, a time of `scheduler.time()`.
+
+    Args:
+        probe (Probe): how to poll
+        host (str): disrupted host
+        since (float): time of the disruption
+        scheduler (Scheduler): clock and timers
+        poll (callable): coroutine function returning whether a poll
+            succeeded
+    Returns:
+        Recovery: times to the first success and to the recovery
+    """
+    recovery = Recovery(host)
+    deadline = since + probe.timeout
+    delay = probe.interval
+    streak = 0
+    while scheduler.time() < deadline:
+        recovery.attempts += 1
+        try:
+            healthy = await asyncio.wait_for(
+                poll(), min(ATTEMPT_TIMEOUT, deadline - scheduler.time())
+            )
+        except (asyncio.TimeoutError, OSError, Error):
+            healthy = False
+        now = scheduler.time()
+        if healthy:
+            streak += 1
+            if recovery.time_to_first_success is None:
+                recovery.time_to_first_success = now - since
+            if streak >= probe.successes:
+                recovery.recovered = True
+                recovery.time_to_recover = now - since
+                return recovery
+            # Consecutive successes are checked at the base interval.
+            delay = probe.interval
+        else:
+            streak = 0
+        await scheduler.sleep_until(min(now + delay, deadline))
+        if not healthy:
+            delay = min(delay * probe.backoff, probe.max_interval)
+    return recovery
+
+
+def _distribution(values):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    summary = {
+        "p{}".format(percent): ordered[int(round(percent / 100.0 * (len(ordered) - 1)))]
+        for percent in PERCENTILES
+    }
+    summary["max"] = ordered[-1]
+    return summary
+
+
+def summarize(recoveries):
+    """
+    Aggregates recoveries, from several hosts or runs of an action.
+
+    Returns:
+        dict: count of probed and recovered hosts, with the percentiles and
+        maximum of the times to first success and to recover
+    """
+    return {
+        "count": len(recoveries),
+        "recovered": len([recovery for recovery in recoveries if recovery.recovered]),
+        "first_success": _distribution(
+            recovery.time_to_first_success
+            for recovery in recoveries
+            if recovery.time_to_first_success is not None
+        ),
+        "recover": _distribution(
+            recovery.time_to_recover for recovery in recoveries if recovery.recovered
+        ),
+    }
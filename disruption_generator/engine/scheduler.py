@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import collections
+import heapq
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MAX_SAMPLES = 10000  # jitter samples kept for percentiles
+# The event loop runs handles due within its clock resolution.
+RESOLUTION = time.get_clock_info("monotonic").resolution
+
+
+class JitterStats(object):
+    """
+    Lateness of fired timers, in seconds.
+
+    Count, mean and maximum cover every timer, percentiles the last
+    `max_samples` of them.
+    """
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = collections.deque(maxlen=max_samples)
+
+    def add(self, lateness):
+        self.count += 1
+        self.total += lateness
+        self.max = max(self.max, lateness)
+        self.samples.append(lateness)
+
+    def percentile(self, percent):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        rank = int(round(percent / 100.0 * (len(ordered) - 1)))
+        return ordered[rank]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class Timer(object):
+    """
+    A pending call of a Scheduler.
+    """
+
+    __slots__ = ("scheduler", "when", "callback", "args", "cancelled")
+
+    def __init__(self, scheduler, when, callback, args):
+        self.scheduler = scheduler
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.scheduler.cancel(self)
+
+
+class Scheduler(object):
+    """
+    Runs callbacks at absolute times of the event loop clock.
+
+    Pending timers live in a heap and only the earliest one holds an event
+    loop handle, so many thousands of them cost a heap entry each.
+    Cancelled timers are dropped lazily, the heap is rebuilt when they make
+    up most of it. The lateness of every fired timer is kept in `jitter`
+    and the time spent on bookkeeping, callbacks excluded, in `overhead`.
+    """
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self.loop = asyncio.get_event_loop()
+        self.jitter = JitterStats(max_samples)
+        self.overhead = 0.0
+        self.scheduled = 0
+        self._heap = []
+        self._sequence = itertools.count()
+        self._cancelled = 0
+        self._handle = None
+
+    def time(self):
+        return self.loop.time()
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def call_at(self, when, callback, *args):
+        """
+        Calls `callback(*args)` at `when`, a time of `time()`.
+
+        Returns:
+            Timer: handle to cancel the call
+        """
+        started = time.perf_counter()
+        timer = Timer(self, when, callback, args)
+        heapq.heappush(self._heap, (when, next(self._sequence), timer))
+        if self._heap[0][2] is timer:
+            self._arm()
+        self.scheduled += 1
+        self.overhead += time.perf_counter() - started
+        return timer
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.time() + delay, callback, *args)
+
+    def cancel(self, timer):
+        if not timer.cancelled:
+            timer.cancelled = True
+            self._cancelled += 1
+            if self._cancelled > len(self._heap) // 2:
+                self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+
+    async def sleep_until(self, when):
+        """
+        Waits until `when`, a time of `time()`.
+        """
+        future = self.loop.create_future()
+        timer = self.call_at(when, _wake, future)
+        try:
+            await future
+        finally:
+            timer.cancel()
+
+    def _arm(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._heap:
+            self._handle = self.loop.call_at(self._heap[0][0], self._fire)
+
+    def _fire(self):
+        started = time.perf_counter()
+        self._handle = None
+        now = self.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now + RESOLUTION:
+            _, _, timer = heapq.heappop(self._heap)
+            if timer.cancelled:
+                self._cancelled -= 1
+                continue
+            timer.cancelled = True  # fired, later cancels are no-ops
+            self.jitter.add(max(0.0, now - timer.when))
+            due.append(timer)
+        self._arm()
+        self.overhead += time.perf_counter() - started
+        for timer in due:
+            try:
+                timer.callback(*timer.args)
+            except Exception:
+                logger.exception("Scheduled call %r failed", timer.callback)
+
+    def stats(self):
+        """
+        Returns the jitter summary along with the scheduling overhead, in
+        total and per scheduled timer.
+        """
+        stats = self.jitter.summary()
+        stats["scheduled"] = self.scheduled
+        stats["overhead"] = self.overhead
+        stats["overhead_per_timer"] = (
+            self.overhead / self.scheduled if self.scheduled else 0.0
+        )
+        return stats
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._heap = []
+        self._cancelled = 0
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
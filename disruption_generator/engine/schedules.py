@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""
+Firing times of scenarios played on a schedule instead of a listener.
+"""
+
+import datetime
+import random
+import time
+
+from ..parsers.config import CRON_SCHEDULE, POISSON_SCHEDULE, RATE_SCHEDULE
+
+# (name, lowest, highest) of the fields of a cron expression
+CRON_FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day of month", 1, 31),
+    ("month", 1, 12),
+    ("day of week", 0, 7),  # 0 and 7 are Sunday
+)
+
+
+class ScheduleException(Exception):
+    pass
+
+
+def _cron_field(text, name, low, high):
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError("step must be positive")
+        if part == "*":
+            first, last = low, high
+        elif "-" in part:
+            first, last = (int(bound) for bound in part.split("-", 1))
+        else:
+            first = int(part)
+            last = high if step > 1 else first
+        if not low <= first <= last <= high:
+            raise ValueError("{} out of {}-{}".format(part, low, high))
+        values.update(range(first, last + 1, step))
+    if name == "day of week":
+        values = set(value % 7 for value in values)
+    return frozenset(values)
+
+
+class Cron(object):
+    """
+    A five field cron expression: minute, hour, day of month, month and day
+    of week, each `*`, a value, a range or a list of them with optional
+    `/step`. As in cron, when both day fields are restricted a day matching
+    either of them matches.
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != len(CRON_FIELDS):
+            raise ScheduleException(
+                "Cron expression '{}' must have {} fields".format(
+                    expression, len(CRON_FIELDS)
+                )
+            )
+        try:
+            (
+                self.minutes,
+                self.hours,
+                self.days,
+                self.months,
+                self.weekdays,
+            ) = (
+                _cron_field(text, name, low, high)
+                for text, (name, low, high) in zip(fields, CRON_FIELDS)
+            )
+        except ValueError as exc:
+            raise ScheduleException(
+                "Invalid cron expression '{}': {}".format(expression, exc)
+            )
+        self.expression = expression
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        # cron counts days of the week from Sunday
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day:
+            return weekday
+        if self._any_weekday:
+            return day
+        return day or weekday
+
+    def next_after(self, moment):
+        """
+        Returns the first matching minute strictly after `moment`.
+        """
+        moment = moment.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = moment + datetime.timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                year = moment.year + moment.month // 12
+                moment = moment.replace(
+                    year=year, month=moment.month % 12 + 1, day=1, hour=0, minute=0
+                )
+            elif not self._day_matches(moment):
+                moment = (moment + datetime.timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + datetime.timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += datetime.timedelta(minutes=1)
+            else:
+                return moment
+        raise ScheduleException("'{}' never matches".format(self.expression))
+
+
+def _fixed_rate(schedule, start, wall_start):
+    tick = 1
+    while True:
+        yield start + tick * schedule.interval
+        tick += 1
+
+
+def _poisson(schedule, start, wall_start):
+    rng = random.Random(schedule.seed)
+    when = start
+    while True:
+        when += rng.expovariate(1.0 / schedule.interval)
+        yield when
+
+
+def _cron(schedule, start, wall_start):
+    cron = Cron(schedule.cron)
+    moment = datetime.datetime.fromtimestamp(wall_start)
+    while True:
+        moment = cron.next_after(moment)
+        yield start + time.mktime(moment.timetuple()) - wall_start
+
+
+GENERATORS = {
+    RATE_SCHEDULE: _fixed_rate,
+    POISSON_SCHEDULE: _poisson,
+    CRON_SCHEDULE: _cron,
+}
+
+
+def firing_times(schedule, start, wall_start=None):
+    """
+    Yields the times, on the clock `start` is read from, at which a
+    scheduled scenario fires, until its `count` or `duration` is reached.
+
+    Fixed rates fire every `interval` seconds without drifting, Poisson
+    arrivals after exponentially distributed gaps of mean `interval`
+    seconds, seeded by `seed` to be repeatable, and cron schedules on every
+    matching minute of the local wall clock.
+
+    Args:
+        schedule (Schedule): schedule of the scenario
+        start (float): current time of the scheduling clock
+        wall_start (float): current wall clock time, `time.time()` if None
+    """
+    wall_start = time.time() if wall_start is None else wall_start
+    end = None if schedule.duration is None else start + schedule.duration
+    times = GENERATORS[schedule.kind](schedule, start, wall_start)
+    for fired, when in enumerate(times):
+        if schedule.count is not None and fired >= schedule.count:
+            return
+        if end is not None and when > end:
+            return
+        yield when
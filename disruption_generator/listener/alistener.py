@@ -1,10 +1,10 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
-import re
 import logging
 
-from asyncssh import SSHClient, create_connection
+from .broker import TailBroker
+from .matchers import RegexMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -14,45 +14,74 @@ class AlistenerException(Exception):
 
 
 class Alistener(object):
-    def __init__(self, hostname, username, password, ssh_host_key):
+    def __init__(
+        self,
+        hostname,
+        username,
+        password,
+        ssh_host_key,
+        pool=None,
+        broker=None,
+        prefilter=False,
+        log=None,
+    ):
         self.hostname = hostname
         self.username = username
         self.password = password
         self.ssh_host_key = ssh_host_key
-        self.files = []
+        # A broker created here is closed by `close`.
+        self._own_broker = broker is None
+        self.broker = broker if broker is not None else TailBroker(pool)
+        self.prefilter = prefilter
+        # Logger, or adapter naming the scenario, of the subscriptions.
+        self.log = log if log is not None else logger
+
+    async def close(self):
+        """
+        Closes the broker the listener created, and the pool it created.
+        """
+        if self._own_broker:
+            await self.broker.close()
 
     async def run_client(self, filepath, expression, timeout):
-        conn, client = await create_connection(
-            SSHClient,
-            host=self.hostname,
-            known_hosts=None,
-            username=self.username,
-            password=self.password,
-            client_keys=self.ssh_host_key,
+        return await self.follow(filepath, RegexMatcher(expression), timeout)
+
+    async def follow(self, filepath, matcher, timeout=3):
+        subscription = self.broker.subscribe(
+            self.hostname,
+            self.username,
+            self.password,
+            self.ssh_host_key,
+            filepath,
+            matcher,
+            prefilter=self.prefilter,
+            log=self.log,
         )
-        async with conn:
-            logger.debug("Connected to %s", self.hostname)
-            stdin, stdout, stderr = await conn.open_session(
-                "tail -F {}".format(filepath)
-            )
-
-            async def match():
-                while True:
-                    output = await stdout.readline()
-                    m = re.search(expression, output)
-                    if m and m.group(0):
-                        logger.debug("Found occurrence: %s", output)
-                        stdin.write("\x03")
-                        return True
-
-            try:
-                return await asyncio.wait_for(match(), timeout)
-            except asyncio.TimeoutError:
-                logger.debug("Found no results")
-                return False
+        return await self._wait(subscription, timeout)
+
+    async def _wait(self, subscription, timeout):
+        try:
+            output = await asyncio.wait_for(subscription.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.log.debug("Found no results")
+            return False
+        finally:
+            subscription.close()
+        self.log.debug("Found occurrence: %s", output)
+        return True
 
     async def tail(self, filepath, expression, timeout=3):
-        if not filepath.lower() in self.files:
-            self.files.append(filepath.lower())
-            result = await self.run_client(filepath, expression, timeout)
-            return result
+        result = await self.run_client(filepath, expression, timeout)
+        return result
+
+    async def journal(self, journal, matcher, timeout=3):
+        subscription = self.broker.subscribe_journal(
+            self.hostname,
+            self.username,
+            self.password,
+            self.ssh_host_key,
+            journal,
+            matcher,
+            log=self.log,
+        )
+        return await self._wait(subscription, timeout)
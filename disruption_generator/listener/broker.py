@@ -0,0 +1,507 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import bisect
+import collections
+import itertools
+import logging
+import shlex
+
+from ..connection.pool import ConnectionPool
+from .literals import LiteralIndex
+from .local import LOCAL_HOSTS, LocalTail, is_local, local_path
+from .prefilter import grep_command
+from .reader import CHUNK_SIZE, MAX_LINE_LENGTH, ChunkReader
+from .workers import offloadable
+
+logger = logging.getLogger(__name__)
+
+LINGER = 5  # seconds a stream outlives its last subscriber
+MAX_BACKLOG = 1024 * 1024  # bytes kept for subscribers joining a live stream
+TAIL_LINES = 10
+# Fewer subscribers with literals search the buffer each on their own:
+# benchmarks/literal_index.py took 1.17 ms per chunk with the index against
+# 0.17 ms without for 2 patterns, broke even around 6 and won 1.1x with 8,
+# 1.6x with 16.
+MIN_INDEXED = 8
+
+# Resumes `tail -F` at a byte offset of the current file and reports the
+# inode and offset it started from on stderr.
+RESUME_COMMAND = (
+    'f={path}; set -- $(stat -L -c "%i %s" "$f" 2>/dev/null || echo 0 0); '
+    'start={start}; echo "$1 $start" >&2; tail -c +$((start + 1)) -F "$f"'
+)
+LAST_LINES_START = '$(($2 - $(tail -n {lines} "$f" 2>/dev/null | wc -c)))'
+RESUME_START = (
+    '$([ "$1" = {inode} ] && [ "$2" -ge {offset} ] && echo {offset} || echo 0)'
+)
+
+
+class BrokerException(Exception):
+    pass
+
+
+class Subscription(object):
+    """
+    A matcher attached to a shared tail stream.
+
+    The subscription resolves with the first line accepted by its matcher.
+    Its records go to `log`, the logger of this module by default.
+    """
+
+    def __init__(self, stream, matcher, log=None):
+        self.stream = stream
+        self.matcher = matcher
+        self.log = log if log is not None else logger
+        self.future = asyncio.get_event_loop().create_future()
+
+    async def wait(self):
+        return await self.future
+
+    def feed(self, buf):
+        """
+        Returns the offset in `buf` right after the matching line, if any.
+        """
+        if self.future.done():
+            return None
+        return self.resolve(self.matcher.search(buf))
+
+    def resolve(self, found):
+        """
+        Resolves with the (end, line) match found for this subscription.
+        Returns `end`, None when there is no match.
+        """
+        if found is None or self.future.done():
+            return None
+        self.future.set_result(found[1])
+        self.close()
+        return found[0]
+
+    def feed_lines(self, buf, spans):
+        """
+        Like `feed` but only the lines of `buf` at `spans` are searched.
+        """
+        if not spans:
+            return None
+        found = self.feed(b"".join(buf[start:end] for start, end in spans))
+        if found is None:
+            return None
+        # Maps the end of the matching line back into `buf`.
+        ends = list(itertools.accumulate(end - start for start, end in spans))
+        return spans[bisect.bisect_left(ends, found)][1]
+
+    def fail(self, exc):
+        if not self.future.done():
+            self.log.debug("Following %s failed: %s", self.stream.path, exc)
+            self.future.set_exception(exc)
+
+    def close(self):
+        self.stream.detach(self)
+
+
+class TailStream(object):
+    """
+    One followed log broadcasting its lines to every subscriber.
+
+    Logs living on the local machine are followed directly, the others
+    through a remote `tail -F`, optionally piped through `grep`.
+
+    When the broker keeps offsets, the stream resumes right after the last
+    recorded match and records the offset of every new one. Lines seen
+    since the last match are kept, up to MAX_BACKLOG bytes, and replayed to
+    subscribers joining while the stream is live.
+    """
+
+    def __init__(self, broker, key, credentials, local=False, journal=None):
+        self.broker = broker
+        self.key = key
+        self.credentials = credentials
+        self.local = local
+        self.journal = journal
+        self.subscribers = []
+        self._index = None
+        self.source = None
+        self.reader = None
+        self.backlog = collections.deque()
+        self._backlog_size = 0
+        self._task = None
+        self._linger = None
+
+    @property
+    def grep(self):
+        return self.key[2]
+
+    @property
+    def resumes(self):
+        return self.broker.offsets is not None and self.journal is None
+
+    @property
+    def tracked(self):
+        # Filtered output has lost the byte offsets of the file.
+        return self.resumes and self.grep is None
+
+    @property
+    def host(self):
+        return self.key[0]
+
+    def attach(self, subscription):
+        if self._linger is not None:
+            self._linger.cancel()
+            self._linger = None
+        self.subscribers.append(subscription)
+        self._index = None
+        self._replay(subscription)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._pump())
+
+    def detach(self, subscription):
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+            self._index = None
+        if not self.subscribers and self._task is not None and self._linger is None:
+            loop = asyncio.get_event_loop()
+            self._linger = loop.call_later(self.broker.linger, self.stop)
+
+    def stop(self):
+        self._linger = None
+        if self._task is not None and not self.subscribers:
+            self.broker.forget(self)
+            self._task.cancel()
+
+    def _offloaded(self, subscription):
+        return self.broker.workers is not None and offloadable(subscription.matcher)
+
+    async def _offload(self, buf):
+        """
+        Returns the matches of the subscribers searched by the broker workers.
+        """
+        subscriptions = [s for s in self.subscribers if self._offloaded(s)]
+        if not subscriptions:
+            return {}
+        expressions = sorted(set(s.matcher.expression for s in subscriptions))
+        results = await self.broker.workers.search(expressions, buf)
+        found = dict(zip(expressions, results))
+        return dict((s, found[s.matcher.expression]) for s in subscriptions)
+
+    def dispatch(self, buf, found=None):
+        """
+        Feeds `buf` to every subscriber; `found` holds the matches already
+        searched for some of them.
+        """
+        found = found or {}
+        # The required literals of all subscribers are looked for in a
+        # single pass, their matchers then only see the lines holding them.
+        if self._index is None:
+            literals = dict(
+                (subscription, getattr(subscription.matcher, "literals", None))
+                for subscription in self.subscribers
+                if not self._offloaded(subscription)
+            )
+            if sum(1 for owned in literals.values() if owned) < MIN_INDEXED:
+                literals = {}
+            self._index = LiteralIndex(literals)
+        spans = self._index.scan(buf)
+        matched = None
+        for subscription in list(self.subscribers):
+            if subscription in found:
+                end = subscription.resolve(found[subscription])
+            elif subscription in spans:
+                end = subscription.feed_lines(buf, spans[subscription])
+            else:
+                end = subscription.feed(buf)
+            if end is not None and (matched is None or end > matched):
+                matched = end
+        if not self.tracked:
+            return
+        # Absolute offset right after `buf` in the followed file.
+        buf_end = self.source.position - self.reader.held
+        if matched is None:
+            self._keep(buf, buf_end)
+        else:
+            self._record(buf_end - len(buf) + matched)
+            self.backlog.clear()
+            self._backlog_size = 0
+            self._keep(buf[matched:], buf_end)
+
+    def _keep(self, buf, buf_end):
+        if not buf:
+            return
+        self.backlog.append((buf, buf_end))
+        self._backlog_size += len(buf)
+        while self._backlog_size > MAX_BACKLOG:
+            dropped, _ = self.backlog.popleft()
+            self._backlog_size -= len(dropped)
+
+    def _replay(self, subscription):
+        for index, (buf, buf_end) in enumerate(self.backlog):
+            end = subscription.feed(buf)
+            if end is not None:
+                self._record(buf_end - len(buf) + end)
+                remaining = list(self.backlog)[index + 1:]
+                self.backlog.clear()
+                self._backlog_size = 0
+                self._keep(buf[end:], buf_end)
+                for entry in remaining:
+                    self._keep(*entry)
+                return
+
+    def _record(self, offset):
+        self.broker.offsets.record(
+            self.host, self.path, self.source.inode, max(offset, 0)
+        )
+
+    @property
+    def path(self):
+        return self.key[1]
+
+    async def _pump(self):
+        try:
+            if self.local:
+                await self._follow_local()
+            else:
+                await self._follow_remote()
+        except asyncio.CancelledError:
+            logger.debug("Stopped following %s on %s", self.path, self.host)
+        except Exception as exc:
+            for subscription in list(self.subscribers):
+                subscription.fail(exc)
+        finally:
+            self.broker.forget(self)
+            for subscription in list(self.subscribers):
+                subscription.fail(
+                    BrokerException("Stream for {} was closed".format(self.key))
+                )
+
+    def _resume_point(self):
+        if self.broker.offsets is None:
+            return None
+        return self.broker.offsets.get(self.host, self.path)
+
+    async def _follow_local(self):
+        if self.journal is not None:
+            await self._follow_local_journal()
+            return
+        tail = LocalTail(local_path(self.path), resume=self._resume_point())
+        logger.debug("Following %s locally", tail.path)
+        try:
+            await self._follow(tail)
+        finally:
+            tail.close()
+
+    async def _follow_local_journal(self):
+        process = await asyncio.create_subprocess_exec(
+            *self.journal.argv(),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        logger.debug("Following the local journal: %s", self.journal.command())
+        try:
+            await self._follow(process.stdout)
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+
+    async def _follow_remote(self):
+        username, password, client_keys = self.credentials
+        async with self.broker.pool.connection(
+            self.host, username, password, client_keys
+        ) as conn:
+            command = self._remote_command()
+            stdin, stdout, stderr = await conn.open_session(command, encoding=None)
+            logger.debug("Streaming '%s' on %s", command, self.host)
+            try:
+                if not self.resumes:
+                    await self._follow(stdout)
+                else:
+                    inode, start = (await stderr.readline()).split()
+                    await self._follow(_RemoteTail(stdout, int(inode), int(start)))
+            finally:
+                stdin.channel.close()
+
+    def _remote_command(self):
+        if self.journal is not None:
+            return self.journal.command()
+        if not self.resumes:
+            command = "tail -F {}".format(self.path)
+        else:
+            resume = self._resume_point()
+            if resume is None:
+                start = LAST_LINES_START.format(lines=TAIL_LINES)
+            else:
+                start = RESUME_START.format(inode=resume[0], offset=resume[1])
+            command = RESUME_COMMAND.format(path=shlex.quote(self.path), start=start)
+        if self.grep is not None:
+            command = "{} | {}".format(command, self.grep)
+        return command
+
+    async def _follow(self, source):
+        self.source = source
+        self.reader = reader = ChunkReader(
+            source, self.broker.chunk_size, self.broker.max_line_length
+        )
+        workers = self.broker.workers
+        while True:
+            if workers is not None:
+                reader.chunk_size = workers.batch_size
+            buf = await reader.read()
+            if not buf:
+                raise BrokerException(
+                    "Following {} on {} ended unexpectedly".format(self.path, self.host)
+                )
+            self.dispatch(buf, await self._offload(buf))
+
+
+class _RemoteTail(object):
+    """
+    Counts the bytes read from a remote tail started at a known offset.
+    """
+
+    def __init__(self, stdout, inode, start):
+        self.stdout = stdout
+        self.inode = inode
+        self.position = start
+
+    async def read(self, n):
+        data = await self.stdout.read(n)
+        self.position += len(data)
+        return data
+
+
+class TailBroker(object):
+    """
+    Owns one remote stream per (host, log file, filter) and fans its lines out.
+
+    Subscribers attach and detach at any time; the stream is started by the
+    first subscriber and stopped `linger` seconds after the last one left.
+    Streams are read `chunk_size` bytes at a time and lines longer than
+    `max_line_length` bytes are truncated. With an OffsetStore, streams
+    resume where the last match left off instead of at the last lines.
+    With MatchWorkers, plain regular expressions are searched in worker
+    processes in batches sized by the workers.
+    """
+
+    def __init__(
+        self,
+        pool=None,
+        linger=LINGER,
+        chunk_size=CHUNK_SIZE,
+        max_line_length=MAX_LINE_LENGTH,
+        offsets=None,
+        workers=None,
+    ):
+        # A pool created here is closed along with the broker.
+        self._own_pool = pool is None
+        self.pool = pool if pool is not None else ConnectionPool()
+        self.offsets = offsets
+        self.workers = workers
+        self.linger = linger
+        self.chunk_size = chunk_size
+        self.max_line_length = max_line_length
+        self.streams = {}
+
+    def subscribe(
+        self,
+        host,
+        username,
+        password,
+        client_keys,
+        filepath,
+        matcher,
+        prefilter=False,
+        log=None,
+    ):
+        """
+        Attaches `matcher` to the tail of `filepath` on `host`.
+
+        With `prefilter` the tail is piped through a remote `grep` derived
+        from the matcher expression so only candidate lines cross the wire;
+        the matcher still confirms every line. Expressions that cannot be
+        translated safely, and logs already streamed in full, are not
+        prefiltered. Logs on the local machine (`localhost` or a `file://`
+        path) are followed without SSH.
+
+        Args:
+            host (str): host holding the log
+            username (str): user to authenticate as
+            password (str): password, if any
+            client_keys (list): private keys to authenticate with
+            filepath (str): log file to follow
+            matcher (RegexMatcher): decides which lines resolve the subscription
+            prefilter (bool): filter lines on the remote host
+            log (logging.Logger): logger of the subscription
+        Returns:
+            Subscription: attached subscription
+        """
+        log = log if log is not None else logger
+        local = is_local(host, filepath)
+        grep = None
+        if prefilter and not local and (host, filepath, None) not in self.streams:
+            grep = grep_command(matcher.expression)
+            if grep is None:
+                log.debug(
+                    "Cannot prefilter '%s', streaming %s in full",
+                    matcher.expression,
+                    filepath,
+                )
+        key = (host, filepath, grep)
+        return self._attach(
+            key, (username, password, client_keys), matcher, local=local, log=log
+        )
+
+    def subscribe_journal(
+        self, host, username, password, client_keys, journal, matcher, log=None
+    ):
+        """
+        Attaches `matcher` to the records of `journal` on `host`.
+
+        Args:
+            host (str): host whose journal is followed
+            username (str): user to authenticate as
+            password (str): password, if any
+            client_keys (list): private keys to authenticate with
+            journal (Journal): records to follow
+            matcher (JournalMatcher): decides which records resolve the subscription
+            log (logging.Logger): logger of the subscription
+        Returns:
+            Subscription: attached subscription
+        """
+        key = (host, journal.key, None)
+        return self._attach(
+            key,
+            (username, password, client_keys),
+            matcher,
+            local=host in LOCAL_HOSTS,
+            journal=journal,
+            log=log,
+        )
+
+    def _attach(self, key, credentials, matcher, local=False, journal=None, log=None):
+        stream = self.streams.get(key)
+        if stream is None:
+            stream = TailStream(self, key, credentials, local, journal)
+            self.streams[key] = stream
+        subscription = Subscription(stream, matcher, log)
+        stream.attach(subscription)
+        return subscription
+
+    def forget(self, stream):
+        if self.streams.get(stream.key) is stream:
+            del self.streams[stream.key]
+
+    async def close(self):
+        """
+        Stops every stream, and closes the pool the broker created.
+        """
+        tasks = []
+        for stream in list(self.streams.values()):
+            stream.subscribers = []
+            if stream._linger is not None:
+                stream._linger.cancel()
+            if stream._task is not None:
+                stream._task.cancel()
+                tasks.append(stream._task)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if self._own_pool:
+            await self.pool.close()
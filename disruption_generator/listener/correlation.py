@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import heapq
+import itertools
+import logging
+import time
+
+from .matchers import RegexMatcher
+
+logger = logging.getLogger(__name__)
+
+MAX_KEYS = 10000  # partial sequences tracked at once
+
+
+def _events(matcher, step, buf):
+    for end, line in matcher.finditer(buf):
+        yield end, step, line
+
+
+class CorrelationMatcher(object):
+    """
+    Matches an ordered sequence of lines completed within a time window.
+
+    Every expression is a step of the sequence. With a `key`, the named
+    group of that name identifies the entity a line is about (a VM id, a
+    host...) and sequences progress independently for each value; lines
+    without the group are ignored. Only the step expected next advances a
+    sequence while the first step always (re)starts it.
+
+    State is bounded: sequences older than `window` seconds are dropped and
+    at most `max_keys` of them are tracked, the least recently started ones
+    being evicted first.
+    """
+
+    def __init__(self, expressions, window=None, key=None, max_keys=MAX_KEYS):
+        self.steps = [RegexMatcher(expression) for expression in expressions]
+        self.window = window
+        self.key = key
+        self.max_keys = max_keys
+        # Prefilters keep the lines matching any of the steps.
+        self.expression = tuple(expressions)
+        literals = [step.literals for step in self.steps]
+        self.literals = None if None in literals else frozenset().union(*literals)
+        # key value -> (next step, monotonic time of the first step)
+        self._partial = collections.OrderedDict()
+
+    def _key_of(self, step, line):
+        if self.key is None:
+            return None
+        m = self.steps[step].pattern.search(line)
+        return m.groupdict().get(self.key) if m else None
+
+    def _expire(self, now):
+        if self.window is None:
+            return
+        while self._partial:
+            _, (_, started) = next(iter(self._partial.items()))
+            if now - started <= self.window:
+                return
+            self._partial.popitem(last=False)
+
+    def _start(self, value, now):
+        self._partial.pop(value, None)
+        self._partial[value] = (1, now)
+        while len(self._partial) > self.max_keys:
+            evicted, _ = self._partial.popitem(last=False)
+            logger.debug("Dropped partial sequence for %s", evicted)
+
+    def feed(self, steps, line, now):
+        """
+        Processes a line matching every step in `steps`. Returns True when
+        it completes a sequence.
+
+        A line counts once per sequence: it advances the sequence of its key
+        if it matches the expected step, otherwise it may start a new one.
+        """
+        value = self._key_of(steps[0], line)
+        if self.key is not None and value is None:
+            return False
+        expected, started = self._partial.get(value, (None, None))
+        if expected is not None and (
+            self.window is not None and now - started > self.window
+        ):
+            del self._partial[value]
+            expected = None
+        if expected in steps:
+            if expected == len(self.steps) - 1:
+                del self._partial[value]
+                return True
+            self._partial[value] = (expected + 1, started)
+            return False
+        if 0 in steps:
+            if len(self.steps) == 1:
+                return True
+            self._start(value, now)
+        return False
+
+    def search(self, buf):
+        """
+        Returns (end, line) for the line of `buf` completing a sequence, or
+        None. Lines are processed in order so partial sequences carry over
+        to the next buffers.
+        """
+        now = time.monotonic()
+        self._expire(now)
+        events = heapq.merge(
+            *[_events(matcher, step, buf) for step, matcher in enumerate(self.steps)]
+        )
+        for end, group in itertools.groupby(events, key=lambda event: event[0]):
+            group = list(group)
+            line = group[0][2]
+            if self.feed([step for _, step, _ in group], line, now):
+                return end, line
+        return None
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import json
+import re
+import shlex
+
+from .matchers import ENCODING
+
+MESSAGE_FIELD = "MESSAGE"
+TAIL_ENTRIES = 10  # same as `tail -F`
+
+
+class Journal(object):
+    """
+    A filtered view of the systemd journal of a host.
+
+    Unit, priority and exact field matches are handed to `journalctl` so
+    only relevant records are shipped.
+    """
+
+    def __init__(self, unit=None, priority=None, matches=None):
+        self.unit = unit
+        self.priority = priority
+        self.matches = matches or {}
+
+    def argv(self):
+        argv = ["journalctl", "--follow", "--output=json", "--no-pager"]
+        argv.append("--lines={}".format(TAIL_ENTRIES))
+        if self.unit:
+            argv.append("--unit={}".format(self.unit))
+        if self.priority is not None:
+            argv.append("--priority={}".format(self.priority))
+        for field, value in sorted(self.matches.items()):
+            argv.append("{}={}".format(field, value))
+        return argv
+
+    def command(self):
+        return " ".join(shlex.quote(arg) for arg in self.argv())
+
+    @property
+    def key(self):
+        # Stands for the log path when identifying streams.
+        return "journald:{}".format(self.command())
+
+
+def _field_text(value):
+    # Binary fields are serialized as arrays of bytes.
+    if isinstance(value, list):
+        return bytes(value).decode(ENCODING, "replace")
+    return str(value)
+
+
+class JournalMatcher(object):
+    """
+    Matches journal records, one JSON object per line, on their fields.
+
+    A record matches when every field in `fields` is present and matches
+    its regular expression.
+    """
+
+    def __init__(self, fields):
+        self.fields = dict(
+            (name, re.compile(expression)) for name, expression in fields.items()
+        )
+        self.expression = " ".join(
+            "{}=~{}".format(name, expression) for name, expression in fields.items()
+        )
+        # Field values are JSON escaped, raw literals cannot be relied on.
+        self.literals = None
+
+    def match(self, record):
+        for name, pattern in self.fields.items():
+            if name not in record:
+                return False
+            if not pattern.search(_field_text(record[name])):
+                return False
+        return True
+
+    def search(self, buf):
+        end = 0
+        for raw in buf.split(b"\n")[:-1]:
+            end += len(raw) + 1
+            try:
+                record = json.loads(raw.decode(ENCODING, "replace"))
+            except ValueError:
+                continue
+            if self.match(record):
+                return end, _field_text(record.get(MESSAGE_FIELD, ""))
+        return None
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+"""
+Required literals of listener expressions and a single pass scanner
+finding the lines that contain any of them.
+"""
+
+import re
+
+from .regex_tree import parse, sre_constants
+
+ENCODING = "utf-8"
+MIN_LITERAL = 3  # shorter literals hit too many lines to be worth it
+
+
+def _flush(run, candidates):
+    if run:
+        candidates.append({"".join(run)})
+        del run[:]
+
+
+def _required(items):
+    """
+    Returns a set of strings one of which every match of `items` contains,
+    or None.
+    """
+    candidates = []
+    run = []
+    for op, av in items:
+        if op is sre_constants.LITERAL and chr(av) not in "\n\ufffd":
+            run.append(chr(av))
+            continue
+        _flush(run, candidates)
+        found = None
+        if op is sre_constants.SUBPATTERN:
+            if not av[1] and not av[2]:  # no scoped flags
+                found = _required(av[-1])
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            if av[0] >= 1:
+                found = _required(av[2])
+        elif op is sre_constants.BRANCH:
+            branches = [_required(branch) for branch in av[1]]
+            if all(branches):
+                found = set().union(*branches)
+        if found:
+            candidates.append(found)
+    _flush(run, candidates)
+    candidates = [c for c in candidates if min(map(len, c)) >= MIN_LITERAL]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: (min(map(len, c)), -len(c)))
+
+
+def required_literals(expression):
+    """
+    Extracts literals one of which is part of every line `expression`
+    matches.
+
+    Args:
+        expression (str): Python regular expression
+    Returns:
+        frozenset: required literals, None when no useful set exists
+    """
+    try:
+        parsed, flags = parse(expression)
+    except re.error:
+        return None
+    if flags & sre_constants.SRE_FLAG_IGNORECASE:
+        return None
+    found = _required(list(parsed))
+    return frozenset(found) if found else None
+
+
+def _trie_pattern(words):
+    # Factoring common prefixes lets the regex engine reject most positions
+    # on their first byte, which alternating plain literals does not.
+    trie = {}
+    for word in words:
+        node = trie
+        for byte in word:
+            node = node.setdefault(byte, {})
+        node[None] = {}
+
+    def build(node):
+        optional = None in node
+        branches = [
+            re.escape(bytes([byte])) + build(child)
+            for byte, child in sorted((k, v) for k, v in node.items() if k is not None)
+        ]
+        if not branches:
+            return b""
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        return b"(?:" + b"|".join(branches) + b")" + (b"?" if optional else b"")
+
+    return build(trie)
+
+
+class LiteralIndex(object):
+    """
+    Finds, in one pass over a buffer, the lines that may interest each owner.
+
+    Owners come with the required literals of their matcher; owners without
+    any (None) are interested in every line and are not indexed. The
+    literals of all owners are compiled into one trie shaped pattern, which
+    plays the part of an Aho-Corasick automaton: the buffer is searched for
+    the first hit, the owners of every literal of the hit line are collected
+    and the search resumes on the next line.
+    """
+
+    def __init__(self, literals):
+        self.owners = {}
+        for owner, owned in literals.items():
+            for literal in owned or ():
+                self.owners.setdefault(literal.encode(ENCODING), []).append(owner)
+        self._indexed = set()
+        for owners in self.owners.values():
+            self._indexed.update(owners)
+        self._pattern = None
+        if self.owners:
+            self._pattern = re.compile(_trie_pattern(self.owners))
+
+    def __contains__(self, owner):
+        return owner in self._indexed
+
+    def _owners(self, line):
+        # Hit lines are rare and short, looking for every literal in them
+        # is cheaper than resuming the automaton at each position.
+        owners = set()
+        for word, word_owners in self.owners.items():
+            if word in line:
+                owners.update(word_owners)
+        return owners
+
+    def scan(self, buf):
+        """
+        Returns the (start, end) spans of the candidate lines of `buf` for
+        every indexed owner, `end` being right after the newline.
+        """
+        spans = dict((owner, []) for owner in self._indexed)
+        if self._pattern is None:
+            return spans
+        pos = 0
+        while True:
+            m = self._pattern.search(buf, pos)
+            if m is None:
+                break
+            start = buf.rfind(b"\n", 0, m.start()) + 1
+            end = buf.find(b"\n", m.end())
+            if end < 0:
+                break
+            for owner in self._owners(buf[start:end]):
+                spans[owner].append((start, end + 1))
+            pos = end + 1
+        return spans
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+
+logger = logging.getLogger(__name__)
+
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+FILE_SCHEME = "file://"
+TAIL_LINES = 10  # same as `tail -F`
+POLL_INTERVAL = 0.25
+ROTATION_CHECK_INTERVAL = 1
+BLOCK_SIZE = 64 * 1024
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0)
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_local(host, filepath):
+    """
+    Tells whether the log can be followed without going through SSH.
+    """
+    return (
+        host in LOCAL_HOSTS
+        or host.startswith(FILE_SCHEME)
+        or filepath.startswith(FILE_SCHEME)
+    )
+
+
+def local_path(filepath):
+    if filepath.startswith(FILE_SCHEME):
+        return filepath[len(FILE_SCHEME):]
+    return filepath
+
+
+class _Inotify(object):
+    """
+    Minimal ctypes binding waking a waiter when a directory entry changes.
+    """
+
+    def __init__(self, directory, name, wakeup):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, "inotify_add_watch failed on {}".format(directory))
+        self.name = os.fsencode(name)
+        self.wakeup = wakeup
+        asyncio.get_event_loop().add_reader(self.fd, self._read_events)
+
+    def _read_events(self):
+        relevant = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except OSError as exc:
+                if exc.errno == errno.EAGAIN:
+                    break
+                raise
+            if not data:
+                break
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if name == self.name:
+                    relevant = True
+        if relevant:
+            self.wakeup()
+
+    def close(self):
+        asyncio.get_event_loop().remove_reader(self.fd)
+        os.close(self.fd)
+
+
+class LocalTail(object):
+    """
+    Follows a local file like `tail -F` does, without spawning anything.
+
+    New bytes are fetched with large reads whenever inotify reports a change
+    to the file, or every `POLL_INTERVAL` seconds where inotify is not
+    available. Rotation is detected by inode: the old file is drained before
+    the new one is followed from its beginning; truncation restarts from the
+    beginning too. Offers the `read(n)` coroutine of an SSH stream so it can
+    be wrapped by a ChunkReader.
+
+    Following starts with the last `tail_lines` lines unless `resume`, an
+    (inode, offset) pair, points into the current file.
+    """
+
+    def __init__(self, filepath, tail_lines=TAIL_LINES, resume=None):
+        self.path = os.path.abspath(filepath)
+        self.tail_lines = tail_lines
+        self.resume = resume
+        self._fd = None
+        self._inode = None
+        self._position = 0
+        self._changed = asyncio.Event()
+        self._inotify = None
+        try:
+            self._inotify = _Inotify(
+                os.path.dirname(self.path),
+                os.path.basename(self.path),
+                self._changed.set,
+            )
+        except (OSError, AttributeError) as exc:
+            logger.debug("inotify unavailable (%s), polling %s", exc, self.path)
+        self._open(start_at_end=True)
+
+    def _open(self, start_at_end=False):
+        try:
+            fd = os.open(self.path, os.O_RDONLY | IN_CLOEXEC)
+        except FileNotFoundError:
+            return False
+        self._fd = fd
+        stat = os.fstat(fd)
+        self._inode = stat.st_ino
+        self._position = 0
+        if start_at_end:
+            self._position = self._last_lines_offset()
+            if self.resume is not None:
+                inode, offset = self.resume
+                if inode == stat.st_ino and offset <= stat.st_size:
+                    self._position = offset
+                else:
+                    # Replaced since the offset was recorded: nothing of the
+                    # new file was seen yet.
+                    self._position = 0
+        logger.debug("Following %s from byte %d", self.path, self._position)
+        return True
+
+    @property
+    def inode(self):
+        return self._inode
+
+    @property
+    def position(self):
+        return self._position
+
+    def _last_lines_offset(self):
+        size = os.fstat(self._fd).st_size
+        position = size
+        newlines = 0
+        while position > 0:
+            start = max(0, position - BLOCK_SIZE)
+            block = os.pread(self._fd, position - start, start)
+            end = len(block)
+            if position == size:
+                end -= 1  # a trailing newline ends the last line
+            while True:
+                end = block.rfind(b"\n", 0, end)
+                if end < 0:
+                    break
+                newlines += 1
+                if newlines == self.tail_lines:
+                    return start + end + 1
+            position = start
+        return 0
+
+    def _follow_rotation(self):
+        """
+        Switches to the current file behind the path if it was replaced or
+        truncated. Returns True when there may be new bytes to read.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if self._fd is not None and stat.st_ino == self._inode:
+            if stat.st_size >= self._position:
+                return False
+            logger.debug("%s was truncated", self.path)
+            self._position = 0
+            return True
+        logger.debug("%s was rotated", self.path)
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        return self._open()
+
+    async def read(self, n):
+        """
+        Returns up to `n` new bytes, waiting for the file to grow.
+        """
+        timeout = POLL_INTERVAL if self._inotify is None else ROTATION_CHECK_INTERVAL
+        while True:
+            self._changed.clear()
+            if self._fd is not None:
+                data = os.pread(self._fd, n, self._position)
+                if data:
+                    self._position += len(data)
+                    return data
+            if self._follow_rotation():
+                continue
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
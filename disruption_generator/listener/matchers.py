@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+from .literals import required_literals
+from .regex_tree import parse, sre_constants, walk
+
+ENCODING = "utf-8"
+
+# Opcodes whose meaning is the same on a single line and on a buffer of
+# lines searched in MULTILINE mode, as long as the line holding a
+# candidate match is searched again on its own.
+BUFFER_SAFE = {
+    sre_constants.LITERAL,
+    sre_constants.NOT_LITERAL,
+    sre_constants.ANY,
+    sre_constants.IN,
+    sre_constants.NEGATE,
+    sre_constants.RANGE,
+    sre_constants.CATEGORY,
+    sre_constants.MAX_REPEAT,
+    sre_constants.MIN_REPEAT,
+    sre_constants.SUBPATTERN,
+    sre_constants.BRANCH,
+    sre_constants.ASSERT,
+    sre_constants.GROUPREF,
+    sre_constants.AT,
+}
+BUFFER_SAFE_AT = {
+    sre_constants.AT_BEGINNING,
+    sre_constants.AT_END,
+    sre_constants.AT_BOUNDARY,
+    sre_constants.AT_NON_BOUNDARY,
+}
+# Word boundaries behave differently on bytes than on decoded text.
+UNICODE_SENSITIVE_AT = {sre_constants.AT_BOUNDARY, sre_constants.AT_NON_BOUNDARY}
+# On bytes these match one byte of a multibyte character, not the character.
+UNICODE_SENSITIVE = {
+    sre_constants.CATEGORY,
+    sre_constants.ANY,
+    sre_constants.NOT_LITERAL,
+    sre_constants.NEGATE,
+}
+
+
+def _search_mode(expression):
+    """
+    Tells how `expression` can be searched on a buffer of raw lines.
+
+    Returns "bytes" when the pattern can run on the raw buffer, "text" when
+    the buffer must be decoded first and "line" when each line has to be
+    searched on its own.
+    """
+    try:
+        parsed, flags = parse(expression)
+    except re.error:
+        return "line"
+    if flags & sre_constants.SRE_FLAG_DOTALL:
+        return "line"
+    ops = list(walk(parsed))
+    for op, av in ops:
+        if op not in BUFFER_SAFE:
+            return "line"
+        if op is sre_constants.AT and av not in BUFFER_SAFE_AT:
+            return "line"
+    ascii_only = all(ord(char) < 128 for char in expression)
+    unicode_sensitive = flags & sre_constants.SRE_FLAG_IGNORECASE or any(
+        op in UNICODE_SENSITIVE
+        or (op is sre_constants.AT and av in UNICODE_SENSITIVE_AT)
+        for op, av in ops
+    )
+    if ascii_only and not unicode_sensitive:
+        return "bytes"
+    return "text"
+
+
+class RegexMatcher(object):
+    """
+    Matches log lines against a single regular expression.
+
+    Lines are handed over in bulk as a buffer of newline terminated raw
+    lines. Whenever possible the pattern runs once over the whole buffer and
+    only the line holding a candidate match is decoded and confirmed.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.pattern = re.compile(expression)
+        self.mode = _search_mode(expression)
+        self.literals = required_literals(expression)
+        if self.mode == "bytes":
+            self._buffer_pattern = re.compile(expression.encode(ENCODING), re.MULTILINE)
+        elif self.mode == "text":
+            self._buffer_pattern = re.compile(expression, re.MULTILINE)
+
+    def match(self, line):
+        m = self.pattern.search(line)
+        return bool(m and m.group(0))
+
+    def search(self, buf):
+        """
+        Looks for the first line of `buf` matching the expression.
+
+        Args:
+            buf (bytes): newline terminated lines
+        Returns:
+            tuple: (end, line) where `end` is the offset right after the
+                matching line in `buf` and `line` the decoded line, or None
+        """
+        return next(self.finditer(buf), None)
+
+    def finditer(self, buf):
+        """
+        Yields (end, line) for every line of `buf` matching the expression.
+        """
+        if self.mode == "bytes":
+            return self._iter_buffer(
+                buf, b"\n", lambda line: line.decode(ENCODING, "replace")
+            )
+        if self.mode == "text":
+            return self._iter_text(buf)
+        return self._iter_lines(buf)
+
+    def _iter_text(self, buf):
+        # surrogateescape keeps one character per undecodable byte so
+        # offsets can be mapped back to the raw buffer.
+        text = buf.decode(ENCODING, "surrogateescape")
+        chars = offset = 0
+        for end, line in self._iter_buffer(text, "\n", lambda line: line):
+            offset += len(text[chars:end].encode(ENCODING, "surrogateescape"))
+            chars = end
+            line = line.encode(ENCODING, "surrogateescape").decode(ENCODING, "replace")
+            yield offset, line
+
+    def _iter_buffer(self, buf, newline, decode):
+        pos = 0
+        while True:
+            m = self._buffer_pattern.search(buf, pos)
+            if m is None:
+                return
+            start = buf.rfind(newline, 0, m.start()) + 1
+            end = buf.find(newline, m.start())
+            if end < 0:
+                return
+            line = buf[start:end]
+            confirmed = self._buffer_pattern.search(line)
+            if confirmed and confirmed.group(0):
+                yield end + 1, decode(line)
+            pos = end + 1
+
+    def _iter_lines(self, buf):
+        end = 0
+        for raw in buf.split(b"\n")[:-1]:
+            end += len(raw) + 1
+            line = raw.decode(ENCODING, "replace")
+            if self.match(line):
+                yield end, line
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class OffsetStore(object):
+    """
+    Remembers where each (host, log file) was last matched.
+
+    Offsets are kept in a small JSON state file, rewritten atomically on
+    every update so a following action, or the next run, resumes right
+    after the last matched line.
+    """
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self._state = {}
+        try:
+            with open(state_file, "r") as f:
+                self._state = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as exc:
+            logger.warning(
+                "Ignoring unreadable offsets file {}: {}".format(state_file, exc)
+            )
+
+    def get(self, host, filepath):
+        """
+        Returns the (inode, offset) recorded for `filepath` on `host`, or None.
+        """
+        entry = self._state.get(host, {}).get(filepath)
+        if entry is None:
+            return None
+        return entry["inode"], entry["offset"]
+
+    def record(self, host, filepath, inode, offset):
+        self._state.setdefault(host, {})[filepath] = {
+            "inode": inode,
+            "offset": offset,
+        }
+        self.save()
+
+    def save(self):
+        tmp = "{}.tmp".format(self.state_file)
+        with open(tmp, "w") as f:
+            json.dump(self._state, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.state_file)
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+"""
+Translation of listener regular expressions into remote `grep` filters.
+
+Only a conservative subset of Python's syntax is translated to POSIX ERE,
+every construct whose semantics could differ (lookarounds, backreferences,
+word boundaries, inline flags other than case folding...) makes the
+translation fail so the caller falls back to streaming the whole log.
+
+`grep` runs in the C locale whatever the locale of the host, so patterns
+match bytes: an item matching one character that may not be ASCII matches
+the 1 to 4 bytes of its UTF-8 encoding instead.
+"""
+
+import re
+import shlex
+
+from .regex_tree import parse, sre_constants, walk
+
+ERE_SPECIAL = set(".[]()*+?{}|^$\\")
+
+# Bytes of UTF-8 encoded non ASCII characters, in the C locale.
+NON_ASCII = "[^[:print:][:cntrl:]]"
+MAX_CHAR_BYTES = 4
+RE_DUP_MAX = 255
+
+CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: "[:digit:]",
+    # Python also counts the ASCII separators \x1c-\x1f as spaces.
+    sre_constants.CATEGORY_SPACE: "[:space:][:cntrl:]",
+    sre_constants.CATEGORY_WORD: "[:alnum:]_",
+}
+NEGATED_CATEGORIES = {
+    sre_constants.CATEGORY_NOT_DIGIT: "[:digit:]",
+    sre_constants.CATEGORY_NOT_SPACE: "[:space:]",
+    sre_constants.CATEGORY_NOT_WORD: "[:alnum:]_",
+}
+
+# Flags that do not change what a pattern matches on a single line.
+NEUTRAL_FLAGS = sre_constants.SRE_FLAG_UNICODE
+
+
+class Untranslatable(Exception):
+    pass
+
+
+def _char(code):
+    char = chr(code)
+    if not char.isprintable():
+        raise Untranslatable("non printable character {!r}".format(char))
+    return char
+
+
+def _ascii(code):
+    if code > 0x7F:
+        raise Untranslatable("non ASCII class member")
+    return _char(code)
+
+
+def _literal(code):
+    char = _char(code)
+    return "\\" + char if char in ERE_SPECIAL else char
+
+
+def _bracket(items, negate=False):
+    """
+    Returns an ERE matching one byte of the characters `items` accept, and
+    whether it accepts the bytes of non ASCII characters.
+    """
+    if len(items) == 1 and items[0][0] is sre_constants.CATEGORY and not negate:
+        if items[0][1] in NEGATED_CATEGORIES:
+            return "[^{}]".format(NEGATED_CATEGORIES[items[0][1]]), True
+    chars = []
+    classes = []
+    categories = False
+    for op, av in items:
+        if op is sre_constants.NEGATE:
+            negate = True
+        elif op is sre_constants.LITERAL:
+            chars.append(_ascii(av))
+        elif op is sre_constants.RANGE:
+            low, high = _ascii(av[0]), _ascii(av[1])
+            if {low, high} & set("]^-\\["):
+                raise Untranslatable("range bound needs escaping")
+            classes.append("{}-{}".format(low, high))
+        elif op is sre_constants.CATEGORY and av in CATEGORIES:
+            classes.append(CATEGORIES[av])
+            categories = True
+        else:
+            raise Untranslatable("unsupported class item {}".format(op))
+    if "\\" in chars or "[" in chars:
+        raise Untranslatable("bracket escape")
+    # POSIX brackets have no escapes: ']' must come first, '-' last and
+    # '^' anywhere but first.
+    body = ""
+    if "]" in chars:
+        body += "]"
+    body += "".join(classes)
+    body += "".join(c for c in chars if c not in "]^-")
+    if "^" in chars:
+        if not body:
+            raise Untranslatable("lone caret class")
+        body += "^"
+    if "-" in chars:
+        body += "-"
+    if not body:
+        raise Untranslatable("empty class")
+    if negate:
+        return "[^{}]".format(body), True
+    if categories:
+        # Python's categories also hold non ASCII characters.
+        return "([{}]|{})".format(body, NON_ASCII), True
+    return "[{}]".format(body), False
+
+
+def _character(op, av):
+    """
+    Returns, for an item matching a single character, an ERE matching one
+    byte of it and whether it matches non ASCII characters. Returns None
+    for other items.
+    """
+    if op is sre_constants.NOT_LITERAL:
+        if av > 0x7F:
+            return ".", True
+        return _bracket([(sre_constants.LITERAL, av)], negate=True)
+    if op is sre_constants.ANY:
+        return ".", True
+    if op is sre_constants.IN:
+        return _bracket(av)
+    if op is sre_constants.CATEGORY:
+        return _bracket([(op, av)])
+    return None
+
+
+def _bounds(body, low, high):
+    if high is sre_constants.MAXREPEAT or high > RE_DUP_MAX:
+        if low > RE_DUP_MAX:
+            raise Untranslatable("repeat bound too large")
+        if low == 0:
+            return body + "*"
+        if low == 1:
+            return body + "+"
+        return "{}{{{},}}".format(body, low)
+    if (low, high) == (0, 1):
+        return body + "?"
+    if low == high:
+        return "{}{{{}}}".format(body, low)
+    return "{}{{{},{}}}".format(body, low, high)
+
+
+def _repeat(av):
+    low, high, item = av
+    if len(item) == 1:
+        character = _character(*item[0])
+        if character is not None and character[1]:
+            # Each character takes 1 to MAX_CHAR_BYTES bytes.
+            if high is not sre_constants.MAXREPEAT:
+                high *= MAX_CHAR_BYTES
+            return _bounds(character[0], low, high)
+    body = _sequence(item)
+    if len(item) != 1 or _grouped(*item[0]):
+        body = "({})".format(body)
+    return _bounds(body, low, high)
+
+
+def _grouped(op, av):
+    """
+    Tells whether the ERE of a single item needs a group to be repeated:
+    repeats, and non ASCII literals matching several bytes.
+    """
+    if op is sre_constants.LITERAL:
+        return av > 0x7F
+    return op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+
+
+def _item(op, av):
+    if op is sre_constants.LITERAL:
+        return _literal(av)
+    character = _character(op, av)
+    if character is not None:
+        ere, wide = character
+        return _bounds(ere, 1, MAX_CHAR_BYTES) if wide else ere
+    if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+        return _repeat(av)
+    if op is sre_constants.SUBPATTERN:
+        group, add_flags, del_flags, item = av
+        if add_flags or del_flags:
+            raise Untranslatable("scoped flags")
+        return "({})".format(_sequence(item))
+    if op is sre_constants.BRANCH:
+        return "({})".format("|".join(_sequence(branch) for branch in av[1]))
+    if op is sre_constants.AT:
+        if av is sre_constants.AT_BEGINNING:
+            return "^"
+        if av is sre_constants.AT_END:
+            return "$"
+    raise Untranslatable("unsupported construct {} {}".format(op, av))
+
+
+def _sequence(items):
+    return "".join(_item(op, av) for op, av in items)
+
+
+def to_ere(expression):
+    """
+    Translates a Python regular expression to POSIX ERE.
+
+    Args:
+        expression (str): Python regular expression
+    Returns:
+        tuple: (ere, fixed, ignore_case) where `fixed` tells the pattern
+            is a plain string. None when the pattern cannot be translated.
+    """
+    try:
+        parsed, flags = parse(expression)
+        flags &= ~NEUTRAL_FLAGS
+        ignore_case = bool(flags & sre_constants.SRE_FLAG_IGNORECASE)
+        if flags & ~sre_constants.SRE_FLAG_IGNORECASE:
+            raise Untranslatable("unsupported flags")
+        items = list(parsed)
+        if ignore_case and any(
+            op is sre_constants.LITERAL and av > 0x7F for op, av in walk(items)
+        ):
+            raise Untranslatable("non ASCII case folding")
+        if items and all(op is sre_constants.LITERAL for op, _ in items):
+            return "".join(_char(av) for _, av in items), True, ignore_case
+        ere = _sequence(items)
+    except (Untranslatable, re.error, ValueError):
+        return None
+    if not ere:
+        return None
+    return ere, False, ignore_case
+
+
+def grep_command(expression):
+    """
+    Returns a line buffered `grep` accepting a superset of the lines
+    `expression` matches, or None when no safe translation exists.
+
+    Args:
+        expression (str): Python regular expression, or a sequence of them
+            for a filter accepting lines matching any of them
+    Returns:
+        str: grep command line
+    """
+    expressions = [expression] if isinstance(expression, str) else expression
+    translated = [to_ere(item) for item in expressions]
+    if not translated or None in translated:
+        return None
+    if len({ignore_case for _, _, ignore_case in translated}) != 1:
+        return None
+    fixed = all(is_fixed for _, is_fixed, _ in translated)
+    patterns = []
+    for pattern, is_fixed, _ in translated:
+        if is_fixed and not fixed:
+            pattern = "".join(_literal(ord(char)) for char in pattern)
+        patterns.append(pattern)
+    options = ["--line-buffered", "-F" if fixed else "-E"]
+    if translated[0][2]:
+        options.append("-i")
+    return "LC_ALL=C grep {} {}".format(
+        " ".join(options),
+        " ".join("-e {}".format(shlex.quote(pattern)) for pattern in patterns),
+    )
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+MAX_LINE_LENGTH = 64 * 1024
+
+
+class ChunkReader(object):
+    """
+    Reads a byte stream in large chunks and hands out whole lines in bulk.
+
+    Each call to `read` returns a single bytes buffer holding every line
+    completed by the chunk just read, newline terminated, so callers can
+    scan many lines at once. The incomplete last line is carried over to
+    the next chunk; it is never buffered beyond `max_line_length` bytes,
+    longer lines are truncated. `held` counts the bytes read from the stream
+    but not handed out yet.
+    """
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE, max_line_length=MAX_LINE_LENGTH):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_line_length = max_line_length
+        self.truncated = 0
+        self.held = 0
+        self._partial = b""
+        self._overflow = False
+
+    async def read(self):
+        """
+        Returns the next buffer of complete lines, b"" on end of stream.
+        """
+        while True:
+            chunk = await self.stream.read(self.chunk_size)
+            if not chunk:
+                return b""
+            lines = self.feed(chunk)
+            if lines:
+                return lines
+
+    def feed(self, chunk):
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            self.held += len(chunk)
+            self._carry(chunk)
+            return b""
+        head, tail = chunk[:end + 1], chunk[end + 1:]
+        if self._overflow:
+            # Drop the rest of the truncated line.
+            head = self._partial + head[head.find(b"\n"):]
+        elif self._partial:
+            head = self._partial + head
+        self._partial = b""
+        self._overflow = False
+        self.held = len(tail)
+        self._carry(tail)
+        return head
+
+    def _carry(self, data):
+        if self._overflow:
+            return
+        self._partial += data
+        if len(self._partial) > self.max_line_length:
+            self._partial = self._partial[: self.max_line_length]
+            self._overflow = True
+            self.truncated += 1
+            logger.warning(
+                "Truncated a line longer than %d bytes", self.max_line_length
+            )
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+"""
+Helpers to inspect the parse tree of Python regular expressions.
+"""
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+
+def parse(expression):
+    """
+    Returns the parse tree of `expression` and its global flags.
+    """
+    parsed = sre_parse.parse(expression)
+    state = getattr(parsed, "state", None) or getattr(parsed, "pattern")
+    return parsed, state.flags
+
+
+def walk(items):
+    """
+    Yields every (opcode, argument) pair of a parse tree, depth first.
+    """
+    for op, av in items:
+        yield op, av
+        if op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            for child in walk(av[2]):
+                yield child
+        elif op is sre_constants.SUBPATTERN:
+            for child in walk(av[-1]):
+                yield child
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                for child in walk(branch):
+                    yield child
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            for child in walk(av[1]):
+                yield child
+        elif op is sre_constants.IN:
+            for child in av:
+                yield child
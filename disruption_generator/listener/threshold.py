@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from .matchers import RegexMatcher
+
+BUCKETS = 10  # resolution of the sliding window
+
+
+class SlidingWindowCounter(object):
+    """
+    Counts events over the last `window` seconds in `buckets` slices.
+
+    Events only increment the slice of the current time, expired slices are
+    cleared as time moves on, so adding an event is O(1) amortized whatever
+    the event rate. The count covers between `window` minus one slice and
+    `window` seconds.
+    """
+
+    def __init__(self, window, buckets=BUCKETS):
+        if window <= 0 or buckets < 1:
+            raise ValueError("window and buckets must be positive")
+        self.window = window
+        self.width = float(window) / buckets
+        self._counts = [0] * buckets
+        self._slot = None
+        self.total = 0
+
+    def reset(self):
+        self._counts = [0] * len(self._counts)
+        self._slot = None
+        self.total = 0
+
+    def _advance(self, now):
+        slot = int(now // self.width)
+        if self._slot is None or slot - self._slot >= len(self._counts):
+            self.reset()
+        else:
+            for expired in range(self._slot + 1, slot + 1):
+                index = expired % len(self._counts)
+                self.total -= self._counts[index]
+                self._counts[index] = 0
+        if self._slot is None or slot > self._slot:
+            self._slot = slot
+
+    def add(self, now, n=1):
+        self._advance(now)
+        self._counts[self._slot % len(self._counts)] += n
+        self.total += n
+        return self.total
+
+    def count(self, now):
+        self._advance(now)
+        return self.total
+
+
+class ThresholdMatcher(object):
+    """
+    Fires when at least `threshold` lines matched `expression` within the
+    last `window` seconds.
+
+    Resolves with the line reaching the threshold; the count then starts
+    over so the next wait needs a new burst.
+    """
+
+    def __init__(self, expression, threshold, window, buckets=BUCKETS):
+        self.matcher = RegexMatcher(expression)
+        self.expression = expression
+        self.literals = self.matcher.literals
+        self.threshold = threshold
+        self.counter = SlidingWindowCounter(window, buckets)
+
+    def search(self, buf):
+        now = time.monotonic()
+        for end, line in self.matcher.finditer(buf):
+            if self.counter.add(now) >= self.threshold:
+                self.counter.reset()
+                return end, line
+        return None
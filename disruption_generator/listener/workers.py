@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import time
+
+from .matchers import RegexMatcher
+from .reader import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+MAX_LATENCY = 0.1  # seconds a batch may spend in the workers
+MIN_BATCH = 16 * 1024
+MAX_BATCH = 4 * 1024 * 1024
+
+# Matchers compiled in each worker process, by expression.
+_matchers = {}
+
+
+def _search_all(expressions, buf):
+    results = []
+    for expression in expressions:
+        matcher = _matchers.get(expression)
+        if matcher is None:
+            matcher = _matchers[expression] = RegexMatcher(expression)
+        results.append(matcher.search(buf))
+    return results
+
+
+def offloadable(matcher):
+    """
+    Tells whether `matcher` can run in a worker: it must be stateless and
+    rebuildable from its expression.
+    """
+    return type(matcher) is RegexMatcher
+
+
+class MatchWorkers(object):
+    """
+    Runs regular expressions on batches of lines in worker processes.
+
+    Only the match of each expression, if any, travels back to the event
+    loop. The batch size adapts to the measured round trips: it shrinks as
+    soon as a batch takes longer than `max_latency` seconds and doubles,
+    up to MAX_BATCH bytes, while batches at least half full take less than
+    half of it.
+    """
+
+    def __init__(self, workers=None, max_latency=MAX_LATENCY, executor=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_latency = max_latency
+        self.batch_size = CHUNK_SIZE
+        self.executor = executor
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+
+    async def search(self, expressions, buf):
+        """
+        Searches `buf` for every expression in a worker.
+
+        Args:
+            expressions (list): regular expressions
+            buf (bytes): newline terminated lines
+        Returns:
+            list: (end, line) or None for each expression
+        """
+        loop = asyncio.get_event_loop()
+        start = time.monotonic()
+        results = await loop.run_in_executor(
+            self.executor, _search_all, tuple(expressions), buf
+        )
+        self._adapt(time.monotonic() - start, len(buf))
+        return results
+
+    def _adapt(self, elapsed, size):
+        if elapsed > self.max_latency:
+            scaled = int(size * self.max_latency / elapsed)
+            self.batch_size = max(MIN_BATCH, min(self.batch_size, scaled))
+            logger.debug(
+                "Batch of %d bytes took %.3fs, batches now %d bytes",
+                size,
+                elapsed,
+                self.batch_size,
+            )
+        elif size >= self.batch_size // 2 and elapsed < self.max_latency / 2:
+            self.batch_size = min(MAX_BATCH, self.batch_size * 2)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
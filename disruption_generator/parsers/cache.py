@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+"""
+Experiments parsed in worker processes and cached on disk.
+"""
+
+import collections
+import concurrent.futures
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import time
+
+from .. import __version__
+from .experiment_parser import ExperimentParser
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1  # bump when the layout of cache entries changes
+MIN_POOL_FILES = 8  # fewer files to parse are parsed in this process
+
+# Parsed objects are only valid for the code that built them: the parser
+# and the modules validating its input, relative to the package.
+_SOURCES = (
+    "parsers/config.py",
+    "parsers/experiment_parser.py",
+    "parsers/utils.py",
+    "trigger/pressure.py",
+    "engine/schedules.py",
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _fingerprint():
+    digest = hashlib.sha256("{}:{}".format(CACHE_VERSION, __version__).encode("ascii"))
+    package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for source in _SOURCES:
+        with open(os.path.join(package, *source.split("/")), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _stamp(yaml_path, digest=True):
+    """
+    Returns the mtime, size and, with `digest`, the content hash of a file.
+    """
+    stat = os.stat(yaml_path)
+    content = None
+    if digest:
+        with open(yaml_path, "rb") as f:
+            content = hashlib.sha256(f.read()).hexdigest()
+    return stat.st_mtime_ns, stat.st_size, content
+
+
+class ParseCache(object):
+    """
+    Scenarios of experiment files, pickled in `directory`.
+
+    An entry is found by the path of its file and is valid while the file
+    keeps its mtime and size, or, once they changed, its content hash: a
+    file touched by a checkout is not parsed again. Entries built by
+    another version of the parser are never used.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.expanduser(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.fingerprint = _fingerprint()
+
+    def _entry(self, yaml_path):
+        key = "{}:{}".format(self.fingerprint, os.path.abspath(yaml_path))
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + ".pickle")
+
+    def load(self, yaml_path):
+        """
+        Returns the cached scenarios of `yaml_path`, or None.
+        """
+        try:
+            with open(self._entry(yaml_path), "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as ex:
+            logger.debug("Ignoring cache entry of %s: %s", yaml_path, ex)
+            return None
+        mtime, size, _ = _stamp(yaml_path, digest=False)
+        if (mtime, size) == (entry["mtime"], entry["size"]):
+            return entry["scenarios"]
+        stamp = _stamp(yaml_path)
+        if stamp[2] != entry["digest"]:
+            return None
+        self.store(yaml_path, stamp, entry["scenarios"])
+        return entry["scenarios"]
+
+    def store(self, yaml_path, stamp, scenarios):
+        """
+        Caches `scenarios`, parsed from `yaml_path` when it had `stamp`.
+        """
+        mtime, size, digest = stamp
+        entry = {"mtime": mtime, "size": size, "digest": digest, "scenarios": scenarios}
+        path = self._entry(yaml_path)
+        temporary = "{}.{}".format(path, os.getpid())
+        with open(temporary, "wb") as f:
+            pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+
+def _iter_parse(yaml_path, cache_dir=None):
+    # Stamped before reading, a file changing meanwhile is parsed again.
+    stamp = _stamp(yaml_path)
+    scenarios = []
+    for scenario in ExperimentParser(yaml_path=yaml_path).iter_parse():
+        # Only kept for the cache, scenarios are yielded as they are parsed.
+        if cache_dir is not None:
+            scenarios.append(scenario)
+        yield scenario
+    if cache_dir is not None:
+        ParseCache(cache_dir).store(yaml_path, stamp, scenarios)
+
+
+def _parse(yaml_path, cache_dir=None):
+    return list(_iter_parse(yaml_path, cache_dir))
+
+
+def iter_experiments(yaml_paths, workers=None, cache_dir=None, stats=None):
+    """
+    Yields the scenarios of experiment files, in order, as they are parsed.
+
+    `yaml_paths` may be any iterable, consumed as scenarios are yielded.
+    Files missing from the cache are parsed in this process until there
+    are MIN_POOL_FILES of them, then in `workers` processes. At most a few
+    files per worker are read ahead, so memory does not depend on the
+    number of files.
+
+    Args:
+        yaml_paths (iterable): experiment files
+        workers (int): processes parsing files, None uses every core and 0
+            parses them in this process
+        cache_dir (str): directory of the parse cache, None disables it
+        stats (dict): updated with the number of `files`, of `cached`
+            ones, of `workers` and, once done, the `elapsed` seconds
+    Yields:
+        Disruption: scenarios of every file
+    """
+    start = time.monotonic()
+    if stats is None:
+        stats = {}
+    stats.update(files=0, cached=0, workers=0)
+    cache = ParseCache(cache_dir) if cache_dir is not None else None
+    if workers is None:
+        workers = os.cpu_count() or 1
+    window = max(MIN_POOL_FILES, workers * 4)
+    # Scenarios, futures or, before the pool started, paths to parse.
+    pending = collections.deque()
+    executor = None
+    missing = 0
+
+    def ready(head):
+        if isinstance(head, str):
+            # Parsed here unless the pool may still start.
+            return workers <= 1
+        if isinstance(head, concurrent.futures.Future):
+            return head.done()
+        return True
+
+    def result(head):
+        if isinstance(head, str):
+            return _iter_parse(head, cache_dir)
+        if isinstance(head, concurrent.futures.Future):
+            return head.result()
+        return head
+
+    try:
+        for yaml_path in yaml_paths:
+            stats["files"] += 1
+            scenarios = cache.load(yaml_path) if cache is not None else None
+            if scenarios is not None:
+                stats["cached"] += 1
+                pending.append(scenarios)
+            elif executor is not None:
+                pending.append(executor.submit(_parse, yaml_path, cache_dir))
+            else:
+                missing += 1
+                pending.append(yaml_path)
+                if workers > 1 and missing >= MIN_POOL_FILES:
+                    executor = concurrent.futures.ProcessPoolExecutor(workers)
+                    stats["workers"] = workers
+                    for index, head in enumerate(pending):
+                        if isinstance(head, str):
+                            pending[index] = executor.submit(_parse, head, cache_dir)
+            while pending and (len(pending) > window or ready(pending[0])):
+                yield from result(pending.popleft())
+        while pending:
+            yield from result(pending.popleft())
+    finally:
+        if executor is not None:
+            for head in pending:
+                if isinstance(head, concurrent.futures.Future):
+                    head.cancel()
+            executor.shutdown(wait=True)
+    stats["elapsed"] = time.monotonic() - start
+
+
+def parse_experiments(yaml_paths, workers=None, cache_dir=None):
+    """
+    Parses experiment files, in `workers` processes when there are enough
+    of them not found in the cache.
+
+    Args:
+        yaml_paths (list): experiment files
+        workers (int): processes parsing files, None uses every core and 0
+            parses them in this process
+        cache_dir (str): directory of the parse cache, None disables it
+    Returns:
+        tuple: the scenarios of every file, in order, and a dict with the
+        number of `files`, of `cached` ones, of `workers` and the `elapsed`
+        seconds
+    """
+    stats = {}
+    scenarios = list(iter_experiments(yaml_paths, workers, cache_dir, stats))
+    return scenarios, stats
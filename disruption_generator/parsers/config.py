@@ -9,6 +9,12 @@ DISRUPT_ACTION_KEY = "disrupt_action"
 NAME_KEY = "name"
 LISTENER_KEY = "listener"
 TRIGGER_KEY = "trigger"
+SCHEDULE_KEY = "schedule"
+INTERVAL_KEY = "interval"
+CRON_KEY = "cron"
+COUNT_KEY = "count"
+DURATION_KEY = "duration"
+SEED_KEY = "seed"
 FILE_LOCATION = "../experiments/example.yaml"
 REGEX_KEY = "regex"
 LOG_KEY = "log"
@@ -17,5 +23,50 @@ USERNAME_KEY = "username"
 PASSWORD_KEY = "password"
 PARAMS_KEY = "params"
 TARGET_HOST_KEY = "target_host"
+TARGET_GROUP_KEY = "target_group"
+HOST_GROUPS_KEY = "host_groups"
+BATCH_SIZE_KEY = "batch_size"
+MAX_FAILURES_KEY = "max_failures"
+SHELL_KEY = "shell"
+PROBE_KEY = "probe"
+COMMAND_KEY = "command"
+PORT_KEY = "port"
+URL_KEY = "url"
+STATUS_KEY = "status"
+BACKOFF_KEY = "backoff"
+MAX_INTERVAL_KEY = "max_interval"
+SUCCESSES_KEY = "successes"
+OBSERVER_KEY = "observer"
+CONNECTIONS_KEY = "connections"
+WARMUP_KEY = "warmup"
+COOLDOWN_KEY = "cooldown"
 WAIT_KEY = "wait"
 TIMEOUT_KEY = "timeout"
+AFTER_KEY = "after"
+PREFILTER_KEY = "prefilter"
+TYPE_KEY = "type"
+UNIT_KEY = "unit"
+PRIORITY_KEY = "priority"
+MATCHES_KEY = "matches"
+FIELDS_KEY = "fields"
+WINDOW_KEY = "window"
+CORRELATION_KEY = "key"
+THRESHOLD_KEY = "threshold"
+RATE_KEY = "rate"
+# listener types
+FILE_LISTENER = "file"
+JOURNALD_LISTENER = "journald"
+# action schedules
+AFTER_MATCH = "match"
+AFTER_PREVIOUS = "previous"
+# schedule types
+RATE_SCHEDULE = "rate"
+POISSON_SCHEDULE = "poisson"
+CRON_SCHEDULE = "cron"
+# probe types
+COMMAND_PROBE = "command"
+TCP_PROBE = "tcp"
+HTTP_PROBE = "http"
+# observer types
+TCP_OBSERVER = "tcp"
+HTTP_OBSERVER = "http"
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""
+Experiment files found in a directory tree.
+"""
+
+import fnmatch
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+INCLUDE = ("*.yaml", "*.yml")
+
+
+def _matches(relative, patterns):
+    return any(fnmatch.fnmatchcase(relative, pattern) for pattern in patterns)
+
+
+def discover(root, include=INCLUDE, exclude=()):
+    """
+    Yields the experiment files under `root`, recursively, as they are
+    found: directories are read one at a time, in name order.
+
+    Patterns are shell globs matched against the path relative to `root`,
+    `*` matching across directories. A directory matching `exclude` is not
+    entered.
+
+    Args:
+        root (str): directory of the experiments
+        include (tuple): globs of the files to yield
+        exclude (tuple): globs of the files and directories to skip
+    Yields:
+        str: path of an experiment file
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        relative_dir = os.path.relpath(dirpath, root)
+        if relative_dir == os.curdir:
+            relative_dir = ""
+        dirnames[:] = sorted(
+            dirname
+            for dirname in dirnames
+            if not _matches(os.path.join(relative_dir, dirname), exclude)
+        )
+        for filename in sorted(filenames):
+            relative = os.path.join(relative_dir, filename)
+            if _matches(relative, include) and not _matches(relative, exclude):
+                yield os.path.join(dirpath, filename)
+            else:
+                logger.debug("Ignoring %s", relative)
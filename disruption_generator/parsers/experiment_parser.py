@@ -1,10 +1,21 @@
 import attr
 import logging
-import yaml
+import math
+import re
 import zope.interface
 
 from . import config
-from .utils import Action, Listener, Disruption
+from ..engine.schedules import Cron, ScheduleException
+from ..trigger import pressure
+from .utils import (
+    Action,
+    Listener,
+    JournaldListener,
+    Disruption,
+    Observer,
+    Probe,
+    Schedule,
+)
 from zope.interface import implementer
 
 logger = logging.getLogger(__name__)
@@ -14,6 +25,17 @@ class ParserException(Exception):
     pass
 
 
+# Raised by the validation of an entry, reported with its line.
+_ENTRY_ERRORS = (
+    ParserException,
+    KeyError,
+    IndexError,
+    TypeError,
+    ValueError,
+    AttributeError,
+)
+
+
 class IParser(zope.interface.Interface):
     """
     Parser for experiments with disruptive actions definitions.
@@ -34,6 +56,23 @@ class ExperimentParser(object):
     yaml_path = attr.ib()
 
     def parse(self):
+        """
+        Returns the scenarios of every entry of the file, in a list.
+        """
+        return list(self.iter_parse())
+
+    def iter_parse(self):
+        """
+        Yields a :class:`Disruption` for each entry of the file as it is
+        read, document after document. An entry targeting a host group
+        declared further in the file is yielded at the end.
+
+        Raises:
+            ParserException: the file cannot be read or an entry is
+                invalid, with the file and line
+        """
+        import yaml
+
         def _init_listener(element_listener):
             """
             Returns listener info
@@ -44,6 +83,16 @@ class ExperimentParser(object):
                 Listener: object with listener info
             """
 
+            listener_type = element_listener.get(
+                config.TYPE_KEY, config.FILE_LISTENER
+            )
+            if listener_type == config.JOURNALD_LISTENER:
+                return _init_journald_listener(element_listener)
+            if listener_type != config.FILE_LISTENER:
+                raise ParserException(
+                    "Unknown listener type {}".format(listener_type)
+                )
+
             try:
                 regex = element_listener[config.REGEX_KEY]
                 log_file = element_listener[config.LOG_KEY]
@@ -54,21 +103,382 @@ class ExperimentParser(object):
                 raise ParserException(
                     "Missing {} definition from listener section".format(ex)
                 )
+            prefilter = element_listener.get(config.PREFILTER_KEY, False)
+            window = element_listener.get(config.WINDOW_KEY)
+            key = element_listener.get(config.CORRELATION_KEY)
+            threshold = _init_threshold(element_listener, window)
+            if isinstance(regex, list):
+                if threshold is not None:
+                    raise ParserException(
+                        "{} needs a single regex".format(config.THRESHOLD_KEY)
+                    )
+                regex = _init_sequence(regex, key)
+            elif key is not None or (window is not None and threshold is None):
+                raise ParserException(
+                    "{} and {} need a list of regexes".format(
+                        config.WINDOW_KEY, config.CORRELATION_KEY
+                    )
+                )
+            else:
+                _init_regex(regex)
             _listener = Listener(
                 regex=regex,
                 log=log_file,
                 target=host,
                 username=username,
                 password=password,
+                prefilter=prefilter,
+                window=window,
+                key=key,
+                threshold=threshold,
             )
             return _listener
 
-        def _init_actions(element_trigger):
+        def _init_threshold(element_listener, window):
+            """
+            Returns how many matches within the window fire the listener
+
+            Args:
+                element_listener (dict): yaml info of listener
+                window (int): length of the sliding window in seconds
+            Returns:
+                int: number of matching lines, None without a threshold
+            """
+
+            threshold = element_listener.get(config.THRESHOLD_KEY)
+            rate = element_listener.get(config.RATE_KEY)
+            if threshold is None and rate is None:
+                return None
+            if threshold is not None and rate is not None:
+                raise ParserException(
+                    "Use either {} or {} in listener section".format(
+                        config.THRESHOLD_KEY, config.RATE_KEY
+                    )
+                )
+            if not isinstance(window, (int, float)) or window <= 0:
+                raise ParserException(
+                    "{} and {} need a positive {}".format(
+                        config.THRESHOLD_KEY,
+                        config.RATE_KEY,
+                        config.WINDOW_KEY,
+                    )
+                )
+            if rate is not None:
+                # Lines per second over the window.
+                threshold = int(math.ceil(rate * window))
+            if not isinstance(threshold, int) or threshold < 1:
+                raise ParserException(
+                    "Invalid {} in listener section".format(
+                        config.THRESHOLD_KEY
+                    )
+                )
+            return threshold
+
+        def _init_sequence(expressions, key):
+            """
+            Returns the ordered regexes of a correlated listener
+
+            Args:
+                expressions (list): regexes to match in order
+                key (str): named group correlating the lines, if any
+            Returns:
+                tuple: validated regexes
+            """
+
+            if not expressions:
+                raise ParserException(
+                    "Empty list of regexes in listener section"
+                )
+            for expression in expressions:
+                groups = _init_regex(expression).groupindex
+                if key is not None and key not in groups:
+                    raise ParserException(
+                        "Regex {!r} has no group named {}".format(
+                            expression, key
+                        )
+                    )
+            return tuple(expressions)
+
+        def _init_regex(expression):
+            """
+            Returns a regex of the listener section, compiled
+
+            Args:
+                expression (str): regex to validate
+            Returns:
+                Pattern: compiled regex
+            """
+
+            try:
+                return re.compile(expression)
+            except (re.error, TypeError) as ex:
+                raise ParserException(
+                    "Invalid regex {!r} in listener section: {}".format(
+                        expression, ex
+                    )
+                )
+
+        def _init_journald_listener(element_listener):
+            """
+            Returns journald listener info
+
+            Args:
+                element_listener (dict): yaml info of listener
+            Returns:
+                JournaldListener: object with listener info
+            """
+
+            try:
+                host = element_listener[config.HOST_KEY]
+                username = element_listener[config.USERNAME_KEY]
+                password = element_listener[config.PASSWORD_KEY]
+            except KeyError as ex:
+                raise ParserException(
+                    "Missing {} definition from listener section".format(ex)
+                )
+            regex = element_listener.get(config.REGEX_KEY)
+            if regex is not None:
+                _init_regex(regex)
+            fields = element_listener.get(config.FIELDS_KEY, {})
+            if not isinstance(fields, dict):
+                raise ParserException(
+                    "{} must map journal fields to regexes".format(
+                        config.FIELDS_KEY
+                    )
+                )
+            for expression in fields.values():
+                _init_regex(expression)
+            _listener = JournaldListener(
+                target=host,
+                username=username,
+                password=password,
+                regex=regex,
+                unit=element_listener.get(config.UNIT_KEY),
+                priority=element_listener.get(config.PRIORITY_KEY),
+                matches=element_listener.get(config.MATCHES_KEY, {}),
+                fields=fields,
+            )
+            return _listener
+
+        def _init_schedule(element_schedule):
+            """
+            Returns schedule info
+
+            Args:
+                element_schedule (dict): yaml info of schedule
+            Returns:
+                Schedule: object with schedule info
+            """
+
+            kind = element_schedule.get(config.TYPE_KEY)
+            interval = element_schedule.get(config.INTERVAL_KEY)
+            cron = element_schedule.get(config.CRON_KEY)
+            count = element_schedule.get(config.COUNT_KEY)
+            duration = element_schedule.get(config.DURATION_KEY)
+            if kind == config.CRON_SCHEDULE:
+                try:
+                    Cron(cron or "")
+                except ScheduleException as ex:
+                    raise ParserException(str(ex))
+            elif kind in (config.RATE_SCHEDULE, config.POISSON_SCHEDULE):
+                if not isinstance(interval, (int, float)) or interval <= 0:
+                    raise ParserException(
+                        "{} schedules need a positive {}".format(
+                            kind, config.INTERVAL_KEY
+                        )
+                    )
+            else:
+                raise ParserException("Unknown schedule type {}".format(kind))
+            if count is None and duration is None:
+                raise ParserException(
+                    "Schedules need a {} or a {}".format(
+                        config.COUNT_KEY, config.DURATION_KEY
+                    )
+                )
+            return Schedule(
+                kind=kind,
+                interval=interval,
+                cron=cron,
+                count=count,
+                duration=duration,
+                seed=element_schedule.get(config.SEED_KEY),
+            )
+
+        def _init_probe(element_probe):
+            """
+            Returns recovery probe info
+
+            Args:
+                element_probe (dict): yaml info of probe
+            Returns:
+                Probe: object with probe info
+            """
+
+            kind = element_probe.get(config.TYPE_KEY)
+            required = {
+                config.COMMAND_PROBE: config.COMMAND_KEY,
+                config.TCP_PROBE: config.PORT_KEY,
+                config.HTTP_PROBE: config.URL_KEY,
+            }
+            if kind not in required:
+                raise ParserException("Unknown probe type {}".format(kind))
+            if element_probe.get(required[kind]) is None:
+                raise ParserException(
+                    "{} probes need a {}".format(kind, required[kind])
+                )
+            options = {
+                name: element_probe[key]
+                for name, key in (
+                    ("interval", config.INTERVAL_KEY),
+                    ("backoff", config.BACKOFF_KEY),
+                    ("max_interval", config.MAX_INTERVAL_KEY),
+                    ("timeout", config.TIMEOUT_KEY),
+                    ("successes", config.SUCCESSES_KEY),
+                )
+                if key in element_probe
+            }
+            for name, value in options.items():
+                if not isinstance(value, (int, float)) or value <= 0:
+                    raise ParserException(
+                        "Invalid probe {} {}".format(name, value)
+                    )
+            if options.get("backoff", 1) < 1:
+                raise ParserException("Probe backoff must be at least 1")
+            try:
+                return Probe(
+                    kind=kind,
+                    command=element_probe.get(config.COMMAND_KEY),
+                    port=element_probe.get(config.PORT_KEY),
+                    url=element_probe.get(config.URL_KEY),
+                    status=element_probe.get(config.STATUS_KEY),
+                    **options
+                )
+            except TypeError as ex:
+                raise ParserException("Invalid probe: {}".format(ex))
+
+        def _init_observer(element_observer):
+            """
+            Returns observer info
+
+            Args:
+                element_observer (dict): yaml info of observer
+            Returns:
+                Observer: object with observer info
+            """
+
+            kind = element_observer.get(config.TYPE_KEY, config.HTTP_OBSERVER)
+            if kind == config.HTTP_OBSERVER:
+                required = (config.URL_KEY,)
+            elif kind == config.TCP_OBSERVER:
+                required = (config.HOST_KEY, config.PORT_KEY)
+            else:
+                raise ParserException("Unknown observer type {}".format(kind))
+            for key in required:
+                if element_observer.get(key) is None:
+                    raise ParserException(
+                        "{} observers need a {}".format(kind, key)
+                    )
+            options = {
+                name: element_observer[key]
+                for name, key in (
+                    ("rate", config.RATE_KEY),
+                    ("connections", config.CONNECTIONS_KEY),
+                    ("timeout", config.TIMEOUT_KEY),
+                    ("warmup", config.WARMUP_KEY),
+                    ("cooldown", config.COOLDOWN_KEY),
+                )
+                if key in element_observer
+            }
+            for name, value in options.items():
+                positive = name in ("rate", "connections", "timeout")
+                if (
+                    not isinstance(value, (int, float))
+                    or value < 0
+                    or (positive and value == 0)
+                ):
+                    raise ParserException(
+                        "Invalid observer {} {}".format(name, value)
+                    )
+            try:
+                return Observer(
+                    kind=kind,
+                    url=element_observer.get(config.URL_KEY),
+                    host=element_observer.get(config.HOST_KEY),
+                    port=element_observer.get(config.PORT_KEY),
+                    status=element_observer.get(config.STATUS_KEY),
+                    **options
+                )
+            except TypeError as ex:
+                raise ParserException("Invalid observer: {}".format(ex))
+
+        def _init_hosts(element_action, groups):
+            """
+            Returns the target of an action
+
+            Args:
+                element_action (dict): yaml info of action
+                groups (dict): host lists by group name
+            Returns:
+                str|tuple: a single host or a tuple of hosts
+            """
+
+            if config.TARGET_GROUP_KEY in element_action:
+                group = element_action[config.TARGET_GROUP_KEY]
+                if group not in groups:
+                    raise ParserException(
+                        "Unknown host group {}".format(group)
+                    )
+                hosts = groups[group]
+            else:
+                hosts = element_action[config.TARGET_HOST_KEY]
+            if not isinstance(hosts, list):
+                return hosts
+            if not hosts or not all(isinstance(host, str) for host in hosts):
+                raise ParserException(
+                    "Invalid {} in action section".format(
+                        config.TARGET_HOST_KEY
+                    )
+                )
+            return tuple(hosts)
+
+        def _init_count(element_action, name, minimum):
+            """
+            Returns a number of hosts given as a count or a percentage
+
+            Args:
+                element_action (dict): yaml info of action
+                name (str): key of the number
+                minimum (int): smallest valid count
+            Returns:
+                int|str: count, percentage such as "25%" or None
+            """
+
+            value = element_action.get(name)
+            if value is None:
+                return None
+            if isinstance(value, str) and value.endswith("%"):
+                try:
+                    percent = float(value[:-1])
+                except ValueError:
+                    percent = -1
+                if not 0 <= percent <= 100:
+                    raise ParserException(
+                        "Invalid {} {} in action section".format(name, value)
+                    )
+                return value
+            if not isinstance(value, int) or value < minimum:
+                raise ParserException(
+                    "Invalid {} {} in action section".format(name, value)
+                )
+            return value
+
+        def _init_actions(element_trigger, groups):
             """
             Returns a list of actions info from trigger element
 
             Args:
                 element_trigger (dict): yaml info of trigger
+                groups (dict): host lists by group name
             Returns:
                 List(Action): dictionary with trigger info
             """
@@ -79,11 +489,29 @@ class ExperimentParser(object):
                     key = config.ACTION_KEY
                     _name = trigger[key][config.NAME_KEY]
                     params = trigger[key][config.PARAMS_KEY]
-                    target_host = trigger[key][config.TARGET_HOST_KEY]
+                    target_host = _init_hosts(trigger[key], groups)
                     username = trigger[key][config.USERNAME_KEY]
                     password = trigger[key][config.PASSWORD_KEY]
                     wait = trigger[key][config.WAIT_KEY]
                     timeout = trigger[key][config.TIMEOUT_KEY]
+                    after = trigger[key].get(
+                        config.AFTER_KEY, config.AFTER_MATCH
+                    )
+                    batch_size = _init_count(
+                        trigger[key], config.BATCH_SIZE_KEY, minimum=1
+                    )
+                    max_failures = _init_count(
+                        trigger[key], config.MAX_FAILURES_KEY, minimum=0
+                    )
+                    shell = trigger[key].get(config.SHELL_KEY, False)
+                    probe = None
+                    if config.PROBE_KEY in trigger[key]:
+                        probe = _init_probe(trigger[key][config.PROBE_KEY])
+                    if _name in pressure.OPTIONS:
+                        try:
+                            pressure.options(_name, params)
+                        except (pressure.PressureException, ValueError) as ex:
+                            raise ParserException(str(ex))
 
                     action = Action(
                         name=_name,
@@ -93,46 +521,154 @@ class ExperimentParser(object):
                         password=password,
                         wait=wait,
                         timeout=timeout,
+                        after=after,
+                        batch_size=batch_size,
+                        max_failures=max_failures,
+                        shell=shell,
+                        probe=probe,
                     )
                     _actions.append(action)
                 except KeyError as ex:
                     raise ParserException(
-                        "Missing %s definition from action section", ex
+                        "Missing {} definition from action section".format(ex)
                     )
             return _actions
 
-        doc = None
-        try:
-            with open(self.yaml_path, "r") as f:
-                data = f.read()
-                doc = yaml.safe_load(data)
-        except IOError as e:
-            logging.error(
-                "Failed to open file {file_name}, Why: {err}".format(
-                    file_name=self.yaml_path, err=e
-                )
-            )
+        def _missing_groups(element, groups):
+            """
+            Tells whether an action targets a group not declared yet.
+            """
+            for trigger in element.get(config.TRIGGER_KEY) or []:
+                action = (trigger or {}).get(config.ACTION_KEY) or {}
+                group = action.get(config.TARGET_GROUP_KEY)
+                if group is not None and group not in groups:
+                    return True
+            return False
 
-        _scenarios = []
-        for disrupt_action in doc:
-            name = disrupt_action[config.DISRUPT_ACTION_KEY][0][
-                config.NAME_KEY
-            ]
-            listener = _init_listener(
-                disrupt_action[config.DISRUPT_ACTION_KEY][0][
-                    config.LISTENER_KEY
-                ]
+        def _init_disruption(element, groups):
+            name = element[config.NAME_KEY]
+            listener = schedule = None
+            if config.SCHEDULE_KEY in element:
+                schedule = _init_schedule(element[config.SCHEDULE_KEY])
+            else:
+                listener = _init_listener(element[config.LISTENER_KEY])
+            actions = _init_actions(element[config.TRIGGER_KEY], groups)
+            observer = None
+            if config.OBSERVER_KEY in element:
+                observer = _init_observer(element[config.OBSERVER_KEY])
+
+            return Disruption(
+                name=name,
+                listener=listener,
+                actions=actions,
+                schedule=schedule,
+                observer=observer,
             )
-            actions = _init_actions(
-                disrupt_action[config.DISRUPT_ACTION_KEY][0][
-                    config.TRIGGER_KEY
-                ]
+
+        def _at(line, ex):
+            if isinstance(ex, KeyError):
+                ex = "Missing {} definition".format(ex)
+            return ParserException(
+                "{}:{}: {}".format(self.yaml_path, line, ex)
             )
 
-            disruption = Disruption(
-                name=name, listener=listener, actions=actions
+        # Host groups apply to every scenario of the file.
+        groups = {}
+        deferred = []
+        try:
+            with open(self.yaml_path, "rb") as f:
+                for line, disrupt_action in _entries(_loader()(f)):
+                    try:
+                        if not isinstance(disrupt_action, dict):
+                            raise ParserException(
+                                "Expected a mapping, got {!r}".format(
+                                    disrupt_action
+                                )
+                            )
+                        groups.update(
+                            disrupt_action.get(config.HOST_GROUPS_KEY) or {}
+                        )
+                        if config.DISRUPT_ACTION_KEY not in disrupt_action:
+                            continue
+                        element = disrupt_action[config.DISRUPT_ACTION_KEY][0]
+                        if _missing_groups(element, groups):
+                            deferred.append((line, element))
+                            continue
+                        disruption = _init_disruption(element, groups)
+                    except _ENTRY_ERRORS as ex:
+                        raise _at(line, ex)
+                    yield disruption
+        except IOError as ex:
+            raise ParserException(
+                "Failed to open {}: {}".format(self.yaml_path, ex.strerror)
             )
+        except yaml.YAMLError as ex:
+            mark = getattr(ex, "problem_mark", None)
+            if mark is None:
+                raise ParserException("{}: {}".format(self.yaml_path, ex))
+            problem = (getattr(ex, "context", None), ex.problem)
+            raise _at(mark.line + 1, " ".join(filter(None, problem)))
+
+        for line, element in deferred:
+            try:
+                disruption = _init_disruption(element, groups)
+            except _ENTRY_ERRORS as ex:
+                raise _at(line, ex)
+            yield disruption
+
+
+_Loader = None
+
 
-            _scenarios.append(disruption)
+def _loader():
+    """
+    Returns the class of the loaders reading experiments entry by entry.
+
+    With libyaml, its parser produces the events and only composing and
+    constructing the entries is left to Python, one at a time.
+    """
+    global _Loader
+    if _Loader is None:
+        import yaml
+        from yaml.composer import Composer
+
+        if hasattr(yaml, "CSafeLoader"):
+
+            class _Loader(yaml.CSafeLoader, Composer):
+                def __init__(self, stream):
+                    yaml.CSafeLoader.__init__(self, stream)
+                    Composer.__init__(self)
+
+        else:
+            _Loader = yaml.SafeLoader
+    return _Loader
+
+
+def _entries(loader):
+    """
+    Yields the line and value of every entry of a YAML stream: the items
+    of documents which are lists, and other documents whole. Empty
+    documents are skipped.
+    """
+    from yaml.events import (
+        SequenceEndEvent,
+        SequenceStartEvent,
+        StreamEndEvent,
+    )
 
-        return _scenarios
+    loader.get_event()  # stream start
+    while not loader.check_event(StreamEndEvent):
+        loader.get_event()  # document start
+        if loader.check_event(SequenceStartEvent):
+            loader.get_event()
+            while not loader.check_event(SequenceEndEvent):
+                node = loader.compose_node(None, None)
+                yield node.start_mark.line + 1, loader.construct_document(node)
+            loader.get_event()
+        else:
+            node = loader.compose_node(None, None)
+            value = loader.construct_document(node)
+            if value is not None:
+                yield node.start_mark.line + 1, value
+        loader.get_event()  # document end
+        loader.anchors = {}
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+"""
+Experiments compiled into a plan file, run without parsing them again.
+"""
+
+import hashlib
+import json
+import struct
+import zlib
+
+import attr
+
+from .cache import _fingerprint
+from .utils import (
+    Action,
+    Disruption,
+    JournaldListener,
+    Listener,
+    Observer,
+    Probe,
+    Schedule,
+)
+
+MAGIC = b"DGPLAN"
+PLAN_VERSION = 2  # bump when the layout of plans changes
+_HEADER = struct.Struct(">6sH32s")
+
+# Only these classes are built from a plan, which holds nothing but data.
+_CLASSES = {
+    cls.__name__: cls
+    for cls in (
+        Action,
+        Disruption,
+        JournaldListener,
+        Listener,
+        Observer,
+        Probe,
+        Schedule,
+    )
+}
+
+
+class PlanException(Exception):
+    pass
+
+
+class _Encoder(object):
+    """
+    Turns scenarios into JSON data. Equal listeners, actions, probes and
+    observers are stored once in `objects` and referred to by index.
+    """
+
+    def __init__(self):
+        self.objects = []
+        self.refs = {}
+
+    def encode(self, value, shared=True):
+        if attr.has(type(value)):
+            fields = {
+                field.name: self.encode(getattr(value, field.name))
+                for field in attr.fields(type(value))
+            }
+            encoded = {"class": type(value).__name__, "fields": fields}
+            if not shared:
+                return encoded
+            key = json.dumps(encoded, sort_keys=True)
+            if key not in self.refs:
+                self.refs[key] = len(self.objects)
+                self.objects.append(encoded)
+            return {"ref": self.refs[key]}
+        if isinstance(value, tuple):
+            return {"tuple": [self.encode(item) for item in value]}
+        if isinstance(value, list):
+            return [self.encode(item) for item in value]
+        if isinstance(value, dict):
+            return {"dict": {key: self.encode(item) for key, item in value.items()}}
+        return value
+
+
+def _decoder(objects):
+    """
+    Returns a function building the values encoded by _Encoder. Objects are
+    built without running their validators: they passed them when compiled.
+    """
+    built = []
+
+    def decode(value):
+        if isinstance(value, list):
+            return [decode(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if "ref" in value:
+            return built[value["ref"]]
+        if "tuple" in value:
+            return tuple(decode(item) for item in value["tuple"])
+        if "dict" in value:
+            return {key: decode(item) for key, item in value["dict"].items()}
+        cls = _CLASSES[value["class"]]
+        element = cls.__new__(cls)
+        for field in attr.fields(cls):
+            setattr(element, field.name, decode(value["fields"][field.name]))
+        return element
+
+    # Objects only refer to the ones before them.
+    for encoded in objects:
+        built.append(decode(encoded))
+    return decode
+
+
+def dumps(scenarios):
+    """
+    Returns the plan of `scenarios`: a header with the format, then the
+    compressed scenarios as JSON, along with the fingerprint of the parser
+    that validated them.
+
+    The same scenarios always give the same bytes, so plans of two releases
+    can be compared.
+    """
+    encoder = _Encoder()
+    encoded = [encoder.encode(scenario, shared=False) for scenario in scenarios]
+    document = {
+        "fingerprint": _fingerprint(),
+        "objects": encoder.objects,
+        "scenarios": encoded,
+    }
+    text = json.dumps(document, sort_keys=True, separators=(",", ":"))
+    body = zlib.compress(text.encode("utf-8"), 9)
+    digest = hashlib.sha256(body).digest()
+    return _HEADER.pack(MAGIC, PLAN_VERSION, digest) + body
+
+
+def loads(data):
+    """
+    Returns the scenarios of a plan, as they were validated when compiled.
+
+    Raises:
+        PlanException: the data is no plan, is corrupt or was compiled by
+            another version of the parser
+    """
+    try:
+        magic, version, digest = _HEADER.unpack_from(data)
+    except struct.error:
+        raise PlanException("Not a plan, too short")
+    if magic != MAGIC:
+        raise PlanException("Not a plan")
+    if version != PLAN_VERSION:
+        raise PlanException(
+            "Plan format {} is not supported, compile it again".format(version)
+        )
+    body = data[_HEADER.size:]
+    if hashlib.sha256(body).digest() != digest:
+        raise PlanException("Corrupt plan")
+    try:
+        document = json.loads(zlib.decompress(body).decode("utf-8"))
+    except (zlib.error, ValueError) as ex:
+        raise PlanException("Corrupt plan: {}".format(ex))
+    if document.get("fingerprint") != _fingerprint():
+        raise PlanException(
+            "Plan compiled by another version of the parser, compile it again"
+        )
+    try:
+        decode = _decoder(document["objects"])
+        return [decode(scenario) for scenario in document["scenarios"]]
+    except (KeyError, IndexError, TypeError) as ex:
+        raise PlanException("Corrupt plan: {!r}".format(ex))
+
+
+def write_plan(scenarios, path):
+    with open(path, "wb") as f:
+        f.write(dumps(scenarios))
+
+
+def read_plan(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
@@ -2,40 +2,266 @@ import attr
 import six
 
 
+@attr.s(hash=True)
+class Probe(object):
+    """
+    Tells when a disrupted service is healthy again.
+
+    `kind` is "command" (`command` exits with 0 on the target host), "tcp"
+    (`port` of the target host accepts connections) or "http" (`url`, where
+    `{host}` stands for the target host, answers with `status`, or any
+    status below 400). It is polled every `interval` seconds, multiplied by
+    `backoff` after each failure up to `max_interval`, until `successes`
+    polls in a row succeeded or `timeout` seconds passed.
+    """
+
+    kind = attr.ib(validator=attr.validators.in_(("command", "tcp", "http")))
+    command = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(six.text_type)),
+    )
+    port = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(int)),
+    )
+    url = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(six.text_type)),
+    )
+    status = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(int)),
+    )
+    interval = attr.ib(default=1, validator=attr.validators.instance_of((int, float)))
+    backoff = attr.ib(default=1, validator=attr.validators.instance_of((int, float)))
+    max_interval = attr.ib(
+        default=30, validator=attr.validators.instance_of((int, float))
+    )
+    timeout = attr.ib(default=300, validator=attr.validators.instance_of((int, float)))
+    successes = attr.ib(default=1, validator=attr.validators.instance_of(int))
+
+
 @attr.s(hash=True)
 class Action(object):
     """
     A trigger object with the requested disruptive action.
+
+    The action fires `wait` seconds after the match of the listener, or
+    after the previous action of the scenario when `after` is "previous",
+    in which case it does not wait for the listener.
+
+    `target_host` is one host or a tuple of them, rolled out `batch_size`
+    hosts at a time (a count or a percentage such as "25%", all at once by
+    default) until more than `max_failures` hosts (count or percentage, 0
+    by default) failed. With `shell`, a shell is opened on every host while
+    the listener waits and firing writes the command to it. With a
+    `probe`, the time every host takes to recover is measured.
     """
 
     name = attr.ib(validator=attr.validators.instance_of(six.text_type))
     params = attr.ib(validator=attr.validators.instance_of(six.text_type))
-    target_host = attr.ib(validator=attr.validators.instance_of(six.text_type))
+    target_host = attr.ib(validator=attr.validators.instance_of((six.text_type, tuple)))
     username = attr.ib(validator=attr.validators.instance_of(str))
     password = attr.ib(validator=attr.validators.instance_of(str))
     wait = attr.ib(validator=attr.validators.instance_of(int))
     timeout = attr.ib(validator=attr.validators.instance_of(int))
+    after = attr.ib(
+        default="match", validator=attr.validators.in_(("match", "previous"))
+    )
+    batch_size = attr.ib(
+        default=None,
+        validator=attr.validators.optional(
+            attr.validators.instance_of((int, six.text_type))
+        ),
+    )
+    max_failures = attr.ib(
+        default=None,
+        validator=attr.validators.optional(
+            attr.validators.instance_of((int, six.text_type))
+        ),
+    )
+
+    shell = attr.ib(default=False, validator=attr.validators.instance_of(bool))
+    probe = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(Probe)),
+    )
+
+    @property
+    def hosts(self):
+        """
+        Hosts the action targets, in rollout order.
+        """
+        if isinstance(self.target_host, tuple):
+            return self.target_host
+        return (self.target_host,)
 
 
 @attr.s(hash=True)
 class Listener(object):
     """
     A listener object which holds necessary data for logs and triggers.
+
+    `regex` is either one expression or an ordered tuple of them which must
+    all match, in order, within `window` seconds; with `key`, only lines
+    sharing the value of that named group are correlated. With a
+    `threshold`, a single expression must match that many lines within
+    `window` seconds instead.
     """
 
-    regex = attr.ib(validator=attr.validators.instance_of(six.text_type))
+    regex = attr.ib(validator=attr.validators.instance_of((six.text_type, tuple)))
     log = attr.ib(validator=attr.validators.instance_of(six.text_type))
     target = attr.ib(validator=attr.validators.instance_of(six.text_type))
     username = attr.ib(validator=attr.validators.instance_of(str))
     password = attr.ib(validator=attr.validators.instance_of(str))
+    prefilter = attr.ib(default=False, validator=attr.validators.instance_of(bool))
+    window = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of((int, float))),
+    )
+    key = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(six.text_type)),
+    )
+    threshold = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(int)),
+    )
+
+    @property
+    def correlated(self):
+        """
+        Tells whether the listener waits for a sequence of lines.
+        """
+        return isinstance(self.regex, tuple)
+
+
+@attr.s(hash=True)
+class JournaldListener(object):
+    """
+    A listener following the systemd journal of a host instead of a log file.
+    """
+
+    target = attr.ib(validator=attr.validators.instance_of(six.text_type))
+    username = attr.ib(validator=attr.validators.instance_of(str))
+    password = attr.ib(validator=attr.validators.instance_of(str))
+    regex = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(six.text_type)),
+    )
+    unit = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(six.text_type)),
+    )
+    priority = attr.ib(
+        default=None,
+        validator=attr.validators.optional(
+            attr.validators.instance_of((six.text_type, int))
+        ),
+    )
+    matches = attr.ib(
+        default=attr.Factory(dict),
+        validator=attr.validators.instance_of(dict),
+        hash=False,
+    )
+    fields = attr.ib(
+        default=attr.Factory(dict),
+        validator=attr.validators.instance_of(dict),
+        hash=False,
+    )
+
+
+@attr.s(hash=True)
+class Schedule(object):
+    """
+    Fires the actions of a scenario on time instead of on log events.
+
+    `kind` is "rate" (every `interval` seconds), "poisson" (random arrivals,
+    `interval` seconds apart on average) or "cron" (every minute matching
+    `cron`). Firing stops after `count` times or `duration` seconds.
+    """
+
+    kind = attr.ib(validator=attr.validators.in_(("rate", "poisson", "cron")))
+    interval = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of((int, float))),
+    )
+    cron = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(six.text_type)),
+    )
+    count = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(int)),
+    )
+    duration = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of((int, float))),
+    )
+    seed = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(int)),
+    )
+
+
+@attr.s(hash=True)
+class Observer(object):
+    """
+    Load sent to a service endpoint for the whole scenario.
+
+    `kind` is "http" (GET `url`, expecting `status` or any status below 400)
+    or "tcp" (connect to `host` and `port`). `rate` requests per second are
+    sent over at most `connections` connections, each failing after
+    `timeout` seconds. It starts `warmup` seconds before the scenario and
+    stops `cooldown` seconds after it.
+    """
+
+    kind = attr.ib(validator=attr.validators.in_(("http", "tcp")))
+    url = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(six.text_type)),
+    )
+    host = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(six.text_type)),
+    )
+    port = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(int)),
+    )
+    status = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(int)),
+    )
+    rate = attr.ib(default=10, validator=attr.validators.instance_of((int, float)))
+    connections = attr.ib(default=10, validator=attr.validators.instance_of(int))
+    timeout = attr.ib(default=5, validator=attr.validators.instance_of((int, float)))
+    warmup = attr.ib(default=0, validator=attr.validators.instance_of((int, float)))
+    cooldown = attr.ib(default=0, validator=attr.validators.instance_of((int, float)))
 
 
 @attr.s(hash=True)
 class Disruption(object):
     """
     A disruptive action with all necessary information for causing trouble.
+
+    Actions are fired on the events of `listener`, or on the times of
+    `schedule` for scenarios without a listener. An `observer` measures the
+    service under load meanwhile.
     """
 
     name = attr.ib(validator=attr.validators.instance_of(six.text_type))
-    listener = attr.ib(validator=attr.validators.instance_of(Listener))
+    listener = attr.ib(
+        validator=attr.validators.optional(
+            attr.validators.instance_of((Listener, JournaldListener))
+        )
+    )
     actions = attr.ib(validator=attr.validators.instance_of(list))
+    schedule = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(Schedule)),
+    )
+    observer = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(Observer)),
+    )
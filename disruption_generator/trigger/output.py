@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import datetime
+import os
+import re
+
+OUTPUT_LINES = 100  # lines of command output kept in memory per host
+
+
+class OutputCapture(object):
+    """
+    Timestamped lines of the output of a command.
+
+    The last `max_lines` lines are kept in `lines` and, with a `path`, every
+    line is appended to that file as it arrives, so long running commands
+    use bounded memory and their progress can be followed.
+    """
+
+    def __init__(self, path=None, max_lines=OUTPUT_LINES):
+        self.path = path
+        self.lines = collections.deque(maxlen=max_lines)
+        self.count = 0
+        self._file = open(path, "a") if path is not None else None
+
+    def add(self, line):
+        stamp = datetime.datetime.now()
+        line = line.rstrip("\n")
+        self.count += 1
+        self.lines.append((stamp, line))
+        if self._file is not None:
+            self._file.write("{} {}\n".format(stamp.isoformat(), line))
+            self._file.flush()
+
+    def tail(self):
+        return [line for _, line in self.lines]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def output_path(output_dir, label, host):
+    """
+    Returns a new file name for the output of `label` on `host`.
+    """
+    stamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S.%f")
+    name = re.sub(r"[^\w.-]+", "_", "{}_{}_{}".format(label, host, stamp))
+    return os.path.join(output_dir, name + ".log")
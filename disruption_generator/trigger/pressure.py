@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""
+Commands applying bounded pressure on a host.
+
+The pressure runs in the foreground of the SSH session, so the action lasts
+`duration` seconds and its output is captured. It is bounded on the host,
+so it still expires when the session or this process goes away.
+Options are given in the `params` of the action as `name=value` pairs.
+"""
+
+import re
+import shlex
+import uuid
+
+SECONDS = r"[1-9]\d*"
+COUNT = r"\d+"
+SIZE = r"[1-9]\d*[KMG]?"
+PATH = r"/[\w./-]*"
+DEVICE = r"[\w.@-]+"
+DELAY = r"\d+(\.\d+)?(us|ms|s)"
+PERCENT = r"\d+(\.\d+)?%"
+
+# action -> option -> (pattern, default), options without default are required
+OPTIONS = {
+    "cpu_burn": {"duration": (SECONDS, None), "cores": (COUNT, "0")},
+    "memory_pressure": {"duration": (SECONDS, None), "size": (SIZE, None)},
+    "disk_io": {
+        "duration": (SECONDS, None),
+        "path": (PATH, "/var/tmp"),
+        "size": (SIZE, "1G"),
+        "block_size": (SIZE, "1M"),
+    },
+    "network_delay": {
+        "duration": (SECONDS, None),
+        "dev": (DEVICE, None),
+        "delay": (DELAY, "100ms"),
+        "jitter": (DELAY, "0ms"),
+        "loss": (PERCENT, "0%"),
+    },
+}
+
+UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+class PressureException(Exception):
+    pass
+
+
+def options(name, params):
+    """
+    Returns the validated options of a pressure action.
+
+    Args:
+        name (str): name of the action
+        params (str): space separated `name=value` pairs
+    Returns:
+        dict: value of every option, defaults included
+    """
+    known = OPTIONS[name]
+    values = {}
+    for pair in shlex.split(params):
+        option, sep, value = pair.partition("=")
+        if not sep or option not in known:
+            raise PressureException(
+                "Unknown {} option '{}', expected {}".format(
+                    name, pair, ", ".join(sorted(known))
+                )
+            )
+        if not re.fullmatch(known[option][0], value):
+            raise PressureException(
+                "Invalid {} option {}={}".format(name, option, value)
+            )
+        values[option] = value
+    for option, (_, default) in known.items():
+        if option not in values:
+            if default is None:
+                raise PressureException("Missing {} option {}".format(name, option))
+            values[option] = default
+    return values
+
+
+def to_bytes(size):
+    if size[-1] in UNITS:
+        return int(size[:-1]) * UNITS[size[-1]]
+    return int(size)
+
+
+def _bounded(duration, command):
+    # `timeout` exits with 124 once the pressure lasted its whole duration.
+    return "{{ timeout {} {} || test $? -eq 124; }}".format(duration, command)
+
+
+def cpu_burn(params):
+    values = options("cpu_burn", params)
+    cores = values["cores"] if values["cores"] != "0" else "$(nproc)"
+    burn = "timeout {} sh -c 'while :; do :; done'".format(values["duration"])
+    script = "{{ for i in $(seq {}); do {} & done; wait; }}".format(cores, burn)
+    return "command -v timeout >/dev/null && " + script
+
+
+def memory_pressure(params):
+    values = options("memory_pressure", params)
+    # Every page is written so the memory is really resident.
+    code = "import time; b = b'x' * {}; time.sleep({})".format(
+        to_bytes(values["size"]), values["duration"]
+    )
+    command = "python3 -c {}".format(shlex.quote(code))
+    return "command -v python3 >/dev/null && " + _bounded(values["duration"], command)
+
+
+def disk_io(params):
+    values = options("disk_io", params)
+    path = "{}/disruption_io_{}".format(values["path"].rstrip("/"), uuid.uuid4().hex)
+    block_size = to_bytes(values["block_size"])
+    count = max(1, to_bytes(values["size"]) // block_size)
+    # A failing dd ends the loop, so the action fails instead of idling.
+    loop = (
+        "while "
+        "dd if=/dev/zero of={path} bs={bs} count={count} oflag=direct conv=fsync "
+        "&& dd if={path} of=/dev/null bs={bs} iflag=direct; "
+        "do :; done; exit 1"
+    ).format(path=path, bs=block_size, count=count)
+    script = (
+        "{{ timeout {} sh -c {}; status=$?; rm -f {}; test $status -eq 124; }}".format(
+            values["duration"], shlex.quote(loop), path
+        )
+    )
+    return "test -d {0} -a -w {0} && ".format(values["path"]) + script
+
+
+def network_delay(params):
+    values = options("network_delay", params)
+    add = "tc qdisc add dev {dev} root netem delay {delay} {jitter} loss {loss}"
+    remove = "sleep {duration}; tc qdisc del dev {dev} root netem"
+    # The qdisc is only removed when it was added.
+    return "{} && {{ {}; }}".format(add.format(**values), remove.format(**values))
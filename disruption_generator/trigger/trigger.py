@@ -1,18 +1,120 @@
+import asyncio
 import logging
+import math
+import time
+import uuid
 
-from asyncssh import SSHClient, create_connection
+import attr
+from asyncssh import STDOUT, Error
 
-ALL_ACTIONS = ["restart_service"]
+from ..connection.pool import ConnectionPool
+from . import pressure
+from .output import OUTPUT_LINES, OutputCapture, output_path
+
+ALL_ACTIONS = [
+    "restart_service",
+    "cpu_burn",
+    "memory_pressure",
+    "disk_io",
+    "network_delay",
+]
 
 logger = logging.getLogger(__name__)
 
 
+@attr.s
+class HostResult(object):
+    """
+    Outcome of an action on one of its target hosts.
+    """
+
+    host = attr.ib()
+    success = attr.ib(default=None)
+    # seconds from connecting to the end of the command
+    duration = attr.ib(default=None)
+    error = attr.ib(default=None)
+    # not run because an earlier batch failed too often
+    skipped = attr.ib(default=False)
+    # event loop time the command was sent
+    fired_at = attr.ib(default=None)
+    # OutputCapture of the command
+    output = attr.ib(default=None)
+    # Recovery measured by the probe of the action
+    recovery = attr.ib(default=None)
+
+
+class _Armed(object):
+    """
+    A connection, and optionally a shell, held open until the action fires.
+    """
+
+    def __init__(self, lease, conn):
+        self.lease = lease
+        self.conn = conn
+        self.process = None
+
+
+def resolve_count(value, total, default):
+    """
+    Returns how many of `total` hosts `value` stands for.
+
+    Args:
+        value (int|str): a count, a percentage such as "25%" or None
+        total (int): number of hosts
+        default (int): count used when `value` is None
+    """
+    if value is None:
+        return default
+    if isinstance(value, str) and value.endswith("%"):
+        return int(math.floor(float(value[:-1]) * total / 100.0))
+    return int(value)
+
+
 class Trigger(object):
-    def __init__(self, action, username, password, ssh_host_key):
+    """
+    Runs an action on its target hosts.
+
+    Hosts are rolled out `action.batch_size` at a time, the hosts of a batch
+    concurrently. Once more than `action.max_failures` hosts failed, the
+    remaining batches are skipped. The outcome on every host is kept in
+    `results`.
+
+    `arm` opens the connections, and optionally a shell on each of them,
+    ahead of time so that firing only has to send the command.
+
+    The output of the command is streamed, the last `output_lines` lines of
+    every host are kept and, with an `output_dir`, all of them are written
+    to a file per host named after `label`, the action name by default.
+    """
+
+    def __init__(
+        self,
+        action,
+        username,
+        password,
+        ssh_host_key,
+        pool=None,
+        output_dir=None,
+        label=None,
+        output_lines=OUTPUT_LINES,
+        log=None,
+    ):
         self.action = action
         self.username = username
         self.password = password
         self.ssh_host_key = ssh_host_key
+        # A pool created here is closed by `close`.
+        self._own_pool = pool is None
+        self.pool = pool if pool is not None else ConnectionPool()
+        self.output_dir = output_dir
+        self.label = label if label is not None else action.name
+        self.output_lines = output_lines
+        # Logger, or adapter naming the scenario, of every record.
+        self.log = log if log is not None else logger
+        self.results = []
+        self._armed = {}
+        # Ends the output of a command sent to an armed shell.
+        self._marker = "__exit_status_{}__ ".format(uuid.uuid4().hex)
 
     def __getattr__(self, item):
         attr_err_msg = "Unexpected disruptive action other than {}".format(
@@ -21,26 +123,167 @@ class Trigger(object):
         assert item in ALL_ACTIONS, attr_err_msg
         return self.__getattribute__(item)
 
+    async def arm(self, shell=False):
+        """
+        Connects to every target host, and opens a shell on them with
+        `shell`. Hosts that cannot be reached are connected to when firing.
+        """
+        await asyncio.gather(
+            *[
+                self._arm_host(host, shell)
+                for host in self.action.hosts
+                if host not in self._armed
+            ]
+        )
+
+    async def _arm_host(self, host, shell):
+        try:
+            lease = self.pool.connection(
+                host, self.username, self.password, self.ssh_host_key
+            )
+            conn = await lease.__aenter__()
+        except (OSError, Error) as exc:
+            self.log.warning("Cannot pre-connect to %s: %s" % (host, exc))
+            return
+        armed = self._armed[host] = _Armed(lease, conn)
+        if shell:
+            try:
+                armed.process = await conn.create_process(
+                    stderr=STDOUT, errors="replace"
+                )
+            except (OSError, Error) as exc:
+                self.log.warning("Cannot open a shell on %s: %s" % (host, exc))
+
+    async def disarm(self):
+        """
+        Releases the connections and shells `arm` left unused.
+        """
+        armed, self._armed = self._armed, {}
+        for entry in armed.values():
+            await self._release(entry)
+
+    async def close(self):
+        """
+        Disarms, and closes the pool the trigger created.
+        """
+        await self.disarm()
+        if self._own_pool:
+            await self.pool.close()
+
+    async def _release(self, armed, exc_type=None):
+        if armed.process is not None:
+            armed.process.close()
+        await armed.lease.__aexit__(exc_type, None, None)
+
     async def run_client(self, cmd):
-        conn, client = await create_connection(
-            SSHClient,
-            host=self.action.target_host,
-            known_hosts=None,
-            username=self.username,
-            password=self.password,
-            client_keys=self.ssh_host_key,
+        return await self.run_command("%s %s" % (cmd, self.action.params))
+
+    async def run_command(self, command):
+        hosts = self.action.hosts
+        batch_size = max(
+            1, resolve_count(self.action.batch_size, len(hosts), len(hosts))
         )
+        max_failures = resolve_count(self.action.max_failures, len(hosts), 0)
+        self.results = [HostResult(host) for host in hosts]
+        failures = 0
+        for start in range(0, len(hosts), batch_size):
+            batch = self.results[start:start + batch_size]
+            if failures > max_failures:
+                for result in batch:
+                    result.skipped = True
+                continue
+            await asyncio.gather(*[self._run_on(result, command) for result in batch])
+            failures += len([result for result in batch if not result.success])
+            if failures > max_failures and start + batch_size < len(hosts):
+                self.log.warning(
+                    "Stopping '%s' after %d failed hosts, %d hosts left",
+                    command,
+                    failures,
+                    len(hosts) - start - batch_size,
+                )
+        return failures == 0
 
-        async with conn:
-            logger.debug("Connected to %s", self.action.target_host)
-            logger.info("Running: '%s %s'" % (cmd, self.action.params))
-            result = await conn.run("%s %s" % (cmd, self.action.params))
-            if result.exit_status == 0:
-                return True
-            else:
-                return False
+    def _capture(self, host):
+        path = None
+        if self.output_dir is not None:
+            path = output_path(self.output_dir, self.label, host)
+        return OutputCapture(path, self.output_lines)
+
+    async def _run_on(self, result, command):
+        started = time.monotonic()
+        result.output = self._capture(result.host)
+        armed = self._armed.pop(result.host, None)
+        try:
+            if armed is not None:
+                exc_type = None
+                try:
+                    result.success = await self._run_armed(armed, result, command)
+                    return
+                except (OSError, Error) as exc:
+                    exc_type = type(exc)
+                    # Running the command twice is worse than failing.
+                    if result.fired_at is not None:
+                        raise
+                    self.log.warning(
+                        "Pre-armed session to %s failed, reconnecting: %s"
+                        % (result.host, exc)
+                    )
+                finally:
+                    await self._release(armed, exc_type)
+            async with self.pool.connection(
+                result.host, self.username, self.password, self.ssh_host_key
+            ) as conn:
+                self.log.info("Running on %s: '%s'" % (result.host, command))
+                result.fired_at = asyncio.get_event_loop().time()
+                result.success = await self._stream(conn, result, command)
+        except (OSError, Error) as exc:
+            # One unreachable host must not abort the rest of the rollout.
+            self.log.error("Running on %s failed: %s" % (result.host, exc))
+            result.success = False
+            result.error = str(exc)
+        finally:
+            result.duration = time.monotonic() - started
+            result.output.close()
+
+    async def _run_armed(self, armed, result, command):
+        self.log.info("Running on %s: '%s'" % (result.host, command))
+        result.fired_at = asyncio.get_event_loop().time()
+        if armed.process is None:
+            return await self._stream(armed.conn, result, command)
+        armed.process.stdin.write("{}\necho {}$?\n".format(command, self._marker))
+        while True:
+            line = await armed.process.stdout.readline()
+            if not line:
+                raise ConnectionResetError("Shell on {} exited".format(result.host))
+            marker = line.find(self._marker)
+            if marker < 0:
+                result.output.add(line)
+                continue
+            # Output without a final newline precedes the marker.
+            if marker:
+                result.output.add(line[:marker])
+            return int(line[marker + len(self._marker):]) == 0
+
+    async def _stream(self, conn, result, command):
+        process = await conn.create_process(command, stderr=STDOUT, errors="replace")
+        async for line in process.stdout:
+            result.output.add(line)
+        outcome = await process.wait()
+        return outcome.exit_status == 0
 
     async def restart_service(self):
         cmd = "systemctl restart"
         result = await self.run_client(cmd)
         return result
+
+    async def cpu_burn(self):
+        return await self.run_command(pressure.cpu_burn(self.action.params))
+
+    async def memory_pressure(self):
+        return await self.run_command(pressure.memory_pressure(self.action.params))
+
+    async def disk_io(self):
+        return await self.run_command(pressure.disk_io(self.action.params))
+
+    async def network_delay(self):
+        return await self.run_command(pressure.network_delay(self.action.params))
@@ -21,7 +21,7 @@ DESCRIPTION = "Providing an extendable and easy to use tool for developers " \
 URL = "https://github.com/grafuls/disruption_generator"
 EMAIL = "grafuls@gmail.com"
 AUTHOR = "Gonzalo Rafuls"
-REQUIRES_PYTHON = ">=3.5.0"
+REQUIRES_PYTHON = ">=3.6.0"
 VERSION = "0.2.0"
 
 # What packages are required for this module to be executed?
@@ -109,7 +109,7 @@ setup(
     author_email=EMAIL,
     python_requires=REQUIRES_PYTHON,
     url=URL,
-    packages=find_packages(exclude=("tests",)),
+    packages=find_packages(exclude=("tests", "benchmarks")),
     install_requires=REQUIRED,
     include_package_data=True,
     license="Apache Software License 2.0",
@@ -119,7 +119,6 @@ setup(
         "License :: OSI Approved :: Apache Software License",
         "Natural Language :: English",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.5",
         "Programming Language :: Python :: 3.6",
     ],
     entry_points={
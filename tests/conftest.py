@@ -0,0 +1,335 @@
+import asyncio
+
+import pytest
+
+from disruption_generator.parsers.utils import Action, Disruption, Listener
+
+EXPERIMENT = """
+- disrupt_action:
+    - name: {name}
+      listener:
+        regex: "ERROR"
+        log: /var/log/vdsm/vdsm.log
+        host: engine
+        username: root
+        password: "secret"
+      trigger:
+        - action:
+            name: restart_service
+            params: vdsmd
+            target_host: {host}
+            username: root
+            password: "secret"
+            wait: 0
+            timeout: 10
+"""
+
+
+class FakeSubscription(object):
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def wait(self):
+        await asyncio.sleep(self.delay)
+        return "match\n"
+
+    def close(self):
+        pass
+
+
+class FakeBroker(object):
+    """
+    Broker whose subscriptions match after `delay` seconds.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def subscribe(self, *args, **kwargs):
+        return FakeSubscription(self.delay)
+
+    async def close(self):
+        pass
+
+
+class FakeLines(object):
+    def __init__(self, lines):
+        self.lines = iter(lines)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.lines)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeProcess(object):
+    def __init__(self, lines=(), exit_status=0):
+        self.stdout = FakeLines(lines)
+        self.exit_status = exit_status
+
+    async def wait(self):
+        return self
+
+
+class FakeChannel(object):
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeStdin(object):
+    def __init__(self):
+        self.channel = FakeChannel()
+
+
+class FakeStdout(object):
+    def __init__(self):
+        self.lines = asyncio.Queue()
+
+    async def read(self, n):
+        return await self.lines.get()
+
+
+class FakeConnection(object):
+    """
+    Connection recording the commands it runs, which print `lines`, and the
+    sessions it opens, whose output is put in their `lines` queue.
+    """
+
+    def __init__(self, lines=()):
+        self.lines = lines
+        self.commands = []
+        self.sessions = []
+
+    async def create_process(self, cmd, **kwargs):
+        self.commands.append(cmd)
+        return FakeProcess(self.lines)
+
+    async def open_session(self, command, encoding="utf-8"):
+        stdout = FakeStdout()
+        self.sessions.append((command, stdout))
+        return FakeStdin(), stdout, None
+
+
+class FakeLease(object):
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        return self.conn
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakePool(object):
+    def __init__(self, lines=()):
+        self.conn = FakeConnection(lines)
+
+    def connection(self, host, username, password=None, client_keys=None):
+        return FakeLease(self.conn)
+
+    async def close(self):
+        pass
+
+
+class FakeShellStdin(object):
+    def __init__(self, process):
+        self.process = process
+
+    def write(self, data):
+        command, marker = data.splitlines()
+        self.process.commands.append(command)
+        status = marker[len("echo "):].replace("$?", "0")
+        for line in (self.process.printed + status + "\n").splitlines(True):
+            self.process.output.put_nowait(line)
+
+
+class FakeShellStdout(object):
+    def __init__(self, process):
+        self.process = process
+
+    async def readline(self):
+        return await self.process.output.get()
+
+
+class FakeShell(object):
+    def __init__(self, printed=""):
+        self.printed = printed
+        self.commands = []
+        self.output = asyncio.Queue()
+        self.stdin = FakeShellStdin(self)
+        self.stdout = FakeShellStdout(self)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class SlowConnection(object):
+    """
+    Connection taking `delay` seconds to open a channel.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.commands = []
+        self.process = None
+
+    async def create_process(self, cmd=None, **kwargs):
+        await asyncio.sleep(self.delay)
+        if cmd is not None:
+            self.commands.append(cmd)
+            return FakeProcess()
+        self.process = FakeShell()
+        return self.process
+
+
+class SlowLease(object):
+    def __init__(self, pool, conn):
+        self.pool = pool
+        self.conn = conn
+
+    async def __aenter__(self):
+        await asyncio.sleep(self.conn.delay)
+        self.pool.leased += 1
+        return self.conn
+
+    async def __aexit__(self, *exc_info):
+        self.pool.leased -= 1
+        return False
+
+
+class SlowPool(object):
+    def __init__(self, delay):
+        self.conn = SlowConnection(delay)
+        self.leased = 0
+
+    def connection(self, host, username, password=None, client_keys=None):
+        return SlowLease(self, self.conn)
+
+    async def close(self):
+        pass
+
+
+def scenario(name, host="localhost"):
+    listener = Listener(
+        regex="match",
+        log="/var/log/messages",
+        target=host,
+        username="root",
+        password="",
+    )
+    action = Action(
+        name="restart_service",
+        params="sysstat",
+        target_host=host,
+        username="root",
+        password="",
+        wait=0,
+        timeout=5,
+    )
+    return Disruption(name=name, listener=listener, actions=[action])
+
+
+def action(hosts, batch_size=None, max_failures=None):
+    return Action(
+        name="restart_service",
+        params="vdsmd",
+        target_host=tuple(hosts),
+        username="root",
+        password="",
+        wait=0,
+        timeout=1,
+        batch_size=batch_size,
+        max_failures=max_failures,
+    )
+
+
+def experiment_entry(name, host="host1"):
+    return EXPERIMENT.format(name=name, host=host)
+
+
+def experiments(directory, count):
+    paths = []
+    for index in range(count):
+        path = directory / "experiment{:03d}.yaml".format(index)
+        path.write_text(
+            experiment_entry("Scenario {}".format(index), "host{}".format(index))
+        )
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def make_broker():
+    """
+    Returns FakeBroker: brokers whose listeners match after a delay.
+    """
+    return FakeBroker
+
+
+@pytest.fixture
+def make_process():
+    """
+    Returns FakeProcess: processes printing lines then exiting with a status.
+    """
+    return FakeProcess
+
+
+@pytest.fixture
+def make_pool():
+    """
+    Returns FakePool: pools of a single fake connection, which runs any
+    command and opens tail sessions fed by the test.
+    """
+    return FakePool
+
+
+@pytest.fixture
+def make_slow_pool():
+    """
+    Returns SlowPool: pools taking a delay to connect and open shells,
+    counting their leased connections.
+    """
+    return SlowPool
+
+
+@pytest.fixture
+def make_scenario():
+    """
+    Returns a function building a scenario restarting a service on a host
+    once its listener matched.
+    """
+    return scenario
+
+
+@pytest.fixture
+def make_action():
+    """
+    Returns a function building an action restarting vdsmd on many hosts.
+    """
+    return action
+
+
+@pytest.fixture
+def make_entry():
+    """
+    Returns a function giving the YAML of an experiment entry.
+    """
+    return experiment_entry
+
+
+@pytest.fixture
+def make_experiments():
+    """
+    Returns a function writing experiment files to a directory, one
+    scenario each, and returning their paths.
+    """
+    return experiments
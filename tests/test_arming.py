@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from disruption_generator.engine.engine import Engine
+from disruption_generator.trigger.trigger import Trigger
+
+
+@pytest.mark.asyncio
+async def test_armed_shell_fires_with_a_single_write(make_slow_pool, make_action):
+    pool = make_slow_pool(0.05)
+    trigger = Trigger(make_action(["hypervisor1"]), "root", "", None, pool)
+    await trigger.arm(shell=True)
+    assert pool.leased == 1
+    fired = asyncio.get_event_loop().time()
+    assert await trigger.restart_service()
+    assert trigger.results[0].fired_at - fired < 0.01
+    assert asyncio.get_event_loop().time() - fired < 0.04
+    assert pool.conn.process.commands == ["systemctl restart vdsmd"]
+    assert pool.conn.process.closed
+    assert pool.leased == 0
+
+
+@pytest.mark.asyncio
+async def test_disarm_releases_unused_sessions(make_slow_pool, make_action):
+    pool = make_slow_pool(0)
+    trigger = Trigger(
+        make_action(["hypervisor1", "hypervisor2"]), "root", "", None, pool
+    )
+    await trigger.arm()
+    assert pool.leased == 2
+    await trigger.disarm()
+    assert pool.leased == 0
+    assert pool.conn.commands == []
+
+
+@pytest.mark.asyncio
+async def test_engine_connects_while_listening(
+    make_broker, make_slow_pool, make_scenario
+):
+    pool = make_slow_pool(0.05)
+    engine = Engine(None, pool=pool, broker=make_broker(0.1))
+    (result,) = await engine.run([make_scenario("armed")])
+    (action_result,) = result.actions
+    assert action_result.success
+    # The connection was opened while the listener waited.
+    assert action_result.latency < 0.03
+    assert pool.leased == 0
+    await engine.close()
@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from disruption_generator.listener.broker import TailBroker
+from disruption_generator.listener.matchers import RegexMatcher
+
+
+@pytest.mark.asyncio
+async def test_broker_shares_one_stream(make_pool):
+    pool = make_pool()
+    broker = TailBroker(pool, linger=0)
+    first = broker.subscribe(
+        "host", "root", None, None, "/var/log/engine.log", RegexMatcher("ERROR")
+    )
+    second = broker.subscribe(
+        "host", "root", None, None, "/var/log/engine.log", RegexMatcher("WARN")
+    )
+    await asyncio.sleep(0)
+    assert len(pool.conn.sessions) == 1
+    command, stdout = pool.conn.sessions[0]
+    assert command == "tail -F /var/log/engine.log"
+
+    stdout.lines.put_nowait(b"INFO nothing\nWARN disk\n")
+    assert await asyncio.wait_for(second.wait(), 1) == "WARN disk"
+    assert not first.future.done()
+
+    third = broker.subscribe(
+        "host", "root", None, None, "/var/log/engine.log", RegexMatcher("ERROR")
+    )
+    stdout.lines.put_nowait(b"ERROR boom\n")
+    assert await asyncio.wait_for(first.wait(), 1) == "ERROR boom"
+    assert await asyncio.wait_for(third.wait(), 1) == "ERROR boom"
+    assert len(pool.conn.sessions) == 1
+    await broker.close()
+
+
+@pytest.mark.asyncio
+async def test_broker_closes_only_the_pool_it_created(monkeypatch, make_pool):
+    closed = []
+
+    class ClosingPool(make_pool):
+        async def close(self):
+            closed.append(self)
+
+    monkeypatch.setattr(
+        "disruption_generator.listener.broker.ConnectionPool", ClosingPool
+    )
+    shared = ClosingPool()
+    await TailBroker(shared).close()
+    assert closed == []
+    broker = TailBroker()
+    await broker.close()
+    assert closed == [broker.pool]
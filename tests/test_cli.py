@@ -1,8 +1,11 @@
+import asyncio
+
 import pytest
 
 from click.testing import CliRunner
 
 from disruption_generator import cli
+from disruption_generator.parsers.experiment_parser import ParserException
 
 
 @pytest.fixture(scope='module')
@@ -14,3 +17,32 @@ def test_help_message(runner):
     help_result = runner.invoke(cli.main, args=['--help'])
     assert help_result.exit_code == 0
     assert "Show this message and exit." in help_result.output
+
+
+def test_invalid_experiments_exit_with_the_error(runner, tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, 'parse_log_config', lambda **files: None)
+    (tmp_path / 'broken.yaml').write_text('- just a string\n')
+    result = runner.invoke(
+        cli.main, ['compile', str(tmp_path / 'plan'), '-e', str(tmp_path)]
+    )
+    assert result.exit_code == 1
+    assert 'Cannot parse experiments: ' in result.output
+    assert 'broken.yaml:1: Expected a mapping' in result.output
+
+    async def execute(*args):
+        raise ParserException('broken.yaml:1: Expected a mapping')
+
+    loop = asyncio.new_event_loop()
+    monkeypatch.setattr(cli, 'execute', execute)
+    monkeypatch.setattr(asyncio, 'get_event_loop', lambda: loop)
+    result = runner.invoke(cli.main, ['-e', str(tmp_path)])
+    loop.close()
+    assert result.exit_code == 1
+    assert 'Cannot parse experiments: broken.yaml:1:' in result.output
+
+
+@pytest.mark.parametrize('latency', ['0', '-1'])
+def test_match_latency_must_be_positive(runner, latency):
+    result = runner.invoke(cli.main, ['--max-match-latency', latency])
+    assert result.exit_code == 2
+    assert 'must be greater than 0' in result.output
@@ -0,0 +1,105 @@
+import pytest
+
+from disruption_generator.listener.correlation import CorrelationMatcher
+from disruption_generator.listener.prefilter import grep_command
+from disruption_generator.parsers.experiment_parser import (
+    ExperimentParser,
+    ParserException,
+)
+
+STEPS = [
+    r"migration started for vm (?P<vm>[\w-]+)",
+    r"storage warning.*vm=(?P<vm>[\w-]+)",
+]
+
+EXPERIMENT = """
+- disrupt_action:
+    - name: Restart vdsmd when a migrating VM hits storage trouble
+      listener:
+        host: hypervisor1
+        log: /var/log/vdsm/vdsm.log
+        username: root
+        password: "secret"
+        regex:
+          - migration started for vm (?P<vm>[\\w-]+)
+          - storage warning.*vm=(?P<{key}>[\\w-]+)
+        window: 30
+        key: vm
+      trigger:
+        - action:
+            name: restart_service
+            params: vdsmd
+            target_host: hypervisor1
+            username: root
+            password: "secret"
+            wait: 0
+            timeout: 10
+"""
+
+
+def lines(*items):
+    return "".join(item + "\n" for item in items).encode()
+
+
+def test_sequence_completes_for_the_same_key():
+    matcher = CorrelationMatcher(STEPS, window=30, key="vm")
+    buf = lines(
+        "migration started for vm a-1",
+        "storage warning on sd1 vm=b-2",
+        "migration started for vm b-2",
+        "noise",
+    )
+    assert matcher.search(buf) is None
+    buf = lines("storage warning on sd1 vm=b-2", "tail")
+    end, line = matcher.search(buf)
+    assert line == "storage warning on sd1 vm=b-2"
+    assert end == len(lines("storage warning on sd1 vm=b-2"))
+
+
+def test_steps_must_come_in_order():
+    matcher = CorrelationMatcher(STEPS, key="vm")
+    buf = lines("storage warning vm=a-1", "migration started for vm a-1")
+    assert matcher.search(buf) is None
+
+
+def test_expired_sequences_do_not_fire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(
+        "disruption_generator.listener.correlation.time.monotonic", lambda: now[0]
+    )
+    matcher = CorrelationMatcher(STEPS, window=30, key="vm")
+    assert matcher.search(lines("migration started for vm a-1")) is None
+    now[0] += 31
+    assert matcher.search(lines("storage warning vm=a-1")) is None
+    assert not matcher._partial
+
+
+def test_partial_state_is_bounded():
+    matcher = CorrelationMatcher(STEPS, key="vm", max_keys=3)
+    buf = lines(*("migration started for vm {}".format(i) for i in range(100)))
+    assert matcher.search(buf) is None
+    assert list(matcher._partial) == ["97", "98", "99"]
+    assert matcher.search(lines("storage warning vm=0")) is None
+    assert matcher.search(lines("storage warning vm=99")) is not None
+
+
+def test_prefilter_accepts_every_step():
+    command = grep_command(CorrelationMatcher(STEPS).expression)
+    assert command.startswith("LC_ALL=C grep --line-buffered -E -e ")
+    assert command.count(" -e ") == 2
+
+
+def test_parser_builds_correlated_listener(tmp_path):
+    path = tmp_path / "correlation.yaml"
+    path.write_text(EXPERIMENT.format(key="vm"))
+    (scenario,) = ExperimentParser(yaml_path=str(path)).parse()
+    assert scenario.listener.correlated
+    assert scenario.listener.regex == tuple(STEPS)
+    assert scenario.listener.window == 30
+
+
+def test_parser_requires_the_key_group_in_every_step(tmp_path):
+    path = tmp_path / "correlation.yaml"
+    path.write_text(EXPERIMENT.format(key="volume"))
+    with pytest.raises(ParserException):
+        ExperimentParser(yaml_path=str(path)).parse()
@@ -0,0 +1,192 @@
+import asyncio
+import concurrent.futures
+
+import pytest
+
+from disruption_generator import cli
+from disruption_generator.engine.engine import Engine
+from disruption_generator.parsers.cache import iter_experiments
+from disruption_generator.parsers.discovery import discover
+from disruption_generator.parsers.experiment_parser import ParserException
+
+
+@pytest.fixture
+def tree(make_entry):
+    """
+    Returns a function writing an experiment at each relative path.
+    """
+
+    def write(root, paths):
+        for relative in paths:
+            path = root / relative
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(make_entry(relative, "host"))
+
+    return write
+
+
+@pytest.fixture
+def shutdowns(monkeypatch):
+    """
+    Parse workers run in threads, the list records their shutdowns.
+    """
+    shutdowns = []
+
+    class Executor(concurrent.futures.ThreadPoolExecutor):
+        def shutdown(self, wait=True):
+            shutdowns.append(wait)
+            super(Executor, self).shutdown(wait)
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", Executor)
+    return shutdowns
+
+
+def relative(root, paths):
+    return [str(path)[len(str(root)) + 1:] for path in paths]
+
+
+def test_discovery_is_recursive_and_ordered(tmp_path, tree):
+    tree(tmp_path, ["b.yml", "a.yaml", "z/c.yaml", "m/n/d.yaml", "m/notes.txt"])
+    assert relative(tmp_path, discover(str(tmp_path))) == [
+        "a.yaml",
+        "b.yml",
+        "m/n/d.yaml",
+        "z/c.yaml",
+    ]
+
+
+def test_discovery_globs(tmp_path, tree):
+    tree(
+        tmp_path,
+        ["a.yaml", "drafts/b.yaml", "drafts/deep/c.yaml", "x/d.yaml", "x/d.j2.yaml"],
+    )
+    found = discover(str(tmp_path), exclude=("drafts", "*.j2.yaml"))
+    assert relative(tmp_path, found) == ["a.yaml", "x/d.yaml"]
+    found = discover(str(tmp_path), include=("x/*",))
+    assert relative(tmp_path, found) == ["x/d.j2.yaml", "x/d.yaml"]
+
+
+def test_discovery_is_lazy(tmp_path, tree):
+    tree(tmp_path, ["a/1.yaml", "b/2.yaml"])
+    found = discover(str(tmp_path))
+    assert relative(tmp_path, [next(found)]) == ["a/1.yaml"]
+    # Not read yet
+    tree(tmp_path, ["b/3.yaml"])
+    assert relative(tmp_path, found) == ["b/2.yaml", "b/3.yaml"]
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_parsing_reads_files_ahead_within_a_window(tmp_path, workers, make_experiments):
+    paths = make_experiments(tmp_path, 40)
+    taken = []
+
+    def source():
+        for path in paths:
+            taken.append(path)
+            yield path
+
+    scenarios = iter_experiments(source(), workers=workers)
+    assert next(scenarios).name == "Scenario 0"
+    assert len(taken) <= 9
+    assert [scenario.name for scenario in scenarios][-1] == "Scenario 39"
+
+
+@pytest.mark.asyncio
+async def test_first_scenario_plays_before_the_last_is_read(
+    make_pool, make_broker, make_scenario
+):
+    engine = Engine(None, pool=make_pool(), broker=make_broker(0))
+    first_done = asyncio.Event()
+
+    async def source():
+        yield make_scenario("first", "host1")
+        await asyncio.wait_for(first_done.wait(), 1)
+        yield make_scenario("second", "host2")
+
+    names = []
+    async for result in engine.stream(source()):
+        names.append(result.name)
+        first_done.set()
+    assert names == ["first", "second"]
+    await engine.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_takes_scenarios_within_a_window(
+    make_pool, make_broker, make_scenario
+):
+    engine = Engine(None, pool=make_pool(), broker=make_broker(0.01))
+    taken = []
+    finished = []
+
+    def source():
+        for index in range(10):
+            taken.append(index)
+            assert len(taken) - len(finished) <= 3
+            yield make_scenario("s{}".format(index), "host{}".format(index))
+
+    async for result in engine.stream(source(), window=3):
+        finished.append(result.name)
+    assert len(finished) == 10
+    await engine.close()
+
+
+@pytest.mark.asyncio
+async def test_scenarios_taken_finish_when_parsing_fails(
+    tmp_path, make_pool, make_broker, make_scenario
+):
+    engine = Engine(None, pool=make_pool(), broker=make_broker(0))
+
+    def source():
+        yield make_scenario("parsed", "host1")
+        raise ParserException("broken.yaml: Missing 'wait' definition")
+
+    finished = []
+    with pytest.raises(ParserException):
+        async for result in engine.stream(source()):
+            finished.append(result.name)
+    assert finished == ["parsed"]
+    await engine.close()
+
+
+@pytest.mark.asyncio
+async def test_parse_in_background(tmp_path, tree):
+    tree(tmp_path, ["a.yaml", "nested/b.yaml"])
+    names = [
+        found.name
+        async for found in cli.parse_in_background(discover(str(tmp_path)), 0, None)
+    ]
+    assert names == ["a.yaml", "nested/b.yaml"]
+
+
+@pytest.mark.asyncio
+async def test_parse_workers_stop_with_the_stream(
+    tmp_path, shutdowns, make_pool, make_broker, make_experiments
+):
+    paths = make_experiments(tmp_path, 40)
+    engine = Engine(None, pool=make_pool(), broker=make_broker(0))
+    scenarios = cli.parse_in_background(iter(paths), 2, None)
+    results = engine.stream(scenarios, window=2)
+    assert (await results.__anext__()).name.startswith("Scenario")
+    await results.aclose()
+    assert shutdowns == [True]
+    await engine.close()
+
+
+@pytest.mark.asyncio
+async def test_parse_workers_stop_when_a_file_fails(
+    tmp_path, shutdowns, make_pool, make_broker, make_experiments
+):
+    paths = make_experiments(tmp_path, 16)
+    with open(paths[10], "w") as f:
+        f.write("- just a string\n")
+    engine = Engine(None, pool=make_pool(), broker=make_broker(0))
+    finished = []
+    with pytest.raises(ParserException, match="Expected a mapping"):
+        async for result in engine.stream(
+            cli.parse_in_background(iter(paths), 2, None)
+        ):
+            finished.append(result.name)
+    assert len(finished) == 10
+    assert shutdowns == [True]
+    await engine.close()
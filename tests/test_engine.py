@@ -0,0 +1,57 @@
+import logging
+import time
+
+import pytest
+
+from disruption_generator.engine.engine import Engine
+
+
+@pytest.mark.asyncio
+async def test_engine_plays_scenarios_concurrently(
+    make_pool, make_broker, make_scenario
+):
+    pool = make_pool()
+    engine = Engine(None, max_parallel=3, pool=pool, broker=make_broker(0.2))
+    start = time.monotonic()
+    results = await engine.run(
+        [make_scenario("s{}".format(i), "host{}".format(i)) for i in range(3)]
+    )
+    assert time.monotonic() - start < 0.5
+    assert [result.name for result in results] == ["s0", "s1", "s2"]
+    assert all(result.actions[0].success for result in results)
+    assert pool.conn.commands == ["systemctl restart sysstat"] * 3
+
+
+@pytest.mark.asyncio
+async def test_engine_honors_per_host_limit(make_pool, make_broker, make_scenario):
+    engine = Engine(
+        None, max_parallel=3, max_per_host=1, pool=make_pool(), broker=make_broker(0.1)
+    )
+    start = time.monotonic()
+    await engine.run([make_scenario("s{}".format(i)) for i in range(3)])
+    assert time.monotonic() - start >= 0.3
+
+
+@pytest.mark.asyncio
+async def test_unexpected_errors_are_recorded(make_pool, make_broker, make_scenario):
+    def subscribe(*args, **kwargs):
+        raise ValueError("broken")
+
+    broker = make_broker(0)
+    broker.subscribe = subscribe
+    engine = Engine(None, pool=make_pool(), broker=broker)
+    (broken,) = await engine.run([make_scenario("broken")])
+    assert broken.error == "ValueError: broken"
+
+
+@pytest.mark.asyncio
+async def test_listener_and_trigger_records_name_the_scenario(
+    caplog, make_pool, make_broker, make_scenario
+):
+    caplog.set_level(logging.DEBUG)
+    engine = Engine(None, pool=make_pool(), broker=make_broker(0))
+    await engine.run([make_scenario("named")])
+    messages = [record.getMessage() for record in caplog.records]
+    assert "[named] Found occurrence: match\n" in messages
+    assert "[named] Running on localhost: 'systemctl restart sysstat'" in messages
+    await engine.close()
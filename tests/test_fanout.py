@@ -0,0 +1,163 @@
+import asyncio
+import functools
+
+import pytest
+
+from disruption_generator.parsers.experiment_parser import (
+    ExperimentParser,
+    ParserException,
+)
+from disruption_generator.trigger.trigger import Trigger, resolve_count
+
+EXPERIMENT = """
+- host_groups:
+    hypervisors: [hypervisor1, hypervisor2, hypervisor3]
+- disrupt_action:
+    - name: Rolling restart of vdsmd
+      listener:
+        regex: "ERROR"
+        log: /var/log/vdsm/vdsm.log
+        host: engine
+        username: root
+        password: "secret"
+      trigger:
+        - action:
+            name: restart_service
+            params: vdsmd
+{target}
+            username: root
+            password: "secret"
+            wait: 0
+            timeout: 10
+"""
+
+
+class HostConnection(object):
+    def __init__(self, pool, host):
+        self.pool = pool
+        self.host = host
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def create_process(self, cmd, **kwargs):
+        self.pool.running += 1
+        self.pool.peak = max(self.pool.peak, self.pool.running)
+        await asyncio.sleep(0.01)
+        self.pool.running -= 1
+        self.pool.ran.append(self.host)
+        failed = self.host in self.pool.failing
+        return self.pool.process(["failed\n"] if failed else [], 1 if failed else 0)
+
+
+class HostPool(object):
+    """
+    Pool whose hosts in `failing` exit with 1 and in `unreachable` refuse
+    connections, running `process` for every command.
+    """
+
+    def __init__(self, process, failing=(), unreachable=()):
+        self.process = process
+        self.failing = set(failing)
+        self.unreachable = set(unreachable)
+        self.ran = []
+        self.running = 0
+        self.peak = 0
+
+    def connection(self, host, username, password=None, client_keys=None):
+        if host in self.unreachable:
+            raise ConnectionRefusedError("refused by {}".format(host))
+        return HostConnection(self, host)
+
+
+@pytest.fixture
+def host_pool(make_process):
+    return functools.partial(HostPool, make_process)
+
+
+def hosts(count):
+    return ["hypervisor{}".format(index) for index in range(count)]
+
+
+def test_counts_and_percentages():
+    assert resolve_count(None, 40, 40) == 40
+    assert resolve_count(5, 40, 40) == 5
+    assert resolve_count("25%", 40, 40) == 10
+    assert resolve_count("10%", 8, 0) == 0
+
+
+@pytest.mark.asyncio
+async def test_hosts_of_a_batch_run_concurrently(host_pool, make_action):
+    pool = host_pool()
+    trigger = Trigger(make_action(hosts(40), batch_size="25%"), "root", "", None, pool)
+    assert await trigger.restart_service()
+    assert pool.peak == 10
+    assert sorted(pool.ran) == sorted(hosts(40))
+    assert all(result.success for result in trigger.results)
+    assert all(result.duration >= 0.01 for result in trigger.results)
+
+
+@pytest.mark.asyncio
+async def test_rollout_stops_after_too_many_failures(host_pool, make_action):
+    pool = host_pool(failing=["hypervisor0"], unreachable=["hypervisor3"])
+    trigger = Trigger(
+        make_action(hosts(8), batch_size=2, max_failures=1), "root", "", None, pool
+    )
+    assert not await trigger.restart_service()
+    assert pool.ran == hosts(3)
+    assert [result.skipped for result in trigger.results] == [False] * 4 + [True] * 4
+    assert "refused" in trigger.results[3].error
+    assert trigger.results[3].success is False
+
+
+@pytest.mark.asyncio
+async def test_single_host_failure_is_reported(host_pool, make_action):
+    pool = host_pool(failing=["hypervisor1"])
+    trigger = Trigger(make_action(["hypervisor1"]), "root", "", None, pool)
+    assert not await trigger.restart_service()
+    assert [result.host for result in trigger.results] == ["hypervisor1"]
+
+
+@pytest.mark.parametrize(
+    "target, expected",
+    [
+        ("            target_host: hypervisor1", "hypervisor1"),
+        (
+            "            target_host: [hypervisor1, hypervisor2]\n"
+            "            batch_size: 50%\n"
+            "            max_failures: 1",
+            ("hypervisor1", "hypervisor2"),
+        ),
+        (
+            "            target_group: hypervisors",
+            ("hypervisor1", "hypervisor2", "hypervisor3"),
+        ),
+    ],
+)
+def test_parser_reads_targets(tmp_path, target, expected):
+    path = tmp_path / "fanout.yaml"
+    path.write_text(EXPERIMENT.format(target=target))
+    (parsed,) = ExperimentParser(yaml_path=str(path)).parse()
+    assert parsed.actions[0].target_host == expected
+    assert parsed.actions[0].hosts == (
+        expected if isinstance(expected, tuple) else (expected,)
+    )
+
+
+@pytest.mark.parametrize(
+    "target",
+    [
+        "            target_group: storage",
+        "            target_host: []",
+        "            target_host: hypervisor1\n            batch_size: 0",
+        "            target_host: hypervisor1\n            max_failures: 120%",
+    ],
+)
+def test_parser_rejects_invalid_targets(tmp_path, target):
+    path = tmp_path / "fanout.yaml"
+    path.write_text(EXPERIMENT.format(target=target))
+    with pytest.raises(ParserException):
+        ExperimentParser(yaml_path=str(path)).parse()
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from disruption_generator.listener.journal import Journal, JournalMatcher
+from disruption_generator.parsers.experiment_parser import (
+    ExperimentParser,
+    ParserException,
+)
+from disruption_generator.parsers.utils import JournaldListener
+
+EXPERIMENT = """
+- disrupt_action:
+    - name: Restart vdsmd when the journal reports a lost VM
+      listener:
+        type: journald
+        host: hypervisor1
+        username: root
+        password: "secret"
+        unit: vdsmd.service
+        priority: err
+        regex: VM_DOWN
+        fields:
+          _SYSTEMD_UNIT: ^vdsm
+      trigger:
+        - action:
+            name: restart_service
+            params: vdsmd
+            target_host: hypervisor1
+            username: root
+            password: "secret"
+            wait: 0
+            timeout: 10
+"""
+
+
+def record(**fields):
+    return json.dumps(fields).encode() + b"\n"
+
+
+def test_journal_filters_run_remotely():
+    journal = Journal(unit="vdsmd.service", priority="err", matches={"_PID": "42"})
+    assert journal.command() == (
+        "journalctl --follow --output=json --no-pager --lines=10 "
+        "--unit=vdsmd.service --priority=err _PID=42"
+    )
+
+
+def test_journal_matcher_matches_structured_fields():
+    matcher = JournalMatcher({"MESSAGE": "VM_DOWN", "PRIORITY": "^[0-3]$"})
+    buf = (
+        record(MESSAGE="VM_DOWN id=1", PRIORITY="6")
+        + b"not json\n"
+        + record(MESSAGE=[86, 77, 95, 68, 79, 87, 78, 32, 50], PRIORITY="3")
+    )
+    end, message = matcher.search(buf)
+    assert end == len(buf)
+    assert message == "VM_DOWN 2"
+
+
+def test_parser_builds_journald_listener(tmp_path):
+    path = tmp_path / "journal.yaml"
+    path.write_text(EXPERIMENT)
+    (scenario,) = ExperimentParser(yaml_path=str(path)).parse()
+    assert isinstance(scenario.listener, JournaldListener)
+    assert scenario.listener.unit == "vdsmd.service"
+    assert scenario.listener.fields == {"_SYSTEMD_UNIT": "^vdsm"}
+
+
+@pytest.mark.parametrize(
+    "broken", [("regex: VM_DOWN", "regex: VM_(DOWN"), ("^vdsm", "^vdsm[")]
+)
+def test_parser_rejects_invalid_journald_regexes(tmp_path, broken):
+    path = tmp_path / "journal.yaml"
+    path.write_text(EXPERIMENT.replace(*broken))
+    with pytest.raises(ParserException, match="Invalid regex"):
+        ExperimentParser(yaml_path=str(path)).parse()
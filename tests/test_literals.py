@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from disruption_generator.listener import broker as broker_module
+from disruption_generator.listener.broker import TailBroker
+from disruption_generator.listener.literals import LiteralIndex, required_literals
+from disruption_generator.listener.matchers import RegexMatcher
+
+
+@pytest.mark.parametrize(
+    "expression, literals",
+    [
+        ("VM_DOWN", {"VM_DOWN"}),
+        (r"ERROR.*id=(\w+)", {"ERROR"}),
+        (r"(?P<vm>\w+) Traceback", {" Traceback"}),
+        ("(?:VM_DOWN|PAUSED) vm", {"VM_DOWN", "PAUSED"}),
+        (r"(?:abnormal)+ stop", {"abnormal"}),
+        ("(?i)VM_DOWN", None),
+        ("(?:VM_DOWN|x) now", {" now"}),
+        (r"\d+ s", None),
+        (r"(?:ERROR)? \w+", None),
+    ],
+)
+def test_required_literals(expression, literals):
+    expected = frozenset(literals) if literals is not None else None
+    assert required_literals(expression) == expected
+
+
+def test_index_finds_candidate_lines_in_one_pass():
+    buf = b"INFO ok\nERROR VM_DOWN id=1\nmigration done\nVM_DOWNTIME\n"
+    index = LiteralIndex(
+        {"down": {"VM_DOWN"}, "error": {"ERROR", "migration"}, "all": None}
+    )
+    assert "all" not in index
+    spans = index.scan(buf)
+    assert [buf[s:e] for s, e in spans["down"]] == [
+        b"ERROR VM_DOWN id=1\n",
+        b"VM_DOWNTIME\n",
+    ]
+    assert [buf[s:e] for s, e in spans["error"]] == [
+        b"ERROR VM_DOWN id=1\n",
+        b"migration done\n",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_broker_reports_offsets_of_indexed_matches(monkeypatch, make_pool):
+    monkeypatch.setattr(broker_module, "MIN_INDEXED", 2)
+    pool = make_pool()
+    broker = TailBroker(pool, linger=0)
+    subscribe = lambda expression: broker.subscribe(  # noqa: E731
+        "host", "root", None, None, "/var/log/vdsm.log", RegexMatcher(expression)
+    )
+    down = subscribe(r"VM_DOWN id=(\d+)")
+    error = subscribe(r"ERROR \d+")
+    other = subscribe(r"\d{3}")
+    await asyncio.sleep(0)
+    _, stdout = pool.conn.sessions[0]
+    stream = down.stream
+    buf = b"INFO 1\nERROR x\nVM_DOWN id=7\nERROR 42\n"
+    stream.dispatch(buf)
+    assert down.future.result() == "VM_DOWN id=7"
+    assert error.future.result() == "ERROR 42"
+    assert not other.future.done()
+    other.close()
+    await broker.close()
+
+
+@pytest.mark.asyncio
+async def test_few_subscribers_search_chunks_on_their_own(make_pool):
+    pool = make_pool()
+    broker = TailBroker(pool, linger=0)
+    subscriptions = [
+        broker.subscribe(
+            "host", "root", None, None, "/var/log/vdsm.log", RegexMatcher(expression)
+        )
+        for expression in (r"VM_DOWN id=(\d+)", r"ERROR \d+")
+    ]
+    await asyncio.sleep(0)
+    stream = subscriptions[0].stream
+    stream.dispatch(b"INFO ok\n")
+    assert not any(subscription in stream._index for subscription in subscriptions)
+    stream.dispatch(b"ERROR 42\nVM_DOWN id=7\n")
+    assert [subscription.future.result() for subscription in subscriptions] == [
+        "VM_DOWN id=7",
+        "ERROR 42",
+    ]
+    await broker.close()
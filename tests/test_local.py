@@ -0,0 +1,88 @@
+import asyncio
+import os
+
+import pytest
+
+from disruption_generator.listener.broker import TailBroker
+from disruption_generator.listener.local import LocalTail, is_local
+from disruption_generator.listener.matchers import RegexMatcher
+from disruption_generator.listener.offsets import OffsetStore
+
+
+def test_local_targets():
+    assert is_local("localhost", "/var/log/messages")
+    assert is_local("engine.example.com", "file:///var/log/messages")
+    assert not is_local("engine.example.com", "/var/log/messages")
+
+
+@pytest.mark.asyncio
+async def test_local_tail_starts_with_last_lines(tmp_path):
+    log = tmp_path / "vdsm.log"
+    log.write_bytes(b"".join(b"line %d\n" % i for i in range(20)))
+    tail = LocalTail(str(log))
+    try:
+        data = await asyncio.wait_for(tail.read(1024), 1)
+    finally:
+        tail.close()
+    assert data == b"".join(b"line %d\n" % i for i in range(10, 20))
+
+
+@pytest.mark.asyncio
+async def test_local_tail_follows_rotation(tmp_path):
+    log = tmp_path / "vdsm.log"
+    log.write_bytes(b"")
+    tail = LocalTail(str(log))
+    try:
+        with open(str(log), "ab") as f:
+            f.write(b"before rotation\n")
+        assert await asyncio.wait_for(tail.read(1024), 2) == b"before rotation\n"
+        os.rename(str(log), str(tmp_path / "vdsm.log.1"))
+        log.write_bytes(b"after rotation\n")
+        assert await asyncio.wait_for(tail.read(1024), 2) == b"after rotation\n"
+    finally:
+        tail.close()
+
+
+@pytest.mark.asyncio
+async def test_broker_follows_local_logs_without_ssh(tmp_path):
+    log = tmp_path / "engine.log"
+    log.write_bytes(b"INFO started\n")
+    broker = TailBroker(pool=object(), linger=0)
+    subscription = broker.subscribe(
+        "localhost", "root", None, None, str(log), RegexMatcher("VM_DOWN")
+    )
+    await asyncio.sleep(0.05)
+    with open(str(log), "ab") as f:
+        f.write(b"ERROR VM_DOWN id=1\n")
+    assert await asyncio.wait_for(subscription.wait(), 2) == "ERROR VM_DOWN id=1"
+    await broker.close()
+
+
+@pytest.mark.asyncio
+async def test_offsets_resume_after_last_match(tmp_path):
+    log = tmp_path / "engine.log"
+    log.write_bytes(b"ERROR old\n")
+    offsets = OffsetStore(str(tmp_path / "offsets.json"))
+    broker = TailBroker(pool=object(), linger=0, offsets=offsets)
+    first = broker.subscribe(
+        "localhost", "root", None, None, str(log), RegexMatcher("ERROR")
+    )
+    assert await asyncio.wait_for(first.wait(), 2) == "ERROR old"
+    with open(str(log), "ab") as f:
+        f.write(b"ERROR missed while nobody listens\n")
+    await asyncio.sleep(0.05)
+    await broker.close()
+
+    broker = TailBroker(
+        pool=object(), linger=0, offsets=OffsetStore(offsets.state_file)
+    )
+    second = broker.subscribe(
+        "localhost", "root", None, None, str(log), RegexMatcher("ERROR")
+    )
+    line = await asyncio.wait_for(second.wait(), 2)
+    assert line == "ERROR missed while nobody listens"
+    await broker.close()
+    assert (
+        OffsetStore(offsets.state_file).get("localhost", str(log))[1]
+        == log.stat().st_size
+    )
@@ -0,0 +1,246 @@
+import asyncio
+import random
+
+import attr
+import pytest
+
+from disruption_generator.engine.engine import Engine
+from disruption_generator.engine.observer import Histogram, HttpClient, Observation
+from disruption_generator.engine.scheduler import Scheduler
+from disruption_generator.parsers.experiment_parser import (
+    ExperimentParser,
+    ParserException,
+)
+from disruption_generator.parsers.utils import Observer
+
+EXPERIMENT = """
+- disrupt_action:
+    - name: Restart vdsmd under load
+      listener:
+        regex: "ERROR"
+        log: /var/log/vdsm/vdsm.log
+        host: engine
+        username: root
+        password: "secret"
+      observer:
+{observer}
+      trigger:
+        - action:
+            name: restart_service
+            params: vdsmd
+            target_host: hypervisor1
+            username: root
+            password: "secret"
+            wait: 0
+            timeout: 10
+"""
+
+
+class StandIn(object):
+    """
+    Keep-alive HTTP server answering after `delay` seconds with `status`.
+    """
+
+    def __init__(self):
+        self.delay = 0
+        self.status = 200
+        self.chunk_size = None
+        self.requests = 0
+        self.connections = 0
+        self.server = None
+        self.handlers = set()
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.serve, "127.0.0.1", 0)
+        self.url = "http://127.0.0.1:{}/ovirt-engine/api".format(
+            self.server.sockets[0].getsockname()[1]
+        )
+        return self
+
+    async def serve(self, reader, writer):
+        self.connections += 1
+        done = asyncio.Event()
+        self.handlers.add((done, writer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                while line not in (b"\r\n", b""):
+                    line = await reader.readline()
+                self.requests += 1
+                await asyncio.sleep(self.delay)
+                if self.chunk_size is None:
+                    body = b"ok"
+                    writer.write(
+                        b"HTTP/1.1 %d Whatever\r\nContent-Length: %d\r\n\r\n%s"
+                        % (self.status, len(body), body)
+                    )
+                else:
+                    writer.write(
+                        b"HTTP/1.1 %d Whatever\r\nTransfer-Encoding: chunked\r\n"
+                        b"\r\n%s\r\nok\r\n0\r\n\r\n" % (self.status, self.chunk_size)
+                    )
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            done.set()
+
+    async def __aexit__(self, *exc_info):
+        self.server.close()
+        for _, writer in self.handlers:
+            writer.close()
+        await asyncio.gather(*[done.wait() for done, _ in self.handlers])
+        await self.server.wait_closed()
+        return False
+
+
+def test_histogram_precision():
+    histogram = Histogram()
+    rng = random.Random(3)
+    values = sorted(rng.expovariate(100) for _ in range(10000))
+    for value in values:
+        histogram.record(value)
+    for percent in (50, 90, 99, 99.9):
+        exact = values[int(round(percent / 100.0 * len(values))) - 1]
+        assert histogram.percentile(percent) == pytest.approx(exact, rel=0.01)
+    assert histogram.percentile(100) == values[-1]
+    histogram.record(3600)
+    assert histogram.max == 3600
+
+
+@pytest.mark.asyncio
+async def test_client_keeps_connections_alive():
+    async with StandIn() as server:
+        url = server.url
+        client = HttpClient(url, connections=2)
+        statuses = await asyncio.gather(*[client.get() for _ in range(20)])
+        assert statuses == [200] * 20
+        assert server.connections == 2
+        client.close()
+
+
+async def drain(observation):
+    await asyncio.gather(*list(observation._pending), return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_observation_phases():
+    async with StandIn() as server:
+        url = server.url
+        scheduler = Scheduler()
+        observation = Observation(Observer(kind="http", url=url, rate=500), scheduler)
+        observation.start()
+        await asyncio.sleep(0.1)
+        observation.disruption_started()
+        # Requests of the previous phase still in flight are answered first
+        await drain(observation)
+        server.status = 503
+        await asyncio.sleep(0.1)
+        await drain(observation)
+        server.status = 200
+        observation.disruption_ended()
+        await asyncio.sleep(0.1)
+        await observation.stop()
+        summary = observation.summary()
+        assert set(summary) == {"before", "during", "after"}
+        assert summary["before"]["requests"] == pytest.approx(50, abs=10)
+        assert summary["before"]["errors"] == 0
+        assert summary["during"]["error_rate"] > 0.9
+        assert summary["after"]["error_rate"] < 0.1
+        assert server.connections <= 10
+        scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_stalled_service_shows_as_latency():
+    async with StandIn() as server:
+        url = server.url
+        server.delay = 0.1
+        scheduler = Scheduler()
+        observer = Observer(kind="http", url=url, rate=200, connections=1, timeout=0.05)
+        observation = Observation(observer, scheduler)
+        observation.start()
+        await asyncio.sleep(0.2)
+        await observation.stop()
+        before = observation.summary()["before"]
+        # 10 requests at most may wait for the connection, the rest is dropped
+        assert observation.dropped["before"] > 0
+        assert before["errors"] == before["requests"]
+        assert before["p50"] >= 0.05
+        scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_malformed_responses_are_errors():
+    async with StandIn() as server:
+        url = server.url
+        scheduler = Scheduler()
+        observation = Observation(Observer(kind="http", url=url, rate=100), scheduler)
+        server.chunk_size = b"2"
+        observation.start()
+        await asyncio.sleep(0.1)
+        await drain(observation)
+        server.chunk_size = b"zz"
+        await asyncio.sleep(0.1)
+        await observation.stop()
+        before = observation.summary()["before"]
+        assert server.requests > 10
+        assert 0 < before["errors"] < before["requests"]
+        scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_engine_observes_scenarios(make_pool, make_broker, make_scenario):
+    async with StandIn() as server:
+        url = server.url
+        engine = Engine(None, pool=make_pool(), broker=make_broker(0.05))
+        observed = attr.evolve(
+            make_scenario("observed"),
+            observer=Observer(
+                kind="http", url=url, rate=200, warmup=0.05, cooldown=0.05
+            ),
+        )
+        (result,) = await engine.run([observed])
+        assert set(result.observation) == {"before", "after"}
+        assert result.observation["before"]["requests"] >= 10
+        assert result.observation["after"]["errors"] == 0
+        await engine.close()
+
+
+def test_parser_reads_observers(tmp_path):
+    path = tmp_path / "observer.yaml"
+    path.write_text(
+        EXPERIMENT.format(
+            observer="        url: https://engine/ovirt-engine/api\n"
+            "        rate: 1000\n"
+            "        connections: 50\n"
+            "        warmup: 30"
+        )
+    )
+    (parsed,) = ExperimentParser(yaml_path=str(path)).parse()
+    assert parsed.observer == Observer(
+        kind="http",
+        url="https://engine/ovirt-engine/api",
+        rate=1000,
+        connections=50,
+        warmup=30,
+    )
+
+
+@pytest.mark.parametrize(
+    "observer",
+    [
+        "        type: tcp\n        host: engine",
+        "        type: udp\n        host: engine\n        port: 53",
+        "        url: http://engine\n        rate: 0",
+        "        url: http://engine\n        connections: 2.5",
+    ],
+)
+def test_parser_rejects_invalid_observers(tmp_path, observer):
+    path = tmp_path / "observer.yaml"
+    path.write_text(EXPERIMENT.format(observer=observer))
+    with pytest.raises(ParserException):
+        ExperimentParser(yaml_path=str(path)).parse()
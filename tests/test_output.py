@@ -0,0 +1,50 @@
+import pytest
+
+from disruption_generator.trigger.output import OutputCapture, output_path
+from disruption_generator.trigger.trigger import Trigger
+
+
+def test_ring_buffer_keeps_the_last_lines():
+    capture = OutputCapture(max_lines=3)
+    for index in range(10):
+        capture.add("line {}\n".format(index))
+    assert capture.count == 10
+    assert capture.tail() == ["line 7", "line 8", "line 9"]
+
+
+def test_output_path_is_safe(tmp_path):
+    path = output_path(str(tmp_path), "Restart vdsmd/storage", "hypervisor1")
+    assert path.startswith(str(tmp_path / "Restart_vdsmd_storage_hypervisor1_"))
+    assert path.endswith(".log")
+
+
+@pytest.mark.asyncio
+async def test_output_is_streamed_to_a_file_per_host(tmp_path, make_pool, make_action):
+    lines = ["progress {}%\n".format(percent) for percent in range(0, 101, 10)]
+    trigger = Trigger(
+        make_action(["hypervisor1", "hypervisor2"]),
+        "root",
+        "",
+        None,
+        make_pool(lines),
+        output_dir=str(tmp_path),
+        output_lines=2,
+    )
+    assert await trigger.restart_service()
+    for result in trigger.results:
+        assert result.output.tail() == ["progress 90%", "progress 100%"]
+        with open(result.output.path) as output:
+            written = output.read().splitlines()
+        assert len(written) == len(lines)
+        assert written[-1].endswith(" progress 100%")
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+@pytest.mark.asyncio
+async def test_armed_shell_output_is_captured(make_slow_pool, make_action):
+    pool = make_slow_pool(0)
+    trigger = Trigger(make_action(["hypervisor1"]), "root", "", None, pool)
+    await trigger.arm(shell=True)
+    pool.conn.process.printed = "stopping\nstarted"
+    assert await trigger.restart_service()
+    assert trigger.results[0].output.tail() == ["stopping", "started"]
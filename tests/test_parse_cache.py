@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from disruption_generator.parsers import cache
+from disruption_generator.parsers.cache import ParseCache, parse_experiments
+from disruption_generator.parsers.experiment_parser import (
+    ExperimentParser,
+    ParserException,
+)
+
+
+def test_workers_keep_the_order_of_files(tmp_path, make_experiments):
+    paths = make_experiments(tmp_path, 40)
+    scenarios, stats = parse_experiments(paths, workers=4)
+    assert stats["workers"] == 4
+    assert stats["cached"] == 0
+    serial = [
+        scenario
+        for path in paths
+        for scenario in ExperimentParser(yaml_path=path).parse()
+    ]
+    assert scenarios == serial
+
+
+def test_few_files_are_parsed_in_process(tmp_path, make_experiments):
+    paths = make_experiments(tmp_path, cache.MIN_POOL_FILES - 1)
+    _, stats = parse_experiments(paths, workers=4)
+    assert stats["workers"] == 0
+
+
+def test_unchanged_files_come_from_the_cache(tmp_path, make_entry, make_experiments):
+    paths = make_experiments(tmp_path, 20)
+    cache_dir = str(tmp_path / "cache")
+    cold, stats = parse_experiments(paths, workers=2, cache_dir=cache_dir)
+    assert stats["cached"] == 0
+    warm, stats = parse_experiments(paths, workers=2, cache_dir=cache_dir)
+    assert stats["cached"] == 20
+    assert stats["workers"] == 0
+    assert warm == cold
+
+    # Touched only, found by its content hash
+    os.utime(paths[0], ns=(0, 0))
+    with open(paths[1], "w") as f:
+        f.write(make_entry("Renamed"))
+    scenarios, stats = parse_experiments(paths, workers=0, cache_dir=cache_dir)
+    assert stats["cached"] == 19
+    assert scenarios[0] == cold[0]
+    assert scenarios[1].name == "Renamed"
+    _, stats = parse_experiments(paths, workers=0, cache_dir=cache_dir)
+    assert stats["cached"] == 20
+
+
+def test_corrupt_and_foreign_entries_are_ignored(
+    tmp_path, monkeypatch, make_experiments
+):
+    (path,) = make_experiments(tmp_path, 1)
+    cache_dir = str(tmp_path / "cache")
+    parse_experiments([path], cache_dir=cache_dir)
+    parse_cache = ParseCache(cache_dir)
+    with open(parse_cache._entry(path), "wb") as f:
+        f.write(b"not a pickle")
+    assert parse_cache.load(path) is None
+    parse_experiments([path], cache_dir=cache_dir)
+    assert parse_cache.load(path) is not None
+    monkeypatch.setattr(cache, "_fingerprint", lambda: "another parser")
+    assert ParseCache(cache_dir).load(path) is None
+
+
+def test_errors_name_the_file(tmp_path, make_entry, make_experiments):
+    paths = make_experiments(tmp_path, 16)
+    with open(paths[9], "w") as f:
+        f.write(make_entry("Broken", "host9").replace("wait: 0", ""))
+    with pytest.raises(ParserException, match="experiment009.yaml"):
+        parse_experiments(paths, workers=2)
+
+
+def test_files_parsed_here_are_streamed(tmp_path, make_entry, make_experiments):
+    (path,) = make_experiments(tmp_path, 1)
+    with open(path, "a") as f:
+        f.write(make_entry("Broken").replace("wait: 0", ""))
+    scenarios = cache.iter_experiments([path], workers=0)
+    assert next(scenarios).name == "Scenario 0"
+    with pytest.raises(ParserException, match="Missing 'wait'"):
+        next(scenarios)
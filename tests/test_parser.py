@@ -0,0 +1,85 @@
+import pytest
+import yaml
+
+from disruption_generator.parsers import experiment_parser
+from disruption_generator.parsers.experiment_parser import (
+    ExperimentParser,
+    ParserException,
+)
+
+
+@pytest.fixture(params=["libyaml", "python"])
+def loader(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(experiment_parser, "_Loader", yaml.SafeLoader)
+    elif not hasattr(yaml, "CSafeLoader"):
+        pytest.skip("libyaml is not available")
+    return request.param
+
+
+def parser(tmp_path, text):
+    path = tmp_path / "experiment.yaml"
+    path.write_text(text)
+    return ExperimentParser(yaml_path=str(path))
+
+
+def test_documents_of_a_stream(tmp_path, loader, make_entry):
+    single = make_entry("single").replace("- disrupt_action:", "disrupt_action:")
+    text = "---" + make_entry("first") + make_entry("second") + "---\n---" + single
+    names = [scenario.name for scenario in parser(tmp_path, text).iter_parse()]
+    assert names == ["first", "second", "single"]
+
+
+def test_empty_file(tmp_path, loader):
+    assert parser(tmp_path, "").parse() == []
+
+
+def test_entries_are_parsed_lazily(tmp_path, loader, make_entry):
+    text = make_entry("valid") + make_entry("invalid").replace("wait: 0", "")
+    scenarios = parser(tmp_path, text).iter_parse()
+    assert next(scenarios).name == "valid"
+    with pytest.raises(ParserException, match=r"experiment.yaml:20: Missing 'wait'"):
+        next(scenarios)
+
+
+def test_syntax_errors_name_the_line(tmp_path, loader, make_entry):
+    text = make_entry("valid") + make_entry("broken").replace(
+        "timeout: 10", "timeout: [10"
+    )
+    with pytest.raises(ParserException, match=r"experiment.yaml:3\d: "):
+        parser(tmp_path, text).parse()
+
+
+def test_invalid_entries_name_the_line(tmp_path, loader, make_entry):
+    with pytest.raises(ParserException, match=r"experiment.yaml:2: Expected a mapping"):
+        parser(tmp_path, "\n- just a string\n").parse()
+    text = "\n" + make_entry("bad port").replace("params: vdsmd", "params: [vdsmd]")
+    with pytest.raises(ParserException, match=r"experiment.yaml:3: "):
+        parser(tmp_path, text).parse()
+
+
+def test_unreadable_file():
+    with pytest.raises(ParserException, match="Failed to open /nonexistent.yaml"):
+        ExperimentParser(yaml_path="/nonexistent.yaml").parse()
+
+
+def test_host_groups_declared_further(tmp_path, loader, make_entry):
+    grouped = make_entry("grouped").replace(
+        "target_host: host1", "target_group: hypervisors"
+    )
+    text = (
+        grouped
+        + make_entry("plain")
+        + "- host_groups:\n    hypervisors: [hypervisor1, hypervisor2]\n"
+    )
+    scenarios = parser(tmp_path, text).parse()
+    assert [scenario.name for scenario in scenarios] == ["plain", "grouped"]
+    assert scenarios[1].actions[0].hosts == ("hypervisor1", "hypervisor2")
+    with pytest.raises(ParserException, match=r":2: Unknown host group hypervisors"):
+        parser(tmp_path, grouped).parse()
+
+
+def test_invalid_listener_regex(tmp_path, loader, make_entry):
+    text = make_entry("broken").replace("regex: ", "regex: (")
+    with pytest.raises(ParserException, match=r":\d+: Invalid regex"):
+        parser(tmp_path, text).parse()
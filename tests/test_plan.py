@@ -0,0 +1,75 @@
+import hashlib
+import json
+import zlib
+
+import pytest
+
+from click.testing import CliRunner
+
+from disruption_generator import cli
+from disruption_generator.parsers import plan
+from disruption_generator.parsers.cache import parse_experiments
+from disruption_generator.parsers.plan import PlanException, dumps, loads, read_plan
+
+
+def test_compile_and_read_back(tmp_path, monkeypatch, make_experiments):
+    monkeypatch.setattr(cli, "parse_log_config", lambda **files: None)
+    experiments_path = tmp_path / "experiments"
+    experiments_path.mkdir()
+    paths = sorted(make_experiments(experiments_path, 3))
+    plan_path = str(tmp_path / "experiments.plan")
+    result = CliRunner().invoke(
+        cli.main, ["compile", plan_path, "-e", str(experiments_path)]
+    )
+    assert result.exit_code == 0, result.output
+    scenarios, _ = parse_experiments(paths, workers=0)
+    assert read_plan(plan_path) == scenarios
+
+
+def test_plans_are_deterministic_and_shared(tmp_path, make_experiments):
+    paths = make_experiments(tmp_path, 4)
+    scenarios, _ = parse_experiments(paths, workers=0)
+    data = dumps(scenarios)
+    assert dumps(scenarios) == data
+    loaded = loads(data)
+    assert loaded == scenarios
+    # Every scenario listens to the same line, stored once
+    assert len({id(scenario.listener) for scenario in loaded}) == 1
+
+
+def test_plans_are_checked(tmp_path, monkeypatch, make_experiments):
+    scenarios, _ = parse_experiments(make_experiments(tmp_path, 1), workers=0)
+    data = dumps(scenarios)
+    with pytest.raises(PlanException, match="Not a plan"):
+        loads(b"- disrupt_action:\n")
+    with pytest.raises(PlanException, match="Corrupt"):
+        loads(data[:-1] + bytes([data[-1] ^ 1]))
+    monkeypatch.setattr(plan, "PLAN_VERSION", plan.PLAN_VERSION + 1)
+    with pytest.raises(PlanException, match="format"):
+        loads(data)
+    monkeypatch.undo()
+    monkeypatch.setattr(plan, "_fingerprint", lambda: "another parser")
+    with pytest.raises(PlanException, match="compile it again"):
+        loads(data)
+
+
+def test_plans_hold_only_data(tmp_path, make_experiments):
+    scenarios, _ = parse_experiments(make_experiments(tmp_path, 2), workers=0)
+    body = zlib.decompress(dumps(scenarios)[plan._HEADER.size:])
+    document = json.loads(body.decode("utf-8"))
+    assert len(document["scenarios"]) == 2
+    document["objects"][0]["class"] = "Popen"
+    body = zlib.compress(json.dumps(document).encode())
+    header = plan._HEADER.pack(
+        plan.MAGIC, plan.PLAN_VERSION, hashlib.sha256(body).digest()
+    )
+    with pytest.raises(PlanException, match="Corrupt plan"):
+        loads(header + body)
+
+
+@pytest.mark.asyncio
+async def test_invalid_plans_are_not_played(tmp_path):
+    plan_path = tmp_path / "experiments.plan"
+    plan_path.write_bytes(b"garbage")
+    with pytest.raises(PlanException, match="Not a plan"):
+        await cli.execute(None, None, plan=str(plan_path))
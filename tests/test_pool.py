@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from disruption_generator.connection import pool as pool_module
+from disruption_generator.connection.pool import ConnectionPool
+
+
+class FakeResult(object):
+    exit_status = 0
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    async def run(self, cmd, check=False):
+        return FakeResult()
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        pass
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    created = []
+
+    async def create_connection(client_factory, host, **kwargs):
+        conn = FakeConnection()
+        created.append(conn)
+        return conn, None
+
+    monkeypatch.setattr(pool_module, "create_connection", create_connection)
+    return created
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_connection(connections):
+    pool = ConnectionPool()
+    async with pool.connection("host", "root", client_keys=["key"]) as first:
+        async with pool.connection("host", "root", client_keys=["key"]) as second:
+            assert first is second
+    async with pool.connection("host", "root", client_keys=["key"]) as third:
+        assert third is first
+    assert len(connections) == 1
+    await pool.close()
+    assert first.closed
+
+
+@pytest.mark.asyncio
+async def test_pool_limits_sessions_per_host(connections):
+    pool = ConnectionPool(max_sessions=1)
+    async with pool.connection("host", "root"):
+        waiter = asyncio.ensure_future(pool.connection("host", "root").__aenter__())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+    conn = await waiter
+    assert conn is connections[0]
+
+
+@pytest.mark.asyncio
+async def test_pool_evicts_closed_connection(connections):
+    pool = ConnectionPool()
+    async with pool.connection("host", "root") as conn:
+        pass
+    conn.close()
+    async with pool.connection("host", "root") as fresh:
+        assert fresh is not conn
+    assert len(connections) == 2
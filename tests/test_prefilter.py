@@ -0,0 +1,98 @@
+import os
+import re
+import subprocess
+
+import pytest
+
+from disruption_generator.listener.prefilter import grep_command
+
+LINES = [
+    "2018-06-28 10:00:01,123 INFO (jsonrpc/4) [vdsm.api] FINISH getStats",
+    "2018-06-28 10:00:02,456 ERROR (vm/3f2a) [virt.vm] VM_DOWN id=3f2a-11",
+    "Traceback (most recent call last):",
+    '  File "/usr/lib/python3/vdsm/virt/vm.py", line 12, in run',
+    "migration started for vm 3f2a-11 [dst=host2]",
+    "finish",
+]
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "FINISH",
+        "(?i)finish",
+        "ERROR.*VM_(DOWN|UP)",
+        r"id=[0-9a-f]{4}-\d+",
+        r"^\s+File",
+        r"\[dst=[^\]]+\]",
+        r"call last\):$",
+    ],
+)
+def test_grep_accepts_every_matching_line(expression):
+    command = grep_command(expression)
+    assert command is not None
+    output = subprocess.run(
+        command,
+        shell=True,
+        input="\n".join(LINES) + "\n",
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout.splitlines()
+    expected = [line for line in LINES if re.search(expression, line)]
+    assert expected
+    assert output == expected
+
+
+@pytest.mark.parametrize(
+    "expression", [r"\bVM", r"(?=ERROR)", r"(a)\1", r"(?m)^x", "a\tb"]
+)
+def test_untranslatable_expressions_are_not_prefiltered(expression):
+    assert grep_command(expression) is None
+
+
+UNICODE_LINES = [
+    "VM café down",
+    "VM hôte-3 down at 12:00",
+    "disk ٣ failed",
+    "aéb",
+    "plain line",
+    "xééy",
+    "b",
+    "Ω",
+]
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "a.b",
+        "a[^x]b",
+        r"VM .{4} down",
+        r"VM [\w-]+ down",
+        r"VM \S+ down",
+        r"disk \d failed",
+        r"disk\s\d",
+        "café",
+        "xé{2}y",
+        "bé?",
+        "Ωé*",
+        "bé{0,2}",
+    ],
+)
+def test_grep_matches_non_ascii_lines_in_any_locale(expression):
+    command = grep_command(expression)
+    assert command is not None
+    output = subprocess.run(
+        command,
+        shell=True,
+        input="\n".join(UNICODE_LINES).encode("utf-8") + b"\n",
+        stdout=subprocess.PIPE,
+        env={"LC_ALL": "en_US.UTF-8", "PATH": os.environ["PATH"]},
+    ).stdout.decode("utf-8")
+    expected = [line for line in UNICODE_LINES if re.search(expression, line)]
+    assert expected
+    assert set(expected) <= set(output.splitlines())
+
+
+def test_case_folding_of_non_ascii_characters_is_not_prefiltered():
+    assert grep_command("(?i)café") is None
@@ -0,0 +1,117 @@
+import subprocess
+import time
+
+import pytest
+
+from disruption_generator.parsers.experiment_parser import (
+    ExperimentParser,
+    ParserException,
+)
+from disruption_generator.trigger import pressure
+from disruption_generator.trigger.pressure import PressureException
+from disruption_generator.trigger.trigger import Trigger
+
+EXPERIMENT = """
+- disrupt_action:
+    - name: Slow down the storage network
+      listener:
+        regex: "ERROR"
+        log: /var/log/vdsm/vdsm.log
+        host: engine
+        username: root
+        password: "secret"
+      trigger:
+        - action:
+            name: network_delay
+            params: "{params}"
+            target_host: hypervisor1
+            username: root
+            password: "secret"
+            wait: 0
+            timeout: 10
+"""
+
+
+def test_options_fill_defaults():
+    assert pressure.options("disk_io", "duration=30 size=2G") == {
+        "duration": "30",
+        "path": "/var/tmp",
+        "size": "2G",
+        "block_size": "1M",
+    }
+    assert pressure.to_bytes("2G") == 2 * 1024**3
+
+
+@pytest.mark.parametrize(
+    "name, params",
+    [
+        ("cpu_burn", "cores=2"),
+        ("cpu_burn", "duration=0"),
+        ("memory_pressure", "duration=10 size=lots"),
+        ("disk_io", "duration=10 path=/tmp;reboot"),
+        ("network_delay", "duration=10 dev=eth0 delay=100"),
+        ("network_delay", "duration=10 dev=eth0 speed=1"),
+    ],
+)
+def test_invalid_options(name, params):
+    with pytest.raises(PressureException):
+        pressure.options(name, params)
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        pressure.cpu_burn("duration=1 cores=4"),
+        pressure.memory_pressure("duration=1 size=512M"),
+        pressure.disk_io("duration=1"),
+        pressure.network_delay("duration=1 dev=eth0 loss=5%"),
+    ],
+)
+def test_commands_are_valid_shell(command):
+    subprocess.run(["sh", "-n", "-c", command], check=True)
+
+
+def test_pressure_lasts_its_duration_and_cleans_up(tmp_path):
+    command = pressure.disk_io(
+        "duration=1 size=1M block_size=64K path={}".format(tmp_path)
+    )
+    started = time.monotonic()
+    subprocess.run(["sh", "-c", command], check=True, timeout=5)
+    assert 1 <= time.monotonic() - started < 5
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_pressure_failures_are_reported(tmp_path):
+    command = pressure.disk_io("duration=5 size=1M path={}".format(tmp_path))
+    # The reading dd has nowhere to write.
+    broken = command.replace("of=/dev/null", "of=/nonexistent/null")
+    started = time.monotonic()
+    assert subprocess.run(["sh", "-c", broken], timeout=5).returncode != 0
+    assert time.monotonic() - started < 4
+
+
+def test_failed_check_is_reported(tmp_path):
+    command = pressure.disk_io("duration=1 path={}/missing".format(tmp_path))
+    assert subprocess.run(["sh", "-c", command]).returncode != 0
+
+
+@pytest.mark.asyncio
+async def test_trigger_runs_pressure_actions(make_pool, make_action):
+    pool = make_pool()
+    pressure_action = make_action(["hypervisor1"])
+    pressure_action.name = "cpu_burn"
+    pressure_action.params = "duration=60 cores=2"
+    trigger = Trigger(pressure_action, "root", "", None, pool)
+    assert await getattr(trigger, "cpu_burn")()
+    (command,) = pool.conn.commands
+    assert command == pressure.cpu_burn("duration=60 cores=2")
+
+
+def test_parser_checks_pressure_options(tmp_path):
+    path = tmp_path / "pressure.yaml"
+    path.write_text(EXPERIMENT.format(params="duration=30 dev=eth1 delay=50ms"))
+    (parsed,) = ExperimentParser(yaml_path=str(path)).parse()
+    assert parsed.actions[0].name == "network_delay"
+    path.write_text(EXPERIMENT.format(params="duration=30"))
+    with pytest.raises(ParserException):
+        ExperimentParser(yaml_path=str(path)).parse()
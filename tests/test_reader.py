@@ -0,0 +1,61 @@
+import pytest
+
+from disruption_generator.listener.matchers import RegexMatcher
+from disruption_generator.listener.reader import ChunkReader
+
+
+def test_reader_returns_complete_lines_only():
+    reader = ChunkReader(None)
+    assert reader.feed(b"first li") == b""
+    assert reader.feed(b"ne\nsecond\nthi") == b"first line\nsecond\n"
+    assert reader.feed(b"rd\n") == b"third\n"
+
+
+def test_reader_truncates_long_lines():
+    reader = ChunkReader(None, max_line_length=8)
+    assert reader.feed(b"0123456789") == b""
+    assert reader.feed(b"abcdef") == b""
+    assert reader.feed(b"ghi\nnext\n") == b"01234567\nnext\n"
+    assert reader.truncated == 1
+
+
+@pytest.mark.parametrize(
+    "expression, mode",
+    [
+        ("VM_DOWN", "bytes"),
+        (r"id=\w+", "text"),
+        (r"(?<!x)VM", "line"),
+        (r"\AERROR", "line"),
+    ],
+)
+def test_matcher_finds_first_matching_line(expression, mode):
+    buf = "INFO vm=1\nERROR VM_DOWN id=3f\nERROR VM_DOWN id=40\n".encode()
+    matcher = RegexMatcher(expression)
+    assert matcher.mode == mode
+    end, line = matcher.search(buf)
+    assert line == "ERROR VM_DOWN id=3f"
+    assert buf[:end].endswith(b"id=3f\n")
+
+
+def test_matcher_does_not_match_across_lines():
+    buf = b"foo\nbar\n"
+    assert RegexMatcher(r"foo\sbar").search(buf) is None
+    assert RegexMatcher(r"o[^x]*b").search(buf) is None
+
+
+def test_matcher_maps_offsets_past_undecodable_bytes():
+    buf = b"\xff\xfe junk\nW\xc3\xb6rd\n"
+    end, line = RegexMatcher("(?i)wörd").search(buf)
+    assert end == len(buf)
+    assert line == "Wörd"
+
+
+@pytest.mark.parametrize(
+    "expression, line",
+    [("a.b", "aéb"), ("a[^x]b", "aéb"), ("VM .{4} down", "VM café down")],
+)
+def test_matcher_matches_multibyte_characters(expression, line):
+    buf = "first\n{}\n".format(line).encode()
+    end, found = RegexMatcher(expression).search(buf)
+    assert end == len(buf)
+    assert found == line
@@ -0,0 +1,183 @@
+import asyncio
+
+import attr
+import pytest
+
+from disruption_generator.engine.engine import Engine
+from disruption_generator.engine.recovery import Recovery, check, measure, summarize
+from disruption_generator.engine.scheduler import Scheduler
+from disruption_generator.parsers.experiment_parser import (
+    ExperimentParser,
+    ParserException,
+)
+from disruption_generator.parsers.utils import Probe
+
+EXPERIMENT = """
+- disrupt_action:
+    - name: Restart vdsmd
+      listener:
+        regex: "ERROR"
+        log: /var/log/vdsm/vdsm.log
+        host: engine
+        username: root
+        password: "secret"
+      trigger:
+        - action:
+            name: restart_service
+            params: vdsmd
+            target_host: hypervisor1
+            username: root
+            password: "secret"
+            wait: 0
+            timeout: 10
+            probe:
+{probe}
+"""
+
+
+class ExitStatus(object):
+    def __init__(self, exit_status):
+        self.exit_status = exit_status
+
+
+class Probes(object):
+    """
+    Probe command failing `failures` times.
+    """
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.count = 0
+
+    async def __call__(self, cmd, check=False):
+        self.count += 1
+        return ExitStatus(0 if self.count > self.failures else 1)
+
+
+def flaky(results):
+    results = iter(results)
+
+    async def poll():
+        return next(results)
+
+    return poll
+
+
+@pytest.mark.asyncio
+async def test_recovery_needs_consecutive_successes():
+    scheduler = Scheduler()
+    probe = Probe(kind="tcp", port=22, interval=0.01, successes=2)
+    poll = flaky([False, True, False, True, True])
+    recovery = await measure(probe, "host", scheduler.time(), scheduler, poll)
+    assert recovery.recovered
+    assert recovery.attempts == 5
+    assert 0 < recovery.time_to_first_success < recovery.time_to_recover
+    scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_backoff_is_bounded_and_gives_up_at_timeout():
+    scheduler = Scheduler()
+    probe = Probe(
+        kind="tcp", port=22, interval=0.01, backoff=2, max_interval=0.04, timeout=0.2
+    )
+    start = scheduler.time()
+
+    async def down():
+        raise ConnectionRefusedError()
+
+    recovery = await measure(probe, "host", start, scheduler, down)
+    assert not recovery.recovered
+    assert recovery.time_to_first_success is None
+    # 0.01, 0.02 then 0.04 apart until the timeout
+    assert 5 <= recovery.attempts <= 8
+    assert scheduler.time() - start == pytest.approx(0.2, abs=0.05)
+    scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_tcp_and_http_checks():
+    async def answer(reader, writer):
+        await reader.readline()
+        writer.write(b"HTTP/1.1 503 Service Unavailable\r\n\r\n")
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(answer, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        tcp = Probe(kind="tcp", port=port)
+        assert await check(tcp, "127.0.0.1", None, "root", "", None)
+        http = Probe(kind="http", url="http://{host}:%d/health" % port)
+        assert not await check(http, "127.0.0.1", None, "root", "", None)
+        http = attr.evolve(http, status=503)
+        assert await check(http, "127.0.0.1", None, "root", "", None)
+    finally:
+        server.close()
+        await server.wait_closed()
+    with pytest.raises(OSError):
+        await check(tcp, "127.0.0.1", None, "root", "", None)
+
+
+def test_summary_percentiles():
+    recoveries = [
+        Recovery("host", True, 1, seconds / 2.0, float(seconds))
+        for seconds in range(1, 101)
+    ] + [Recovery("host")]
+    summary = summarize(recoveries)
+    assert summary["count"] == 101
+    assert summary["recovered"] == 100
+    assert summary["recover"] == {"p50": 51.0, "p90": 90.0, "p99": 99.0, "max": 100.0}
+    assert summary["first_success"]["max"] == 50.0
+
+
+@pytest.mark.asyncio
+async def test_engine_measures_recovery_of_every_run(
+    make_pool, make_broker, make_scenario
+):
+    pool = make_pool()
+    pool.conn.run = probes = Probes(failures=2)
+    engine = Engine(None, pool=pool, broker=make_broker(0))
+    probed = make_scenario("probed")
+    probe = Probe(kind="command", command="systemctl is-active vdsmd", interval=0.01)
+    probed.actions = [attr.evolve(action, probe=probe) for action in probed.actions]
+    (result,) = await engine.run([probed])
+    (host,) = result.actions[0].hosts
+    assert host.recovery.recovered
+    assert host.recovery.attempts == 3
+    assert probes.count == 3
+    summary = result.recovery()["restart_service"]
+    assert summary["count"] == summary["recovered"] == len(result.actions)
+    await engine.close()
+
+
+def test_parser_reads_probes(tmp_path):
+    path = tmp_path / "probe.yaml"
+    path.write_text(
+        EXPERIMENT.format(
+            probe="              type: http\n"
+            "              url: http://{host}:8080/health\n"
+            "              backoff: 2\n"
+            "              successes: 3"
+        )
+    )
+    (parsed,) = ExperimentParser(yaml_path=str(path)).parse()
+    assert parsed.actions[0].probe == Probe(
+        kind="http", url="http://{host}:8080/health", backoff=2, successes=3
+    )
+
+
+@pytest.mark.parametrize(
+    "probe",
+    [
+        "              type: ping",
+        "              type: tcp",
+        "              type: tcp\n              port: 22\n              interval: 0",
+        "              type: tcp\n              port: 22\n              backoff: 0.5",
+    ],
+)
+def test_parser_rejects_invalid_probes(tmp_path, probe):
+    path = tmp_path / "probe.yaml"
+    path.write_text(EXPERIMENT.format(probe=probe))
+    with pytest.raises(ParserException):
+        ExperimentParser(yaml_path=str(path)).parse()
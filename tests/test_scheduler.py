@@ -0,0 +1,61 @@
+import pytest
+
+from disruption_generator.engine.engine import Engine
+from disruption_generator.engine.scheduler import Scheduler
+from disruption_generator.parsers.utils import Action, Disruption
+
+
+@pytest.mark.asyncio
+async def test_timers_fire_in_order():
+    scheduler = Scheduler()
+    fired = []
+    now = scheduler.time()
+    for delay in (0.03, 0.01, 0.02, 0.01):
+        scheduler.call_at(now + delay, fired.append, delay)
+    cancelled = scheduler.call_at(now + 0.015, fired.append, "cancelled")
+    cancelled.cancel()
+    await scheduler.sleep_until(now + 0.05)
+    assert fired == [0.01, 0.01, 0.02, 0.03]
+    assert scheduler.jitter.count == 5  # the sleep included
+    assert len(scheduler) == 0
+
+
+@pytest.mark.asyncio
+async def test_thousands_of_pending_timers_hold_one_loop_handle():
+    scheduler = Scheduler()
+    now = scheduler.time()
+    timers = [scheduler.call_at(now + 60 + i, lambda: None) for i in range(5000)]
+    assert len(scheduler) == 5000
+    for timer in timers[:4000]:
+        timer.cancel()
+    assert len(scheduler) == 1000
+    assert len(scheduler._heap) < 5000  # compacted
+    scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_engine_honors_wait_after_match_and_previous_action(
+    make_pool, make_broker, make_scenario
+):
+    engine = Engine(None, pool=make_pool(), broker=make_broker(0))
+    base = make_scenario("timed")
+    follow_up = Action(
+        name="restart_service",
+        params="vdsmd",
+        target_host="localhost",
+        username="root",
+        password="",
+        wait=1,
+        timeout=5,
+        after="previous",
+    )
+    timed = Disruption(
+        name="timed", listener=base.listener, actions=base.actions + [follow_up]
+    )
+    start = engine.scheduler.time()
+    (result,) = await engine.run([timed])
+    elapsed = engine.scheduler.time() - start
+    assert 1 <= elapsed < 1.5
+    assert [action.triggered for action in result.actions] == [True, True]
+    assert all(0 <= action.jitter < 0.1 for action in result.actions)
+    await engine.close()
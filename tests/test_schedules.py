@@ -0,0 +1,109 @@
+import datetime
+
+import pytest
+
+from disruption_generator.engine.engine import Engine
+from disruption_generator.engine.schedules import Cron, ScheduleException, firing_times
+from disruption_generator.parsers.experiment_parser import (
+    ExperimentParser,
+    ParserException,
+)
+from disruption_generator.parsers.utils import Disruption, Schedule
+
+EXPERIMENT = """
+- disrupt_action:
+    - name: Restart vdsmd every few minutes
+      schedule:
+{schedule}
+      trigger:
+        - action:
+            name: restart_service
+            params: vdsmd
+            target_host: hypervisor1
+            username: root
+            password: "secret"
+            wait: 0
+            timeout: 10
+"""
+
+
+def test_cron_finds_next_matching_minute():
+    cron = Cron("*/15 9-17 * * 1-5")
+    friday = datetime.datetime(2018, 6, 29, 17, 50)
+    assert cron.next_after(friday) == datetime.datetime(2018, 7, 2, 9, 0)
+    assert cron.next_after(datetime.datetime(2018, 7, 2, 9, 0)) == (
+        datetime.datetime(2018, 7, 2, 9, 15)
+    )
+    sunday = Cron("0 0 * * 7")
+    assert sunday.next_after(friday) == datetime.datetime(2018, 7, 1, 0, 0)
+
+
+@pytest.mark.parametrize("expression", ["* * *", "61 * * * *", "*/0 * * * *"])
+def test_invalid_cron_expressions(expression):
+    with pytest.raises(ScheduleException):
+        Cron(expression)
+
+
+def test_fixed_rate_does_not_drift_and_stops_after_duration():
+    schedule = Schedule(kind="rate", interval=0.1, duration=1)
+    times = list(firing_times(schedule, 100.0))
+    assert len(times) == 10
+    assert times[-1] == pytest.approx(101.0)
+
+
+def test_poisson_arrivals_are_repeatable_with_a_seed():
+    schedule = Schedule(kind="poisson", interval=2, count=1000, seed=42)
+    times = list(firing_times(schedule, 0.0))
+    assert times == list(firing_times(schedule, 0.0))
+    assert len(times) == 1000
+    assert times[-1] / 1000 == pytest.approx(2, rel=0.15)
+
+
+def test_cron_times_follow_the_wall_clock():
+    schedule = Schedule(kind="cron", cron="*/5 * * * *", count=2)
+    wall = datetime.datetime(2018, 6, 29, 17, 52, 30).timestamp()
+    assert list(firing_times(schedule, 10.0, wall)) == [160.0, 460.0]
+
+
+def test_parser_builds_scheduled_scenarios(tmp_path):
+    path = tmp_path / "schedule.yaml"
+    path.write_text(
+        EXPERIMENT.format(
+            schedule="        type: poisson\n        interval: 30\n"
+            "        duration: 3600\n        seed: 7"
+        )
+    )
+    (parsed,) = ExperimentParser(yaml_path=str(path)).parse()
+    assert parsed.listener is None
+    assert parsed.schedule == Schedule(
+        kind="poisson", interval=30, duration=3600, seed=7
+    )
+
+
+def test_parser_requires_bounded_schedules(tmp_path):
+    path = tmp_path / "schedule.yaml"
+    path.write_text(
+        EXPERIMENT.format(schedule="        type: rate\n        interval: 30")
+    )
+    with pytest.raises(ParserException):
+        ExperimentParser(yaml_path=str(path)).parse()
+
+
+@pytest.mark.asyncio
+async def test_engine_fires_scheduled_actions(make_pool, make_broker, make_scenario):
+    pool = make_pool()
+    engine = Engine(None, pool=pool, broker=make_broker(10))
+    scheduled = Disruption(
+        name="scheduled",
+        listener=None,
+        actions=make_scenario("s").actions,
+        schedule=Schedule(kind="rate", interval=0.02, count=5),
+    )
+    (result,) = await engine.run([scheduled])
+    assert not result.failed
+    assert len(result.actions) == 5
+    assert pool.conn.commands == ["systemctl restart sysstat"] * 5
+    stats = engine.scheduler.stats()
+    assert stats["scheduled"] >= 10
+    assert stats["overhead_per_timer"] < 0.001
+    await engine.close()
@@ -0,0 +1,75 @@
+import subprocess
+import sys
+
+import pytest
+
+# Microseconds importing the console script may take beyond click itself,
+# the best of RUNS fresh interpreters.
+IMPORT_BUDGET = 30000
+RUNS = 3
+
+HEAVY = (
+    "asyncssh",
+    "attr",
+    "yaml",
+    "zope.interface",
+    "disruption_generator.engine.engine",
+    "disruption_generator.parsers.experiment_parser",
+)
+
+
+def import_times(statement):
+    """
+    Returns the cumulative microseconds of every module `statement`
+    imported, as reported by python -X importtime.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_console_script_imports_no_heavy_module():
+    times = import_times("import disruption_generator.cli")
+    assert not [module for module in HEAVY if module in times]
+
+
+def test_console_script_import_budget():
+    overheads = []
+    for _ in range(RUNS):
+        times = import_times("import disruption_generator.cli")
+        overheads.append(times["disruption_generator.cli"] - times["click"])
+    assert min(overheads) < IMPORT_BUDGET, overheads
+
+
+def test_parser_does_not_import_yaml():
+    times = import_times("import disruption_generator.parsers.experiment_parser")
+    assert "yaml" not in times
+
+
+def test_parser_still_provides_its_interface():
+    from disruption_generator.parsers.experiment_parser import (
+        ExperimentParser,
+        IParser,
+    )
+
+    assert IParser.implementedBy(ExperimentParser)
+
+
+@pytest.mark.parametrize("option", ["--help", "--version"])
+def test_console_script_answers_without_heavy_modules(option):
+    times = import_times(
+        "import sys; sys.argv = ['disruption_generator', {!r}]\n"
+        "from disruption_generator import cli\n"
+        "try:\n    cli.main()\nexcept SystemExit:\n    pass".format(option)
+    )
+    assert not [module for module in HEAVY if module in times]
@@ -0,0 +1,85 @@
+import pytest
+
+from disruption_generator.listener.threshold import (
+    SlidingWindowCounter,
+    ThresholdMatcher,
+)
+from disruption_generator.parsers.experiment_parser import (
+    ExperimentParser,
+    ParserException,
+)
+
+EXPERIMENT = """
+- disrupt_action:
+    - name: Restart vdsmd while errors pile up
+      listener:
+        host: hypervisor1
+        log: /var/log/vdsm/vdsm.log
+        username: root
+        password: "secret"
+        regex: ERROR
+{condition}
+      trigger:
+        - action:
+            name: restart_service
+            params: vdsmd
+            target_host: hypervisor1
+            username: root
+            password: "secret"
+            wait: 0
+            timeout: 10
+"""
+
+
+def test_counter_forgets_expired_buckets():
+    counter = SlidingWindowCounter(10, buckets=10)
+    for second in range(10):
+        counter.add(100 + second, 2)
+    assert counter.count(109.5) == 20
+    assert counter.count(112.5) == 14
+    assert counter.count(200) == 0
+
+
+def test_counter_memory_does_not_grow_with_events():
+    counter = SlidingWindowCounter(1, buckets=4)
+    for i in range(10000):
+        counter.add(i / 1000.0)
+    assert len(counter._counts) == 4
+    assert counter.count(9.999) <= 1000
+
+
+def test_threshold_matcher_fires_on_the_nth_line(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(
+        "disruption_generator.listener.threshold.time.monotonic", lambda: now[0]
+    )
+    matcher = ThresholdMatcher("ERROR", threshold=3, window=10)
+    assert matcher.search(b"ERROR 1\nINFO\nERROR 2\n") is None
+    now[0] += 20
+    assert matcher.search(b"ERROR 3\nERROR 4\n") is None
+    end, line = matcher.search(b"INFO\nERROR 5\nERROR 6\n")
+    assert line == "ERROR 5"
+    assert end == len(b"INFO\nERROR 5\n")
+    assert matcher.counter.total == 0
+
+
+@pytest.mark.parametrize(
+    "condition, threshold",
+    [
+        ("        threshold: 50\n        window: 10", 50),
+        ("        rate: 2.5\n        window: 10", 25),
+    ],
+)
+def test_parser_builds_threshold_listener(tmp_path, condition, threshold):
+    path = tmp_path / "threshold.yaml"
+    path.write_text(EXPERIMENT.format(condition=condition))
+    (scenario,) = ExperimentParser(yaml_path=str(path)).parse()
+    assert scenario.listener.threshold == threshold
+    assert scenario.listener.window == 10
+
+
+def test_parser_requires_a_window(tmp_path):
+    path = tmp_path / "threshold.yaml"
+    path.write_text(EXPERIMENT.format(condition="        threshold: 50"))
+    with pytest.raises(ParserException):
+        ExperimentParser(yaml_path=str(path)).parse()
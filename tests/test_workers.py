@@ -0,0 +1,63 @@
+import asyncio
+import concurrent.futures
+
+import pytest
+
+from disruption_generator.listener.broker import TailBroker
+from disruption_generator.listener.correlation import CorrelationMatcher
+from disruption_generator.listener.matchers import RegexMatcher
+from disruption_generator.listener.workers import MIN_BATCH, MatchWorkers
+
+
+@pytest.mark.asyncio
+async def test_workers_search_in_another_process():
+    workers = MatchWorkers(1)
+    try:
+        results = await workers.search(
+            ["VM_DOWN", r"id=(\d+)", "absent"], b"INFO\nVM_DOWN id=3\n"
+        )
+    finally:
+        workers.close()
+    assert results == [
+        (len(b"INFO\nVM_DOWN id=3\n"), "VM_DOWN id=3"),
+        (len(b"INFO\nVM_DOWN id=3\n"), "VM_DOWN id=3"),
+        None,
+    ]
+
+
+def test_batches_adapt_to_the_latency_bound():
+    workers = MatchWorkers(max_latency=0.1, executor=object())
+    workers.batch_size = 1024 * 1024
+    workers._adapt(0.4, 1024 * 1024)
+    assert workers.batch_size == 256 * 1024
+    workers._adapt(0.01, 1024)
+    assert workers.batch_size == 256 * 1024
+    workers._adapt(0.01, 200 * 1024)
+    assert workers.batch_size == 512 * 1024
+    workers._adapt(10, 512 * 1024)
+    assert workers.batch_size == MIN_BATCH
+
+
+@pytest.mark.asyncio
+async def test_broker_offloads_stateless_matchers(make_pool):
+    pool = make_pool()
+    workers = MatchWorkers(executor=concurrent.futures.ThreadPoolExecutor(1))
+    broker = TailBroker(pool, linger=0, workers=workers)
+    offloaded = broker.subscribe(
+        "host", "root", None, None, "/var/log/vdsm.log", RegexMatcher("VM_DOWN")
+    )
+    local = broker.subscribe(
+        "host",
+        "root",
+        None,
+        None,
+        "/var/log/vdsm.log",
+        CorrelationMatcher(["START", "VM_DOWN"]),
+    )
+    await asyncio.sleep(0)
+    _, stdout = pool.conn.sessions[0]
+    stdout.lines.put_nowait(b"START\nVM_DOWN id=1\n")
+    assert await asyncio.wait_for(offloaded.wait(), 1) == "VM_DOWN id=1"
+    assert await asyncio.wait_for(local.wait(), 1) == "VM_DOWN id=1"
+    await broker.close()
+    workers.close()